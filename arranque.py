@@ -0,0 +1,69 @@
+"""Carga diferida de los módulos del sistema y tiempos de arranque.
+
+Los lanzadores (main.py, login.py) importan cada módulo con cargar_clase la
+primera vez que el usuario lo abre, en lugar de importarlos todos al inicio.
+Al mostrarse el lanzador se imprime el tiempo de arranque. Con la variable de
+entorno TEXTILES_TIEMPOS=1 (o el argumento --tiempos) se imprime además el
+tiempo de cada import y de cada archivo de datos cargado, y un resumen.
+"""
+import importlib
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+INICIO = time.perf_counter()
+MOSTRAR = bool(os.environ.get("TEXTILES_TIEMPOS")) or "--tiempos" in sys.argv
+
+TIEMPOS = []  # (categoría, nombre, segundos)
+
+
+def registrar(categoria, nombre, segundos):
+    TIEMPOS.append((categoria, nombre, segundos))
+    if MOSTRAR:
+        print(f"[tiempos] {categoria:<8} {nombre:<40} {segundos * 1000:8.1f} ms")
+
+
+@contextmanager
+def medir(categoria, nombre):
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        registrar(categoria, nombre, time.perf_counter() - inicio)
+
+
+def cargar_clase(modulo, clase):
+    """Importa el módulo la primera vez que se necesita y devuelve la clase"""
+    if modulo not in sys.modules:
+        with medir("import", modulo):
+            importlib.import_module(modulo)
+    return getattr(sys.modules[modulo], clase)
+
+
+def marcar_ventana_visible(nombre="lanzador"):
+    """Registra el tiempo desde el inicio del proceso hasta que la ventana se muestra.
+
+    Al mostrarse el lanzador imprime el tiempo de arranque y, con
+    TEXTILES_TIEMPOS, el reporte completo.
+    """
+    segundos = time.perf_counter() - INICIO
+    registrar("ventana", nombre, segundos)
+    if nombre == "lanzador":
+        print(f"Arranque: ventana visible en {segundos * 1000:.0f} ms")
+        if MOSTRAR:
+            print(reporte())
+
+
+def reporte():
+    """Resumen de los tiempos registrados por categoría"""
+    lineas = []
+    for categoria in ("import", "datos", "ventana"):
+        registros = [(n, s) for c, n, s in TIEMPOS if c == categoria]
+        if not registros:
+            continue
+        total = sum(s for _, s in registros)
+        lineas.append(f"{categoria}: {total * 1000:.1f} ms")
+        for nombre, segundos in sorted(registros, key=lambda r: -r[1]):
+            lineas.append(f"  {nombre:<40} {segundos * 1000:8.1f} ms")
+    return "\n".join(lineas)
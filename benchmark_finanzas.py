@@ -0,0 +1,94 @@
+"""Compara la carga y el guardado del libro diario en ambos formatos.
+
+- anterior: montos como texto, DecimalEncoder al guardar y conversión de
+  cada movimiento a Decimal después de cargar.
+- centavos: registros compactos con montos en centavos enteros
+  (asiento_a_registro / asiento_de_registro), convertidos al leer.
+
+Uso: python benchmark_finanzas.py [--asientos 100000] [--repeticiones 3]
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from decimal import Decimal
+
+from contabilidad import DecimalEncoder, asiento_a_registro, asiento_de_registro
+from dinero import Dinero
+from persistencia import ColeccionBitacora
+
+CUENTAS = ["1101", "1105", "1201", "2101", "2105", "4101", "5101", "5201"]
+
+
+def generar_asientos(cantidad, semilla=1):
+    azar = random.Random(semilla)
+    asientos = []
+    for n in range(cantidad):
+        monto = Dinero(azar.randint(100, 5_000_000))
+        asientos.append({
+            "id": f"{n:08d}",
+            "fecha": f"2025-{n % 12 + 1:02d}-{n % 28 + 1:02d}",
+            "origen": f"venta_{n:08d}",
+            "movimientos": [
+                {"cuenta": azar.choice(CUENTAS), "debe": monto, "haber": Dinero(0), "concepto": f"Venta {n}"},
+                {"cuenta": azar.choice(CUENTAS), "debe": Dinero(0), "haber": monto, "concepto": "Venta de mercadería"},
+            ]
+        })
+    return asientos
+
+
+def a_decimal(asientos):
+    """Los mismos asientos con montos Decimal, como los guardaba el formato anterior"""
+    return [dict(a, movimientos=[dict(m, debe=m['debe'].to_decimal(), haber=m['haber'].to_decimal())
+                                 for m in a['movimientos']]) for a in asientos]
+
+
+def cargar_anterior(coleccion):
+    datos = coleccion.cargar()
+    for asiento in datos:
+        for mov in asiento['movimientos']:
+            mov['debe'] = Decimal(mov['debe'])
+            mov['haber'] = Decimal(mov['haber'])
+    return datos
+
+
+def medir(funcion, repeticiones):
+    mejor = None
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        transcurrido = time.perf_counter() - inicio
+        mejor = transcurrido if mejor is None else min(mejor, transcurrido)
+    return mejor
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Carga y guardado del libro diario: texto+Decimal vs centavos")
+    parser.add_argument("--asientos", type=int, default=100_000)
+    parser.add_argument("--repeticiones", type=int, default=3)
+    args = parser.parse_args()
+
+    asientos = generar_asientos(args.asientos)
+    decimales = a_decimal(asientos)
+
+    with tempfile.TemporaryDirectory() as directorio:
+        anterior = ColeccionBitacora(os.path.join(directorio, "anterior.json"), [], encoder=DecimalEncoder)
+        centavos = ColeccionBitacora(os.path.join(directorio, "centavos.json"), [],
+                                     serializar=asiento_a_registro, deserializar=asiento_de_registro)
+
+        resultados = [
+            ("anterior", medir(lambda: anterior.compactar(decimales), args.repeticiones),
+             medir(lambda: cargar_anterior(anterior), args.repeticiones), os.path.getsize(anterior.archivo)),
+            ("centavos", medir(lambda: centavos.compactar(asientos), args.repeticiones),
+             medir(centavos.cargar, args.repeticiones), os.path.getsize(centavos.archivo)),
+        ]
+
+    print(f"{args.asientos} asientos (mejor de {args.repeticiones})")
+    print(f"{'formato':<10} {'guardar':>10} {'cargar':>10} {'tamaño':>12}")
+    for formato, guardar, cargar, tamano in resultados:
+        print(f"{formato:<10} {guardar * 1000:8.0f} ms {cargar * 1000:8.0f} ms {tamano / 1e6:9.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+"""Catálogo único de productos: id, nombre, categoría, precio e historial de precios.
+
+Antes cada módulo tenía su propia tabla de precios (data/precios.json del
+inventario, la tabla fija del sistema de pedidos y los precios iniciales del
+inventario), con valores distintos para el mismo producto. Ahora todos
+consultan el mismo Catalogo, guardado en data/catalogo.json y cargado una sola
+vez por proceso (ver ServicioInventario y ContextoDatos).
+
+La primera vez que se abre, el catálogo se arma con PRODUCTOS_BASE y los
+precios guardados en data/precios.json, que tienen prioridad porque son los que
+se editaron en el inventario.
+"""
+import os
+from datetime import datetime
+
+from persistencia import abrir_coleccion
+from tabla_compacta import IndiceSlots, TablaCompacta
+
+CATEGORIAS = {"Guipiles": "GUI", "Cortes": "COR", "Fajas": "FAJ", "Otros": "OTR"}  # categoría -> prefijo del id
+OTROS = "Otros"
+
+PRODUCTOS_BASE = [
+    ("Guipiles", "Petzal Computarizado", 90),
+    ("Guipiles", "Petzal Alfombra", 800),
+    ("Guipiles", "Petzal Corona", 750),
+    ("Guipiles", "San Pedro", 340),
+    ("Guipiles", "San Lucas", 240),
+    ("Guipiles", "Mariposa Computarizada", 90),
+    ("Guipiles", "Canasta Computarizada", 100),
+    ("Guipiles", "San Pedro Mariposa", 250),
+    ("Guipiles", "Guipil de Toto", 350),
+    ("Cortes", "Fino hilo alemán", 1500),
+    ("Cortes", "Fino hilo cristal", 2000),
+    ("Cortes", "De toto", 750),
+    ("Cortes", "Rojo alemán", 1200),
+    ("Fajas", "Computarizada de 3 dedos", 50),
+    ("Fajas", "Computarizada de 4 dedos", 55),
+    ("Fajas", "Computarizada de 6 dedos", 80),
+    ("Fajas", "Marcador sencillo", 300),
+    ("Fajas", "Marcador fino", 1200),
+]
+
+
+class ProductoCatalogo:
+    """Producto con su historial de precios [(fecha, precio), ...] en orden cronológico"""
+
+    def __init__(self, id, nombre, categoria, precio, historial=None):
+        self.id = id
+        self.nombre = nombre
+        self.categoria = categoria
+        self.precio = precio
+        self.historial = historial if historial is not None else [(datetime.now().isoformat(), precio)]
+
+    def precio_en(self, fecha):
+        """Precio vigente en una fecha (ISO); antes del primer registro, el primer precio"""
+        precio = self.historial[0][1] if self.historial else self.precio
+        for desde, valor in self.historial:
+            if desde > fecha:
+                break
+            precio = valor
+        return precio
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'nombre': self.nombre,
+            'categoria': self.categoria,
+            'precio': self.precio,
+            'historial': [list(cambio) for cambio in self.historial]
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['id'], data['nombre'], data.get('categoria', OTROS), data['precio'],
+                   [tuple(cambio) for cambio in data.get('historial', [])])
+
+
+class Catalogo:
+    """Productos indexados por id y por nombre.
+
+    'precios' (nombre -> precio) es la vista que usan las ventanas para listar
+    y cotizar; se actualiza en la misma tabla con cada cambio. Es una
+    TablaCompacta sobre 'indice', que también usa la tabla de stock. Sin
+    data_dir el catálogo solo vive en memoria (copia de un servidor).
+    """
+
+    def __init__(self, data_dir="data"):
+        self.coleccion = None
+        if data_dir:
+            self.precios_file = os.path.join(data_dir, "precios.json")
+            self.coleccion = abrir_coleccion(os.path.join(data_dir, "catalogo.json"), {},
+                                             serializar=ProductoCatalogo.to_dict,
+                                             deserializar=ProductoCatalogo.from_dict)
+        self.por_id = {}
+        self.por_nombre = {}
+        self.indice = IndiceSlots()  # Nombre -> posición en las tablas de precios y stock
+        self.precios = TablaCompacta(self.indice, 'd')
+        if self.coleccion:
+            self.cargar()
+
+    def cargar(self):
+        productos = self.coleccion.cargar()
+        if not productos:
+            productos = self._importar()
+            self.coleccion.compactar(productos)
+        self.actualizar(productos)
+
+    def desactualizado(self):
+        """Indica si otro proceso modificó el catálogo desde la última carga"""
+        return self.coleccion is not None and self.coleccion.modificada_externamente()
+
+    def guardar(self, asincrono=False):
+        if self.coleccion is None:
+            return
+        if asincrono:
+            self.coleccion.guardar_async(self.por_id)
+        else:
+            self.coleccion.guardar(self.por_id)
+
+    def actualizar(self, productos):
+        """Reemplaza los productos (id -> ProductoCatalogo) conservando los diccionarios"""
+        self.por_id.clear()
+        self.por_id.update(productos)
+        self.por_nombre.clear()
+        self.precios.clear()
+        for producto in productos.values():
+            self.por_nombre[producto.nombre] = producto
+            self.precios[producto.nombre] = producto.precio
+
+    # --------------------------------------------
+    # Consultas
+    # --------------------------------------------
+    def producto(self, clave):
+        """Producto por id o por nombre, o None"""
+        return self.por_id.get(clave) or self.por_nombre.get(clave)
+
+    def precio(self, clave):
+        producto = self.producto(clave)
+        if producto is None:
+            raise ValueError(f"Producto desconocido: {clave}")
+        return producto.precio
+
+    def por_categoria(self):
+        """Categoría -> productos, en el orden de CATEGORIAS"""
+        grupos = {categoria: [] for categoria in CATEGORIAS}
+        for producto in self.por_id.values():
+            grupos.setdefault(producto.categoria, []).append(producto)
+        return {categoria: productos for categoria, productos in grupos.items() if productos}
+
+    def registros(self):
+        return [producto.to_dict() for producto in self.por_id.values()]
+
+    # --------------------------------------------
+    # Cambios
+    # --------------------------------------------
+    def agregar(self, nombre, precio, categoria=OTROS):
+        if nombre in self.por_nombre:
+            raise ValueError("El producto ya existe")
+        producto = ProductoCatalogo(self._nuevo_id(categoria), nombre, categoria, precio)
+        self._indexar(producto)
+        return producto
+
+    def fijar_precio(self, clave, precio, fecha=None):
+        """Cambia el precio y lo agrega al historial"""
+        producto = self.producto(clave)
+        if producto is None:
+            raise ValueError(f"Producto desconocido: {clave}")
+        if precio != producto.precio:
+            producto.precio = precio
+            producto.historial.append((fecha or datetime.now().isoformat(), precio))
+            self.precios[producto.nombre] = precio
+        return producto
+
+    def eliminar(self, clave):
+        producto = self.producto(clave)
+        if producto is not None:
+            del self.por_id[producto.id]
+            del self.por_nombre[producto.nombre]
+            del self.precios[producto.nombre]
+        return producto
+
+    def aplicar(self, registros, eliminados=()):
+        """Aplica productos recibidos como diccionarios (to_dict) y elimina ids"""
+        for clave in eliminados:
+            self.eliminar(clave)
+        for registro in registros:
+            anterior = self.por_id.get(registro['id'])
+            if anterior is not None and anterior.nombre != registro['nombre']:
+                self.eliminar(anterior.id)
+            self._indexar(ProductoCatalogo.from_dict(registro))
+
+    # --------------------------------------------
+    # Auxiliares
+    # --------------------------------------------
+    def _indexar(self, producto):
+        self.por_id[producto.id] = producto
+        self.por_nombre[producto.nombre] = producto
+        self.precios[producto.nombre] = producto.precio
+
+    def _nuevo_id(self, categoria, productos=None):
+        prefijo = CATEGORIAS.get(categoria, CATEGORIAS[OTROS])
+        usados = [int(clave[len(prefijo) + 1:]) for clave in (productos or self.por_id)
+                  if clave.startswith(prefijo + "-") and clave[len(prefijo) + 1:].isdigit()]
+        return f"{prefijo}-{max(usados, default=0) + 1:03d}"
+
+    def _importar(self):
+        """Catálogo inicial: productos base más los precios de data/precios.json"""
+        productos = {}
+        nombres = {}
+        for categoria, nombre, precio in PRODUCTOS_BASE:
+            producto = ProductoCatalogo(self._nuevo_id(categoria, productos), nombre, categoria, precio)
+            productos[producto.id] = nombres[nombre] = producto
+
+        guardados = abrir_coleccion(self.precios_file, {}).cargar() if os.path.exists(self.precios_file) else {}
+        for nombre, precio in guardados.items():
+            if nombre in nombres:
+                producto = nombres[nombre]
+                producto.precio = precio
+                producto.historial = [(producto.historial[0][0], precio)]
+            else:
+                producto = ProductoCatalogo(self._nuevo_id(OTROS, productos), nombre, OTROS, precio)
+                productos[producto.id] = nombres[nombre] = producto
+        return productos
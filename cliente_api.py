@@ -0,0 +1,156 @@
+"""Clientes del servidor local (servidor.py) para las ventanas de ventas e inventario.
+
+Si la variable de entorno TEXTILES_SERVIDOR tiene la dirección del servidor
+(p.ej. http://127.0.0.1:8765), las ventanas usan estos servicios remotos en
+lugar de escribir los archivos de datos directamente. Ofrecen la misma
+interfaz que ServicioVentas y ServicioInventario.
+"""
+import json
+from urllib import request, error
+from urllib.parse import urlencode
+
+from catalogo import Catalogo, ProductoCatalogo
+from servicios import SERVIDOR, ServicioInventario, ServicioVentas
+from tabla_compacta import TablaCompacta
+
+TIEMPO_ESPERA = 10
+
+
+def solicitar(metodo, ruta, datos=None, consulta=None, servidor=None):
+    """Llama a una ruta del servidor y devuelve la respuesta JSON.
+
+    Los rechazos del servidor (stock insuficiente, datos inválidos) se
+    reportan como ValueError con su mensaje; la falta de conexión como
+    ConnectionError.
+    """
+    url = (servidor or SERVIDOR).rstrip("/") + ruta
+    if consulta:
+        url += "?" + urlencode(consulta)
+    cuerpo = json.dumps(datos).encode("utf-8") if datos is not None else None
+    solicitud = request.Request(url, data=cuerpo, method=metodo,
+                                headers={"Content-Type": "application/json"})
+    try:
+        with request.urlopen(solicitud, timeout=TIEMPO_ESPERA) as respuesta:
+            return json.loads(respuesta.read())
+    except error.HTTPError as e:
+        try:
+            mensaje = json.loads(e.read()).get("error", e.reason)
+        except ValueError:
+            mensaje = e.reason
+        raise ValueError(mensaje) from None
+    except error.URLError as e:
+        raise ConnectionError(f"No se pudo conectar con el servidor {url}: {e.reason}") from None
+
+
+class ServicioInventarioRemoto(ServicioInventario):
+    """Copia local del catálogo y el stock; los cambios se envían al servidor por producto"""
+
+    def __init__(self, servidor=None):
+        self.servidor = servidor or SERVIDOR
+        self.catalogo = Catalogo(data_dir=None)
+        self.productos = self.catalogo.precios
+        self.stock = TablaCompacta(self.catalogo.indice, 'l')
+        self.cargar()
+
+    def cargar(self):
+        datos = solicitar("GET", "/stock", servidor=self.servidor)
+        self._actualizar(datos["catalogo"], datos["stock"])
+
+    def desactualizado(self):
+        """El servidor es la fuente de los datos; se recarga solo al refrescar"""
+        return False
+
+    def guardar(self, esperar=False):
+        """Envía solo los productos agregados, modificados o eliminados localmente"""
+        catalogo_previo, stock_previo = self._enviados
+        catalogo = {registro['id']: registro for registro in self.catalogo.registros()}
+        cambios = {
+            "catalogo": [r for clave, r in catalogo.items() if catalogo_previo.get(clave) != r],
+            "stock": {k: v for k, v in self.stock.items() if stock_previo.get(k) != v},
+            "eliminados": [clave for clave in catalogo_previo if clave not in catalogo],
+        }
+        if not any(cambios.values()):
+            return
+        datos = solicitar("POST", "/inventario", cambios, servidor=self.servidor)
+        self._actualizar(datos["catalogo"], datos["stock"])
+
+    def guardar_stock(self):
+        """El stock descontado ya quedó guardado en el servidor"""
+
+    def descontar(self, items):
+        """El servidor descuenta el stock y devuelve las existencias resultantes"""
+        datos = solicitar("POST", "/stock/reservar", {"items": items}, servidor=self.servidor)
+        self.aplicar_stock(datos["stock"])
+
+    def aplicar_stock(self, stock):
+        """Actualiza la copia local con existencias confirmadas por el servidor"""
+        self.stock.update(stock)
+        self._enviados[1].update(stock)
+
+    def _actualizar(self, catalogo, stock):
+        # Se conserva la identidad de los diccionarios que usan las ventanas
+        self.catalogo.actualizar({r['id']: ProductoCatalogo.from_dict(r) for r in catalogo})
+        self.stock.clear()
+        self.stock.update(stock)
+        self._enviados = ({r['id']: r for r in self.catalogo.registros()}, dict(stock))
+
+
+class ServicioVentasRemoto(ServicioVentas):
+    """Ventas registradas en el servidor, con una copia local para el historial"""
+
+    def __init__(self, servidor=None):
+        self.servidor = servidor or SERVIDOR
+        self.version = 0
+        self._ventas = None
+        self.cargar()
+
+    def cargar(self):
+        ventas = solicitar("GET", "/ventas", servidor=self.servidor)["ventas"]
+        if self._ventas is not None:
+            self._ventas[:] = ventas
+            self.version += 1
+        else:
+            self._ventas = ventas
+        return self._ventas
+
+    def desactualizado(self):
+        return False
+
+    def guardar(self):
+        """Las ventas ya quedan guardadas en el servidor al registrarlas"""
+
+    def registrar_venta(self, nombre, nit, metodo_pago, items, inventario=None, fecha=None,
+                        reservas=None, carrito=None):
+        """El servidor valida el stock (y la reserva del carrito), aplica sus precios y guarda la venta"""
+        if not items:
+            raise ValueError("El carrito está vacío")
+        if not nombre:
+            raise ValueError("Ingrese el nombre del cliente")
+
+        datos = solicitar("POST", "/ventas", {
+            "cliente": {"nombre": nombre, "nit": nit, "metodo_pago": metodo_pago},
+            "items": [{"producto": i['producto'], "cantidad": i['cantidad']} for i in items],
+            "carrito": carrito
+        }, servidor=self.servidor)
+
+        if inventario and hasattr(inventario, "aplicar_stock"):
+            inventario.aplicar_stock(datos["stock"])
+        self.ventas.append(datos["venta"])
+        return datos["venta"]
+
+
+def servicio_inventario(data_dir="data"):
+    """Servicio de inventario local, o remoto si hay servidor configurado"""
+    if SERVIDOR:
+        return ServicioInventarioRemoto()
+    return ServicioInventario(data_dir)
+
+
+def servicio_ventas(data_dir="data", diferido=False):
+    """Servicio de ventas local, o remoto si hay servidor configurado.
+
+    Con diferido=True el servicio local lee las ventas la primera vez que se usan.
+    """
+    if SERVIDOR:
+        return ServicioVentasRemoto()
+    return ServicioVentas(data_dir, diferido)
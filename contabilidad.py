@@ -0,0 +1,531 @@
+import bisect
+import calendar
+import json
+from datetime import date, timedelta
+from decimal import Decimal
+
+from dinero import Dinero, CERO
+from persistencia import escribir_json, leer_json
+
+
+class DecimalEncoder(json.JSONEncoder):
+    """Helper para serializar Decimal y Dinero a JSON (como texto)"""
+    def default(self, o):
+        if isinstance(o, (Decimal, Dinero)):
+            return str(o)
+        return super().default(o)
+
+
+# --------------------------------------------
+# Formato en disco del diario y el mayor
+# --------------------------------------------
+# Los montos se guardan como centavos enteros y cada movimiento como una
+# lista [cuenta, debe, haber, concepto]; al leer, json ya entrega enteros y
+# cada registro se convierte una sola vez, sin recorrer después el libro
+# completo ni convertir texto a Decimal. Los registros del formato anterior
+# (movimientos con montos en texto) se siguen leyendo y se reescriben en el
+# formato compacto al compactar la colección.
+
+def asiento_a_registro(asiento):
+    """Asiento -> registro compacto: {'id', 'fecha', 'origen', 'm': [[cuenta, debe, haber, concepto]]}"""
+    registro = asiento.copy()
+    registro['m'] = [[mov['cuenta'], mov['debe'].centavos, mov['haber'].centavos, mov.get('concepto', "")]
+                     for mov in registro.pop('movimientos')]
+    return registro
+
+
+def asiento_de_registro(registro):
+    movimientos = registro.pop('m', None)
+    if movimientos is None:  # Formato anterior
+        for mov in registro.get('movimientos', ()):
+            mov['debe'] = Dinero.de(mov['debe'])
+            mov['haber'] = Dinero.de(mov['haber'])
+        return registro
+    # Cada movimiento tiene debe o haber en cero: se comparte CERO (Dinero es inmutable)
+    registro['movimientos'] = [{'cuenta': cuenta, 'debe': Dinero(debe) if debe else CERO,
+                                'haber': Dinero(haber) if haber else CERO, 'concepto': concepto}
+                               for cuenta, debe, haber, concepto in movimientos]
+    return registro
+
+
+# Clave con la que se guarda, junto a las cuentas del mayor, hasta qué asiento
+# del diario están aplicados sus totales (ver ServicioContable.actualizar_mayor)
+MARCA_MAYOR = "_marca"
+
+
+def cuenta_a_registro(datos):
+    """Totales de una cuenta del mayor -> [debe, haber, saldo] en centavos"""
+    if 'posicion' in datos:
+        return datos  # MARCA_MAYOR
+    return [datos['debe'].centavos, datos['haber'].centavos, datos['saldo'].centavos]
+
+
+def cuenta_de_registro(registro):
+    if isinstance(registro, dict) and 'posicion' in registro:
+        return registro  # MARCA_MAYOR
+    if isinstance(registro, list):
+        debe, haber, saldo = registro
+        return {'debe': Dinero(debe), 'haber': Dinero(haber), 'saldo': Dinero(saldo)}
+    return {campo: Dinero.de(registro[campo]) for campo in ('debe', 'haber', 'saldo')}  # Formato anterior
+
+
+class IndiceOrigenes:
+    """Índice origen -> id de asiento del libro diario.
+
+    Se reconstruye al cargar el libro diario y se mantiene al registrar cada
+    asiento, de modo que verificar si una venta o planilla ya fue contabilizada
+    es una búsqueda en diccionario.
+    """
+
+    def __init__(self, libro_diario=()):
+        self.asientos = {}
+        self.reconstruir(libro_diario)
+
+    def reconstruir(self, libro_diario):
+        self.asientos = {}
+        for asiento in libro_diario:
+            self.registrar(asiento)
+
+    def registrar(self, asiento):
+        origen = asiento.get('origen')
+        if origen and origen != "manual":
+            self.asientos[origen] = asiento['id']
+
+    def obtener(self, origen):
+        return self.asientos.get(origen)
+
+    def __contains__(self, origen):
+        return origen in self.asientos
+
+    def __len__(self):
+        return len(self.asientos)
+
+
+class MarcasSincronizacion:
+    """Posición hasta la que cada lista de origen ya fue contabilizada.
+
+    Guarda, por nombre de origen, cuántos registros se procesaron y el id del
+    último, para que una sincronización solo recorra los registros nuevos. Si la
+    lista cambió (el último id no coincide) se vuelve a recorrer desde el inicio.
+    """
+
+    def __init__(self, archivo):
+        self.archivo = archivo
+        self.marcas = leer_json(archivo, {})
+
+    def inicio(self, nombre, registros, clave='id'):
+        """Índice del primer registro aún no sincronizado"""
+        marca = self.marcas.get(nombre)
+        if not marca:
+            return 0
+        posicion = marca['posicion']
+        if 0 < posicion <= len(registros) and registros[posicion - 1].get(clave) == marca['ultimo']:
+            return posicion
+        return 0
+
+    def avanzar(self, nombre, registros, hasta=None, clave='id'):
+        """Marca como sincronizados los registros anteriores a 'hasta'"""
+        posicion = len(registros) if hasta is None else hasta
+        marca = {
+            'posicion': posicion,
+            'ultimo': registros[posicion - 1].get(clave) if posicion else None
+        }
+        if self.marcas.get(nombre) != marca:
+            self.marcas[nombre] = marca
+            escribir_json(self.archivo, self.marcas)
+
+
+class CatalogoCuentas:
+    """Índice plano del catálogo de cuentas: código -> nombre, tipo, grupo y cuenta padre.
+
+    El catálogo se define anidado (grupos con 'subcuentas', que a su vez pueden
+    tener subcuentas) y se recorre una sola vez al crearlo; después consultar
+    una cuenta es una búsqueda en diccionario, sin importar cuántas tenga el
+    catálogo. Las cuentas sin subcuentas son las imputables en los asientos.
+    """
+
+    def __init__(self, grupos):
+        self.grupos = grupos
+        self.cuentas = {}      # Código -> {'nombre', 'tipo', 'grupo', 'padre', 'nivel', 'imputable'}
+        self.imputables = []   # Códigos de las cuentas sin subcuentas, en orden
+        self.hijos = {}        # Código -> subcuentas directas (None -> grupos principales)
+        self.ancestros = {}    # Código -> (código, padre, abuelo, ...) hasta el grupo
+        for codigo, grupo in grupos.items():
+            self._indexar(codigo, grupo, grupo['nombre'], None, 0, "debito")
+        self._lista = sorted(f"{codigo} - {self.cuentas[codigo]['nombre']}" for codigo in self.imputables)
+
+    @classmethod
+    def cargar(cls, archivo, default):
+        """Catálogo del archivo (mismo formato anidado que default) o default si no existe"""
+        return cls(leer_json(archivo, default))
+
+    def _indexar(self, codigo, datos, grupo, padre, nivel, tipo):
+        subcuentas = datos.get('subcuentas') or {}
+        imputable = not subcuentas and padre is not None
+        self.cuentas[codigo] = {
+            'nombre': datos['nombre'],
+            'tipo': datos.get('tipo', tipo),  # Sin tipo, el de la cuenta padre
+            'grupo': grupo,
+            'padre': padre,
+            'nivel': nivel,
+            'imputable': imputable
+        }
+        self.hijos.setdefault(padre, []).append(codigo)
+        self.ancestros[codigo] = (codigo,) + (self.ancestros[padre] if padre is not None else ())
+        if imputable:
+            self.imputables.append(codigo)
+        for subcodigo, subdatos in subcuentas.items():
+            if subcodigo not in self.cuentas:  # Si un código se repite vale el primero
+                self._indexar(subcodigo, subdatos, grupo, codigo, nivel + 1, self.cuentas[codigo]['tipo'])
+
+    def nombre(self, codigo):
+        cuenta = self.cuentas.get(codigo)
+        return cuenta['nombre'] if cuenta else "Cuenta no definida"
+
+    def tipo(self, codigo):
+        cuenta = self.cuentas.get(codigo)
+        return cuenta['tipo'] if cuenta else "debito"
+
+    def grupo(self, codigo):
+        cuenta = self.cuentas.get(codigo)
+        return cuenta['grupo'] if cuenta and cuenta['padre'] is not None else "OTROS"
+
+    def padre(self, codigo):
+        cuenta = self.cuentas.get(codigo)
+        return cuenta['padre'] if cuenta else None
+
+    def es_imputable(self, codigo):
+        cuenta = self.cuentas.get(codigo)
+        return cuenta is not None and cuenta['imputable']
+
+    def lista(self):
+        """'código - nombre' de las cuentas imputables, ordenadas (para Combobox)"""
+        return self._lista
+
+    def acumular(self, saldos):
+        """Subtotal de cada cuenta con sus subcuentas, en una sola pasada por los saldos.
+
+        El saldo de cada cuenta se suma a ella y a todas sus cuentas padre; las
+        cuentas que no están en el catálogo se ignoran.
+        """
+        centavos = {}
+        for codigo, datos in saldos.items():
+            saldo = datos['saldo'].centavos
+            for cuenta in self.ancestros.get(codigo, ()):
+                centavos[cuenta] = centavos.get(cuenta, 0) + saldo
+        return {cuenta: Dinero(total) for cuenta, total in centavos.items()}
+
+
+class EstadosFinancieros:
+    """Balance general y estado de resultados calculados de una vez a partir de unos saldos.
+
+    Los subtotales de todos los niveles del catálogo (1101 -> 11 -> 1) salen de
+    una sola pasada por los saldos (CatalogoCuentas.acumular); los reportes
+    solo los leen. El resultado del período (ingresos - gastos) aparece en el
+    balance como RESULTADOS.
+    """
+
+    GRUPOS_BALANCE = ("ACTIVOS", "PASIVOS", "PATRIMONIO")
+    GRUPOS_RESULTADOS = ("INGRESOS", "GASTOS")
+
+    def __init__(self, catalogo, saldos):
+        self.catalogo = catalogo
+        self.subtotales = catalogo.acumular(saldos)
+        self.codigos_grupo = {catalogo.cuentas[codigo]['nombre']: codigo for codigo in catalogo.hijos.get(None, ())}
+        self.ingresos = self.total("INGRESOS")
+        self.gastos = self.total("GASTOS")
+        self.utilidad = self.ingresos - self.gastos
+
+    def subtotal(self, codigo):
+        return self.subtotales.get(codigo, CERO)
+
+    def total(self, grupo):
+        """Total de un grupo principal por nombre (ACTIVOS, INGRESOS...)"""
+        codigo = self.codigos_grupo.get(grupo)
+        return self.subtotal(codigo) if codigo is not None else CERO
+
+    def balance(self):
+        """[(grupo, total)] del balance general, con el resultado del período"""
+        totales = [(grupo, self.total(grupo)) for grupo in self.GRUPOS_BALANCE]
+        totales.append(("RESULTADOS", self.utilidad))
+        return totales
+
+    def detalle(self, grupo, minimo=Dinero(1)):
+        """(código, nivel, subtotal) de las subcuentas de un grupo con saldo, en el orden del catálogo"""
+        codigo = self.codigos_grupo.get(grupo)
+        pendientes = list(reversed(self.catalogo.hijos.get(codigo, []))) if codigo is not None else []
+        while pendientes:
+            cuenta = pendientes.pop()
+            if cuenta not in self.subtotales:
+                continue  # Ni la cuenta ni sus subcuentas tienen movimientos
+            if abs(self.subtotales[cuenta]) > minimo:
+                yield cuenta, self.catalogo.cuentas[cuenta]['nivel'], self.subtotales[cuenta]
+            pendientes.extend(reversed(self.catalogo.hijos.get(cuenta, [])))
+
+
+class MayorIncremental:
+    """Libro mayor mantenido de forma incremental a partir del libro diario.
+
+    Cada asiento nuevo suma sus movimientos a los totales debe/haber de las
+    cuentas afectadas y recalcula solo esos saldos. reconstruir() recalcula
+    todo desde cero y verificar() compara los totales con un recálculo completo.
+    """
+
+    def __init__(self, cuentas, tipo_cuenta):
+        self.cuentas = cuentas
+        self.tipo_cuenta = tipo_cuenta
+        self.version = 0  # Aumenta con cada cambio (invalida los reportes calculados)
+
+    def aplicar(self, asientos):
+        """Aplica una secuencia de asientos nuevos"""
+        for asiento in asientos:
+            self.aplicar_asiento(asiento)
+
+    def aplicar_asiento(self, asiento):
+        """Suma los movimientos de un asiento y actualiza los saldos afectados"""
+        for mov in asiento['movimientos']:
+            cuenta = mov['cuenta']
+            datos = self.cuentas.get(cuenta)
+            if datos is None:
+                datos = self.cuentas[cuenta] = {
+                    "debe": CERO,
+                    "haber": CERO,
+                    "saldo": CERO
+                }
+            datos["debe"] += Dinero.de(mov['debe'])
+            datos["haber"] += Dinero.de(mov['haber'])
+            self._calcular_saldo(cuenta, datos)
+        self.version += 1
+
+    def reconstruir(self, libro_diario):
+        """Recalcula el mayor completo a partir de todo el diario"""
+        self.cuentas.clear()
+        self.version += 1
+        self.aplicar(libro_diario)
+
+    def control(self):
+        """[debe, haber] de todas las cuentas en centavos, para verificar la marca guardada con el mayor"""
+        return [sum(datos['debe'].centavos for datos in self.cuentas.values()),
+                sum(datos['haber'].centavos for datos in self.cuentas.values())]
+
+    def reemplazar(self, saldos):
+        """Reemplaza los totales de todas las cuentas (p.ej. por los de un cierre)"""
+        self.cuentas.clear()
+        self.cuentas.update(saldos)
+        self.version += 1
+
+    def verificar(self, libro_diario):
+        """Cuentas cuyo total incremental difiere de un recálculo completo"""
+        recalculado = MayorIncremental({}, self.tipo_cuenta)
+        recalculado.aplicar(libro_diario)
+        diferencias = []
+        for cuenta in sorted(set(self.cuentas) | set(recalculado.cuentas)):
+            actual = self.cuentas.get(cuenta)
+            esperado = recalculado.cuentas.get(cuenta)
+            if actual is None or esperado is None or any(
+                    actual[campo] != esperado[campo] for campo in ("debe", "haber", "saldo")):
+                diferencias.append((cuenta, actual, esperado))
+        return diferencias
+
+    def _calcular_saldo(self, cuenta, datos):
+        if self.tipo_cuenta(cuenta) == "debito":
+            datos["saldo"] = datos["debe"] - datos["haber"]
+        else:
+            datos["saldo"] = datos["haber"] - datos["debe"]
+
+
+def fecha_dia(fecha):
+    """Parte de fecha (YYYY-MM-DD) de un valor ISO con o sin hora"""
+    return fecha[:10]
+
+
+def validar_fecha(fecha):
+    """Verifica que la fecha sea un texto ISO (YYYY-MM-DD, con o sin hora)"""
+    try:
+        date.fromisoformat(fecha_dia(fecha))
+    except (TypeError, ValueError):
+        raise ValueError(f"Fecha inválida: {fecha}") from None
+
+
+def validar_asiento(asiento):
+    """Verifica la fecha y que los movimientos cuadren antes de agregar un asiento al diario"""
+    validar_fecha(asiento.get('fecha'))
+    movimientos = asiento.get('movimientos')
+    if not movimientos:
+        raise ValueError("El asiento no tiene movimientos")
+    for mov in movimientos:
+        if not isinstance(mov['debe'], Dinero) or not isinstance(mov['haber'], Dinero) \
+                or mov['debe'] < 0 or mov['haber'] < 0:
+            raise ValueError(f"Montos inválidos en la cuenta {mov['cuenta']}")
+    debe = Dinero.sumar(mov['debe'] for mov in movimientos)
+    haber = Dinero.sumar(mov['haber'] for mov in movimientos)
+    if debe != haber:
+        raise ValueError(f"El asiento no cuadra: debe Q{debe} / haber Q{haber}")
+
+
+class IndiceFechas:
+    """Posiciones de una lista de registros ordenadas por fecha, para búsquedas por rango"""
+
+    def __init__(self, registros=(), campo='fecha'):
+        self.campo = campo
+        self.claves = []
+        self.reconstruir(registros)
+
+    def reconstruir(self, registros):
+        self.claves = sorted((fecha_dia(r[self.campo]), pos) for pos, r in enumerate(registros))
+
+    def agregar(self, registro, posicion):
+        bisect.insort(self.claves, (fecha_dia(registro[self.campo]), posicion))
+
+    def posiciones_entre(self, desde=None, hasta=None):
+        """Posiciones con fecha en (desde, hasta]; None significa sin límite"""
+        inicio = 0 if desde is None else bisect.bisect_right(self.claves, (desde, float('inf')))
+        fin = len(self.claves) if hasta is None else bisect.bisect_right(self.claves, (hasta, float('inf')))
+        return [pos for _, pos in self.claves[inicio:fin]]
+
+
+class CierresContables:
+    """Cierres mensuales/anuales con los saldos acumulados de cada cuenta.
+
+    Cada cierre guarda los totales debe/haber/saldo por cuenta y los totales de
+    IVA acumulados hasta el fin del período. Los reportes por rango de fechas
+    parten del cierre más cercano y solo reaplican los asientos posteriores.
+    Registrar un asiento con fecha dentro de un período cerrado invalida ese
+    cierre y los siguientes.
+    """
+
+    CAMPOS_IVA = ("subtotal", "iva", "total")
+
+    def __init__(self, archivo, libro_diario, registro_iva, tipo_cuenta):
+        self.archivo = archivo
+        self.libro_diario = libro_diario
+        self.registro_iva = registro_iva
+        self.tipo_cuenta = tipo_cuenta
+
+        self.indice_diario = IndiceFechas(libro_diario)
+        self.indices_iva = {tipo: IndiceFechas(registros) for tipo, registros in registro_iva.items()}
+        self.cierres = self._cargar()
+
+    # --------------------------------------------
+    # Registro de movimientos
+    # --------------------------------------------
+    def registrar_asiento(self, asiento, posicion=None):
+        """Indexa un asiento recién agregado al libro diario"""
+        if posicion is None:
+            posicion = len(self.libro_diario) - 1
+        self.indice_diario.agregar(asiento, posicion)
+        self.invalidar_desde(fecha_dia(asiento['fecha']))
+
+    def registrar_iva(self, tipo, registro, posicion=None):
+        """Indexa un registro recién agregado al libro de IVA (compras/ventas)"""
+        if posicion is None:
+            posicion = len(self.registro_iva[tipo]) - 1
+        self.indices_iva[tipo].agregar(registro, posicion)
+        self.invalidar_desde(fecha_dia(registro['fecha']))
+
+    def invalidar_desde(self, fecha):
+        """Descarta los cierres cuyo período incluye la fecha dada o es posterior"""
+        vigentes = [c for c in self.cierres if c['hasta'] < fecha]
+        if len(vigentes) != len(self.cierres):
+            self.cierres = vigentes
+            self._guardar()
+
+    # --------------------------------------------
+    # Cierres
+    # --------------------------------------------
+    def cerrar_hasta(self, fecha):
+        """Crea los cierres mensuales pendientes hasta el último mes completo anterior a fecha"""
+        ultimo_mes = date.fromisoformat(fecha_dia(fecha)).replace(day=1) - timedelta(days=1)
+        if self.cierres:
+            siguiente = date.fromisoformat(self.cierres[-1]['hasta']) + timedelta(days=1)
+        elif self.indice_diario.claves:
+            siguiente = date.fromisoformat(self.indice_diario.claves[0][0]).replace(day=1)
+        else:
+            return []
+
+        nuevos = []
+        while siguiente <= ultimo_mes:
+            fin = siguiente.replace(day=calendar.monthrange(siguiente.year, siguiente.month)[1])
+            cuentas = self.saldos_al(fin.isoformat())
+            iva = {tipo: self.iva_al(tipo, fin.isoformat()) for tipo in self.indices_iva}
+            cierre = {
+                "periodo": fin.strftime("%Y-%m"),
+                "tipo": "anual" if fin.month == 12 else "mensual",
+                "hasta": fin.isoformat(),
+                "cuentas": {c: {k: str(v) for k, v in d.items()} for c, d in cuentas.items()},
+                "iva": {t: {k: str(v) for k, v in d.items()} for t, d in iva.items()}
+            }
+            self.cierres.append(cierre)
+            nuevos.append(cierre)
+            siguiente = fin + timedelta(days=1)
+
+        if nuevos:
+            self._guardar()
+        return nuevos
+
+    def cierre_al(self, fecha=None):
+        """Último cierre con fin de período en o antes de fecha (o el último si no hay fecha)"""
+        if fecha is None:
+            return self.cierres[-1] if self.cierres else None
+        posicion = bisect.bisect_right([c['hasta'] for c in self.cierres], fecha)
+        return self.cierres[posicion - 1] if posicion else None
+
+    # --------------------------------------------
+    # Reportes
+    # --------------------------------------------
+    def saldos_al(self, fecha=None):
+        """Totales por cuenta acumulados hasta fecha inclusive (o hasta el último asiento)"""
+        cierre = self.cierre_al(fecha)
+        cuentas = {}
+        if cierre:
+            cuentas = {c: {k: Dinero.de(v) for k, v in d.items()} for c, d in cierre['cuentas'].items()}
+
+        mayor = MayorIncremental(cuentas, self.tipo_cuenta)
+        for posicion in self.indice_diario.posiciones_entre(cierre['hasta'] if cierre else None, fecha):
+            mayor.aplicar_asiento(self.libro_diario[posicion])
+        return cuentas
+
+    def saldos_entre(self, desde, hasta):
+        """Totales por cuenta de los asientos con fecha entre desde y hasta"""
+        final = self.saldos_al(hasta)
+        inicial = self.saldos_al(self._dia_anterior(desde))
+
+        cuentas = {}
+        for cuenta, datos in final.items():
+            previo = inicial.get(cuenta)
+            debe = datos['debe'] - (previo['debe'] if previo else CERO)
+            haber = datos['haber'] - (previo['haber'] if previo else CERO)
+            saldo = debe - haber if self.tipo_cuenta(cuenta) == "debito" else haber - debe
+            cuentas[cuenta] = {"debe": debe, "haber": haber, "saldo": saldo}
+        return cuentas
+
+    def iva_al(self, tipo, fecha):
+        """Totales de IVA (subtotal, iva, total) acumulados hasta fecha"""
+        cierre = self.cierre_al(fecha)
+        totales = {campo: CERO for campo in self.CAMPOS_IVA}
+        if cierre and tipo in cierre['iva']:
+            totales = {campo: Dinero.de(valor) for campo, valor in cierre['iva'][tipo].items()}
+
+        registros = self.registro_iva[tipo]
+        for posicion in self.indices_iva[tipo].posiciones_entre(cierre['hasta'] if cierre else None, fecha):
+            for campo in self.CAMPOS_IVA:
+                totales[campo] += Dinero.de(registros[posicion][campo])
+        return totales
+
+    def iva_entre(self, tipo, desde, hasta):
+        """Totales de IVA de los registros con fecha entre desde y hasta"""
+        final = self.iva_al(tipo, hasta)
+        inicial = self.iva_al(tipo, self._dia_anterior(desde))
+        return {campo: final[campo] - inicial[campo] for campo in self.CAMPOS_IVA}
+
+    # --------------------------------------------
+    # Auxiliares
+    # --------------------------------------------
+    def _dia_anterior(self, fecha):
+        return (date.fromisoformat(fecha_dia(fecha)) - timedelta(days=1)).isoformat()
+
+    def _cargar(self):
+        return sorted(leer_json(self.archivo, []), key=lambda c: c['hasta'])
+
+    def _guardar(self):
+        escribir_json(self.archivo, self.cierres)
@@ -0,0 +1,110 @@
+"""Datos compartidos por las ventanas abiertas desde el menú principal.
+
+cliente_api (y con él urllib) se importa recién al pedir el inventario o las
+ventas, para no cargarlo al abrir el menú.
+"""
+from eventos import BusEventos, VENTA_CREADA, TICKET_CREADO, ASIENTO_REGISTRADO
+from persistencia import abrir_coleccion
+from reservas import reservas_para
+from servicios import ServicioContable, CONTABILIDAD_AUTOMATICA, SERVIDOR, reemplazar
+
+
+class ContextoDatos:
+    """Carga cada conjunto de datos una sola vez y entrega los mismos objetos a todas las ventanas.
+
+    Antes de entregar un conjunto se compara la marca de sus archivos (mtime y
+    tamaño) con la de la última carga o guardado de este proceso, y solo se
+    vuelve a leer si otro proceso lo modificó. Las recargas reemplazan el
+    contenido de los mismos diccionarios y listas, así todas las ventanas que
+    los tienen ven los mismos datos.
+
+    Con la contabilidad automática cada venta o ticket completado se registra
+    al momento en el diario, el registro de IVA y el mayor (con servidor, lo
+    hace el servidor).
+    """
+
+    def __init__(self, data_dir="data", rrhh_dir="data_rrhh", finanzas_dir="data_finanzas",
+                 contabilidad_automatica=CONTABILIDAD_AUTOMATICA):
+        self.data_dir = data_dir
+        self.rrhh_dir = rrhh_dir
+        self.finanzas_dir = finanzas_dir
+        self._inventario = None
+        self._ventas = None
+        self._contable = None
+        self._reservas = None
+        self._colecciones = {}  # archivo -> (colección, datos)
+        self.eventos = BusEventos()  # Avisos de cambios entre las ventanas
+
+        if contabilidad_automatica and not SERVIDOR:
+            self.eventos.suscribir(VENTA_CREADA, self.contabilizar_venta)
+            self.eventos.suscribir(TICKET_CREADO, self.contabilizar_ticket)
+
+    def inventario(self):
+        """Servicio de inventario (catálogo de precios y stock) compartido"""
+        if self._inventario is None:
+            from cliente_api import servicio_inventario
+            self._inventario = servicio_inventario(self.data_dir)
+            self._inventario.asincrono = True
+        elif self._inventario.desactualizado():
+            self._inventario.cargar()
+        return self._inventario
+
+    def ventas(self):
+        """Servicio de ventas compartido (las ventas se leen la primera vez que se usan)"""
+        if self._ventas is None:
+            from cliente_api import servicio_ventas
+            self._ventas = servicio_ventas(self.data_dir, diferido=True)
+            self._ventas.asincrono = True
+        elif self._ventas.desactualizado():
+            self._ventas.cargar()
+        return self._ventas
+
+    def contable(self):
+        """Servicio contable compartido (diario, mayor, IVA y cierres)"""
+        if self._contable is None:
+            self._contable = ServicioContable(self.finanzas_dir)
+        return self._contable
+
+    def reservas(self):
+        """Reservas de stock de los carritos (ver reservas.py)"""
+        if self._reservas is None:
+            self._reservas = reservas_para(self.data_dir)
+        return self._reservas
+
+    def datos(self, archivo, default):
+        """Datos de una colección compartida (empleados, contratados...)"""
+        if archivo not in self._colecciones:
+            coleccion = abrir_coleccion(archivo, default)
+            self._colecciones[archivo] = (coleccion, coleccion.cargar())
+        coleccion, datos = self._colecciones[archivo]
+        if coleccion.modificada_externamente():
+            reemplazar(datos, coleccion.cargar())
+        return datos
+
+    def coleccion(self, archivo, default):
+        """Colección con la que se guardan los datos entregados por datos()"""
+        self.datos(archivo, default)
+        return self._colecciones[archivo][0]
+
+    def refrescar(self):
+        """Recarga lo que cambió en disco; con servidor vuelve a pedir inventario y ventas"""
+        for servicio in (self._inventario, self._ventas):
+            if servicio and (getattr(servicio, "servidor", None) or servicio.desactualizado()):
+                servicio.cargar()
+        for coleccion, datos in self._colecciones.values():
+            if coleccion.modificada_externamente():
+                reemplazar(datos, coleccion.cargar())
+
+    # --------------------------------------------
+    # Contabilidad automática
+    # --------------------------------------------
+    def contabilizar_venta(self, venta):
+        ventas = self._ventas.ventas if self._ventas else None
+        self._registrar(self.contable().contabilizar_inmediato(venta, ventas))
+
+    def contabilizar_ticket(self, ticket):
+        self._registrar(self.contable().contabilizar_ticket(ticket))
+
+    def _registrar(self, asiento):
+        if asiento:
+            self.eventos.emitir(ASIENTO_REGISTRADO, asiento=asiento)
@@ -0,0 +1,184 @@
+"""Montos en quetzales guardados como centavos enteros.
+
+Ventas, tickets, planillas y la contabilidad calculan con Dinero en lugar de
+float o Decimal: sumar y restar son operaciones entre enteros, no hay errores
+de redondeo acumulados y todos los módulos redondean igual. Cada conversión
+desde otro tipo, multiplicación o división redondea al centavo con
+REDONDEO (mitad hacia arriba), una sola vez.
+
+En JSON los montos se guardan como texto con dos decimales ("1428.57") en
+los libros contables, y como número en ventas, tickets y planillas.
+"""
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+REDONDEO = ROUND_HALF_UP
+_CENTAVO = Decimal(1)
+
+
+class Dinero:
+    """Monto inmutable en centavos enteros"""
+
+    __slots__ = ('centavos',)
+
+    def __init__(self, centavos=0):
+        self.centavos = centavos
+
+    @classmethod
+    def de(cls, valor):
+        """Monto a partir de un Dinero, número o texto ("1428.57"), redondeado al centavo"""
+        if isinstance(valor, Dinero):
+            return valor
+        if isinstance(valor, int):
+            return cls(valor * 100)
+        if isinstance(valor, str):
+            centavos = _centavos_texto(valor)
+            if centavos is not None:
+                return cls(centavos)
+        elif isinstance(valor, float):
+            valor = repr(valor)  # 0.1 -> "0.1", no 0.1000000000000000055...
+        try:
+            return cls(int((Decimal(valor) * 100).quantize(_CENTAVO, REDONDEO)))
+        except (InvalidOperation, TypeError):
+            raise ValueError(f"Monto inválido: {valor}") from None
+
+    @classmethod
+    def sumar(cls, montos):
+        """Suma de montos (Dinero) sumando los centavos como enteros"""
+        return cls(sum(monto.centavos for monto in montos))
+
+    # --------------------------------------------
+    # Conversiones
+    # --------------------------------------------
+    def to_decimal(self):
+        return Decimal(self.centavos).scaleb(-2)
+
+    def __float__(self):
+        return self.centavos / 100
+
+    def __str__(self):
+        signo = "-" if self.centavos < 0 else ""
+        quetzales, centavos = divmod(abs(self.centavos), 100)
+        return f"{signo}{quetzales}.{centavos:02d}"
+
+    def __repr__(self):
+        return f"Dinero('{self}')"
+
+    def __format__(self, formato):
+        return format(self.to_decimal(), formato) if formato else str(self)
+
+    # --------------------------------------------
+    # Aritmética
+    # --------------------------------------------
+    def __add__(self, otro):
+        if isinstance(otro, Dinero):
+            return Dinero(self.centavos + otro.centavos)
+        if otro == 0 and isinstance(otro, int):
+            return self  # sum() empieza con 0
+        return NotImplemented
+
+    __radd__ = __add__
+
+    def __sub__(self, otro):
+        if isinstance(otro, Dinero):
+            return Dinero(self.centavos - otro.centavos)
+        if otro == 0 and isinstance(otro, int):
+            return self
+        return NotImplemented
+
+    def __rsub__(self, otro):
+        if otro == 0 and isinstance(otro, int):
+            return -self
+        return NotImplemented
+
+    def __neg__(self):
+        return Dinero(-self.centavos)
+
+    def __pos__(self):
+        return self
+
+    def __abs__(self):
+        return Dinero(abs(self.centavos))
+
+    def __mul__(self, factor):
+        """Por una cantidad o tasa; el resultado se redondea al centavo"""
+        if isinstance(factor, Dinero):
+            return NotImplemented
+        if isinstance(factor, int):
+            return Dinero(self.centavos * factor)
+        if isinstance(factor, float):
+            factor = Decimal(repr(factor))
+        return Dinero(int((self.centavos * Decimal(factor)).quantize(_CENTAVO, REDONDEO)))
+
+    __rmul__ = __mul__
+
+    def __truediv__(self, divisor):
+        if isinstance(divisor, Dinero):
+            return NotImplemented
+        if isinstance(divisor, float):
+            divisor = Decimal(repr(divisor))
+        return Dinero(int((self.centavos / Decimal(divisor)).quantize(_CENTAVO, REDONDEO)))
+
+    def desglosar_iva(self, tasa):
+        """(base, iva) de un total con IVA incluido.
+
+        La base se redondea al centavo y el IVA es la diferencia, así
+        base + iva es siempre exactamente el total.
+        """
+        base = self / (1 + Decimal(tasa))
+        return base, self - base
+
+    # --------------------------------------------
+    # Comparaciones (con Dinero o con números)
+    # --------------------------------------------
+    def _comparable(self, otro):
+        """(propio, otro) comparables sin redondear el otro valor, o None"""
+        if isinstance(otro, Dinero):
+            return self.centavos, otro.centavos
+        if isinstance(otro, int):
+            return self.centavos, otro * 100
+        if isinstance(otro, (float, Decimal)):
+            return self.to_decimal(), otro  # Decimal compara exacto con float
+        return None
+
+    def __eq__(self, otro):
+        valores = self._comparable(otro)
+        return NotImplemented if valores is None else valores[0] == valores[1]
+
+    def __lt__(self, otro):
+        valores = self._comparable(otro)
+        return NotImplemented if valores is None else valores[0] < valores[1]
+
+    def __le__(self, otro):
+        valores = self._comparable(otro)
+        return NotImplemented if valores is None else valores[0] <= valores[1]
+
+    def __gt__(self, otro):
+        valores = self._comparable(otro)
+        return NotImplemented if valores is None else valores[0] > valores[1]
+
+    def __ge__(self, otro):
+        valores = self._comparable(otro)
+        return NotImplemented if valores is None else valores[0] >= valores[1]
+
+    def __hash__(self):
+        # Igual al hash del número equivalente, como exige __eq__
+        return hash(self.to_decimal())
+
+    def __bool__(self):
+        return self.centavos != 0
+
+
+CERO = Dinero(0)
+
+
+def _centavos_texto(texto):
+    """Centavos de un texto con hasta dos decimales ("-1428.5"), sin pasar por Decimal; None si tiene otro formato"""
+    entero, _, decimales = texto.strip().partition(".")
+    negativo = entero.startswith("-")
+    if negativo:
+        entero = entero[1:]
+    if len(decimales) > 2 or not (entero.isdecimal() or (not entero and decimales)) \
+            or (decimales and not decimales.isdecimal()):
+        return None
+    centavos = int(entero or 0) * 100 + int(decimales.ljust(2, "0") or 0)
+    return -centavos if negativo else centavos
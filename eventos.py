@@ -0,0 +1,42 @@
+"""Avisos de cambios entre los módulos de inventario, ventas, pedidos, RRHH y finanzas.
+
+En lugar de que cada ventana vuelva a leer todo con sus botones de
+refrescar, el módulo que hace un cambio lo emite y las ventanas suscritas
+actualizan solo la fila o la cuenta afectada.
+
+Eventos y sus datos:
+    stock_cambiado      productos: nombres de los productos con precio/stock modificado o eliminados
+    venta_creada        venta: diccionario de la venta registrada
+    ticket_creado       ticket: diccionario del ticket de pedidos (Ticket.to_dict)
+    planilla_calculada  codigo, empleado, planilla: registro agregado al historial del empleado
+    asiento_registrado  asiento: asiento contabilizado automáticamente (ya aplicado al mayor)
+"""
+
+STOCK_CAMBIADO = "stock_cambiado"
+VENTA_CREADA = "venta_creada"
+TICKET_CREADO = "ticket_creado"
+PLANILLA_CALCULADA = "planilla_calculada"
+ASIENTO_REGISTRADO = "asiento_registrado"
+
+
+class BusEventos:
+    """Publicación/suscripción síncrona; los suscriptores corren en el hilo que emite (el de Tk)"""
+
+    def __init__(self):
+        self._suscriptores = {}  # evento -> funciones
+
+    def suscribir(self, evento, funcion):
+        self._suscriptores.setdefault(evento, []).append(funcion)
+
+    def desuscribir(self, evento, funcion):
+        funciones = self._suscriptores.get(evento, [])
+        if funcion in funciones:
+            funciones.remove(funcion)
+
+    def emitir(self, evento, **datos):
+        # Se recorre una copia: un suscriptor puede desuscribirse al atender el evento
+        for funcion in list(self._suscriptores.get(evento, [])):
+            try:
+                funcion(**datos)
+            except Exception as e:
+                print(f"Error atendiendo el evento {evento}: {e}")
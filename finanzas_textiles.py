@@ -1,120 +1,65 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
-import json
 import os
 from datetime import datetime
 from tkinter import filedialog
-import uuid
-from decimal import Decimal, getcontext
+from dinero import Dinero, CERO
 from tkcalendar import DateEntry
+from lista_virtual import ListaVirtual, Invertida
+from servicios import ServicioContable
+from eventos import BusEventos, VENTA_CREADA, PLANILLA_CALCULADA, ASIENTO_REGISTRADO
 
 class FinanzasTextiles:
-    def __init__(self, root=None, ventas=None, inventario=None, rrhh=None):
+    def __init__(self, root=None, ventas=None, inventario=None, rrhh=None, contexto=None):
         self.root = root
         self.window = tk.Toplevel(root) if root else tk.Tk()
         self.window.title("Sistema Financiero - Textiles Rosy")
         self.window.geometry("1200x800")
         
-        # Configuración de precisión decimal
-        getcontext().prec = 6
-        
         # Conexión con otros módulos
         self.modulo_ventas = ventas
         self.modulo_inventario = inventario
         self.modulo_rrhh = rrhh
+        self.contexto = contexto  # Si existe, las ventas y nóminas se leen de aquí
         
-        # Configuración contable
-        self.cuentas_contables = self._cargar_catalogo_cuentas()
-        self.tasa_iva = Decimal('0.12')  # 12% IVA Guatemala
-        
-        # Configuración de archivos
+        # Lógica contable (diario, mayor, IVA, cierres) en el servicio
         self.data_dir = "data_finanzas"
-        if not os.path.exists(self.data_dir):
-            os.makedirs(self.data_dir)
-            
-        self.asientos_file = os.path.join(self.data_dir, "libro_diario.json")
-        self.mayor_file = os.path.join(self.data_dir, "libro_mayor.json")
-        self.iva_file = os.path.join(self.data_dir, "registro_iva.json")
+        # Con contexto se usa el mismo servicio con el que se contabilizan las ventas al momento
+        self.contable = self.contexto.contable() if self.contexto else ServicioContable(self.data_dir)
+        self.cuentas_contables = self.contable.cuentas_contables
+        self.tasa_iva = self.contable.tasa_iva
+        
+        self.libro_diario = self.contable.libro_diario
+        self.libro_mayor = self.contable.libro_mayor
+        self.registro_iva = self.contable.registro_iva
+        self.cierres = self.contable.cierres
         
-        # Cargar datos
-        self.libro_diario = self._cargar_datos(self.asientos_file, [])
-        self.libro_mayor = self._cargar_datos(self.mayor_file, {})
-        self.registro_iva = self._cargar_datos(self.iva_file, {"compras": [], "ventas": []})
+        # Avisos de ventas y planillas registradas en las demás ventanas
+        self.eventos = self.contexto.eventos if self.contexto else BusEventos()
         
         # Configurar interfaz
         self.conf_estilo()
         self.conf_gui()
         self.actualizar_saldos()
         
+        self.eventos.suscribir(VENTA_CREADA, self.al_crear_venta)
+        self.eventos.suscribir(PLANILLA_CALCULADA, self.al_calcular_planilla)
+        self.eventos.suscribir(ASIENTO_REGISTRADO, self.al_registrar_asiento)
+        
         # Control de cierre
         self.window.protocol("WM_DELETE_WINDOW", self.cerrar_ventana)
     
     def cerrar_ventana(self):
         """Maneja el cierre de la ventana"""
+        self.eventos.desuscribir(VENTA_CREADA, self.al_crear_venta)
+        self.eventos.desuscribir(PLANILLA_CALCULADA, self.al_calcular_planilla)
+        self.eventos.desuscribir(ASIENTO_REGISTRADO, self.al_registrar_asiento)
         self.guardar_datos()
         self.window.destroy()
     
-    def _cargar_catalogo_cuentas(self):
-        """Catálogo de cuentas según requisitos SAT Guatemala"""
-        return {
-            "1": {"nombre": "ACTIVOS", "subcuentas": {
-                "1101": {"nombre": "Caja", "tipo": "debito"},
-                "1105": {"nombre": "Bancos", "tipo": "debito"},
-                "1201": {"nombre": "Inventario", "tipo": "debito"}
-            }},
-            "2": {"nombre": "PASIVOS", "subcuentas": {
-                "2101": {"nombre": "Proveedores", "tipo": "credito"},
-                "2105": {"nombre": "IVA por pagar", "tipo": "credito"},
-                "2201": {"nombre": "Nóminas por pagar", "tipo": "credito"}
-            }},
-            "3": {"nombre": "PATRIMONIO", "subcuentas": {
-                "3101": {"nombre": "Capital social", "tipo": "credito"}
-            }},
-            "4": {"nombre": "INGRESOS", "subcuentas": {
-                "4101": {"nombre": "Ventas", "tipo": "credito"}
-            }},
-            "5": {"nombre": "GASTOS", "subcuentas": {
-                "5101": {"nombre": "Costos de ventas", "tipo": "debito"},
-                "5201": {"nombre": "Salarios", "tipo": "debito"},
-                "5205": {"nombre": "IGSS", "tipo": "debito"},
-                "5210": {"nombre": "ISR", "tipo": "debito"}
-            }}
-        }
-    
-    def _cargar_datos(self, archivo, default):
-        if os.path.exists(archivo):
-            try:
-                with open(archivo, 'r') as f:
-                    data = json.load(f)
-                    # Convertir strings a Decimal para los valores numéricos
-                    if isinstance(data, list):
-                        for item in data:
-                            if 'movimientos' in item:
-                                for mov in item['movimientos']:
-                                    mov['debe'] = Decimal(mov['debe']) if isinstance(mov['debe'], str) else Decimal(str(mov['debe']))
-                                    mov['haber'] = Decimal(mov['haber']) if isinstance(mov['haber'], str) else Decimal(str(mov['haber']))
-                    elif isinstance(data, dict):
-                        for key, value in data.items():
-                            if isinstance(value, dict) and 'debe' in value and 'haber' in value and 'saldo' in value:
-                                data[key] = {
-                                    'debe': Decimal(value['debe']) if isinstance(value['debe'], str) else Decimal(str(value['debe'])),
-                                    'haber': Decimal(value['haber']) if isinstance(value['haber'], str) else Decimal(str(value['haber'])),
-                                    'saldo': Decimal(value['saldo']) if isinstance(value['saldo'], str) else Decimal(str(value['saldo']))
-                                }
-                    return data
-            except Exception as e:
-                print(f"Error cargando {archivo}: {str(e)}")
-                return default
-        return default
-    
     def guardar_datos(self):
-        """Guarda todos los registros contables"""
-        with open(self.asientos_file, 'w') as f:
-            json.dump(self.libro_diario, f, indent=4, cls=DecimalEncoder)
-        with open(self.mayor_file, 'w') as f:
-            json.dump(self.libro_mayor, f, indent=4, cls=DecimalEncoder)
-        with open(self.iva_file, 'w') as f:
-            json.dump(self.registro_iva, f, indent=4, cls=DecimalEncoder)
+        """Guarda los registros contables escribiendo solo los cambios"""
+        self.contable.guardar()
     
     def conf_estilo(self):
         """Estilo profesional para la interfaz"""
@@ -164,17 +109,43 @@ class FinanzasTextiles:
         self.actualizar_status("Sistema listo")
     
     def actualizar_status(self, mensaje):
-        """Actualiza la barra de estado con información financiera clave"""
-        total_ventas = Decimal('0')
-        total_nominas = Decimal('0')
+        """Recalcula los totales de ventas y nóminas y actualiza la barra de estado"""
+        self.total_ventas = CERO
+        self.total_nominas = CERO
         
-        if self.modulo_ventas and hasattr(self.modulo_ventas, 'ventas'):
-            total_ventas = sum(Decimal(str(v['total'])) for v in self.modulo_ventas.ventas)
+        ventas = self.ventas_registradas()
+        if ventas is not None:
+            self.total_ventas = Dinero.sumar(Dinero.de(v['total']) for v in ventas)
         
-        if self.modulo_rrhh and hasattr(self.modulo_rrhh, 'contratados'):
-            total_nominas = sum(Decimal(str(n['total'])) for n in self.modulo_rrhh.contratados.values())
+        contratados = self.empleados_contratados()
+        if contratados is not None:
+            self.total_nominas = Dinero.sumar(Dinero.de(n['total']) for n in contratados.values())
+        
+        self.mostrar_status(mensaje)
+    
+    def mostrar_status(self, mensaje):
+        """Actualiza la barra de estado con los totales ya calculados"""
+        self.status_var.set(f"Estado: {mensaje} | Ventas: Q{self.total_ventas:.2f} | Nóminas: Q{self.total_nominas:.2f}")
+    
+    def al_crear_venta(self, venta):
+        """Suma la venta nueva al total sin recorrer todas las ventas"""
+        self.total_ventas += Dinero.de(venta['total'])
+        self.mostrar_status(f"Venta {venta['id']} registrada")
+    
+    def al_calcular_planilla(self, codigo, empleado, planilla):
+        self.mostrar_status(f"Planilla calculada para {empleado['nombre']}")
+    
+    def al_registrar_asiento(self, asiento):
+        """Muestra un asiento contabilizado automáticamente sin recargar las pestañas"""
+        filas = self.lista_diario.datos
+        if not filas or filas[-1][0]['fecha'][:10] <= asiento['fecha'][:10]:
+            filas.extend((asiento, mov) for mov in asiento['movimientos'])
+            self.lista_diario.refrescar()
+        else:
+            self.actualizar_tree_diario()  # Asiento con fecha anterior: reordenar
         
-        self.status_var.set(f"Estado: {mensaje} | Ventas: Q{total_ventas:.2f} | Nóminas: Q{total_nominas:.2f}")
+        self.actualizar_cuentas_mayor(mov['cuenta'] for mov in asiento['movimientos'])
+        self.actualizar_tree_iva()
 
     # --------------------------------------------
     # Pestaña: Libro Diario
@@ -186,17 +157,15 @@ class FinanzasTextiles:
         
         # Treeview para asientos contables
         columns = ("fecha", "comprobante", "cuenta", "debe", "haber", "concepto")
-        self.tree_diario = ttk.Treeview(frame, columns=columns, show='headings', height=20)
+        self.lista_diario = ListaVirtual(frame, columns, self.formatear_movimiento, alto=20,
+                                         claves_orden={'fecha': lambda fila: fila[0]['fecha']})
+        self.tree_diario = self.lista_diario.tree
         
         for col in columns:
             self.tree_diario.heading(col, text=col.capitalize())
             self.tree_diario.column(col, width=120)
         
-        scrollbar = ttk.Scrollbar(frame, orient='vertical', command=self.tree_diario.yview)
-        self.tree_diario.configure(yscrollcommand=scrollbar.set)
-        
-        self.tree_diario.pack(side='left', fill='both', expand=True)
-        scrollbar.pack(side='right', fill='y')
+        self.lista_diario.pack(fill='both', expand=True)
         
         # Botones de acción
         btn_frame = ttk.Frame(frame)
@@ -212,138 +181,48 @@ class FinanzasTextiles:
         # Cargar datos iniciales
         self.actualizar_tree_diario()
     
+    def ventas_registradas(self):
+        """Ventas del contexto compartido, o de la ventana de ventas abierta"""
+        if self.contexto:
+            return self.contexto.ventas().ventas
+        if self.modulo_ventas and hasattr(self.modulo_ventas, 'ventas'):
+            return self.modulo_ventas.ventas
+        return None
+    
+    def empleados_contratados(self):
+        """Contratados del contexto compartido, o de la ventana de RRHH abierta"""
+        if self.contexto:
+            return self.contexto.datos(os.path.join(self.contexto.rrhh_dir, "contratados.json"), {})
+        if self.modulo_rrhh and hasattr(self.modulo_rrhh, 'contratados'):
+            return self.modulo_rrhh.contratados
+        return None
+    
     def sincronizar_ventas(self):
         """Registra automáticamente las ventas en el libro diario"""
-        if not self.modulo_ventas or not hasattr(self.modulo_ventas, 'ventas'):
+        ventas = self.ventas_registradas()
+        if ventas is None:
             messagebox.showerror("Error", "Módulo de Ventas no conectado o sin datos")
             return
         
-        ventas_registradas = 0
-        
-        for venta in self.modulo_ventas.ventas:
-            # Verificar si la venta ya está registrada
-            if any(asiento.get('origen') == f"venta_{venta['id']}" for asiento in self.libro_diario):
-                continue
-            
-            try:
-                total = Decimal(str(venta['total']))
-                iva = total * self.tasa_iva / (Decimal('1') + self.tasa_iva)
-                subtotal = total - iva
-                
-                # Asiento contable
-                asiento_venta = {
-                    "id": str(uuid.uuid4()),
-                    "fecha": venta['fecha'],
-                    "origen": f"venta_{venta['id']}",
-                    "movimientos": [
-                        {
-                            "cuenta": "1101",  # Caja
-                            "debe": str(total),
-                            "haber": "0",
-                            "concepto": f"Venta {venta['id']}"
-                        },
-                        {
-                            "cuenta": "4101",  # Ventas
-                            "debe": "0",
-                            "haber": str(subtotal),
-                            "concepto": "Venta de mercadería"
-                        },
-                        {
-                            "cuenta": "2105",  # IVA por pagar
-                            "debe": "0",
-                            "haber": str(iva),
-                            "concepto": "IVA ventas"
-                        }
-                    ]
-                }
-                
-                self.libro_diario.append(asiento_venta)
-                ventas_registradas += 1
-                
-                # Registrar en libro de IVA
-                self.registro_iva["ventas"].append({
-                    "fecha": venta['fecha'],
-                    "nit": venta['cliente']['nit'],
-                    "numero_factura": venta['id'],
-                    "subtotal": str(subtotal),
-                    "iva": str(iva),
-                    "total": str(total)
-                })
-                
-            except Exception as e:
-                print(f"Error procesando venta {venta['id']}: {str(e)}")
-                continue
+        ventas_registradas = self.contable.sincronizar_ventas(ventas)
         
         if ventas_registradas > 0:
             self.guardar_datos()
             self.actualizar_tree_diario()
             self.actualizar_mayor()
+            self.actualizar_tree_iva()
             messagebox.showinfo("Éxito", f"{ventas_registradas} ventas sincronizadas")
         else:
             messagebox.showinfo("Información", "No hay nuevas ventas para registrar")
     
     def sincronizar_nominas(self):
         """Registra las nóminas de RRHH en el libro diario"""
-        if not self.modulo_rrhh or not hasattr(self.modulo_rrhh, 'contratados'):
+        contratados = self.empleados_contratados()
+        if contratados is None:
             messagebox.showerror("Error", "Módulo de RRHH no conectado o sin datos")
             return
         
-        nominas_registradas = 0
-        
-        for codigo, empleado in self.modulo_rrhh.contratados.items():
-            if 'historial_planilla' not in empleado:
-                continue
-                
-            for planilla in empleado['historial_planilla']:
-                # Verificar si ya está registrada
-                if any(asiento.get('origen') == f"planilla_{codigo}_{planilla['fecha']}" 
-                     for asiento in self.libro_diario):
-                    continue
-                
-                try:
-                    total = Decimal(str(planilla['total']))
-                    deducciones = Decimal(str(planilla.get('deducciones', 0)))
-                    salario_neto = total - deducciones
-                    
-                    # Asiento contable
-                    asiento_nomina = {
-                        "id": str(uuid.uuid4()),
-                        "fecha": planilla['fecha'],
-                        "origen": f"planilla_{codigo}_{planilla['fecha']}",
-                        "movimientos": [
-                            {
-                                "cuenta": "5201",  # Salarios
-                                "debe": str(salario_neto),
-                                "haber": "0",
-                                "concepto": f"Pago a {empleado['nombre']}"
-                            },
-                            {
-                                "cuenta": "5205",  # IGSS
-                                "debe": str(planilla.get('igss', 0)),
-                                "haber": "0",
-                                "concepto": "Cuota patronal IGSS"
-                            },
-                            {
-                                "cuenta": "5210",  # ISR
-                                "debe": str(planilla.get('isr', 0)),
-                                "haber": "0",
-                                "concepto": "Retención ISR"
-                            },
-                            {
-                                "cuenta": "1101",  # Caja
-                                "debe": "0",
-                                "haber": str(total),
-                                "concepto": "Pago de nómina"
-                            }
-                        ]
-                    }
-                    
-                    self.libro_diario.append(asiento_nomina)
-                    nominas_registradas += 1
-                    
-                except Exception as e:
-                    print(f"Error procesando nómina {codigo}: {str(e)}")
-                    continue
+        nominas_registradas = self.contable.sincronizar_nominas(contratados)
         
         if nominas_registradas > 0:
             self.guardar_datos()
@@ -354,22 +233,23 @@ class FinanzasTextiles:
             messagebox.showinfo("Información", "No hay nuevas nóminas para registrar")
     
     def actualizar_tree_diario(self):
-        """Actualiza el Treeview con los asientos del libro diario"""
-        for item in self.tree_diario.get_children():
-            self.tree_diario.delete(item)
-            
-        for asiento in sorted(self.libro_diario, key=lambda x: x['fecha']):
-            fecha = datetime.fromisoformat(asiento['fecha']).strftime('%d/%m/%Y')
-            
-            for mov in asiento['movimientos']:
-                self.tree_diario.insert('', 'end', values=(
-                    fecha,
-                    asiento.get('origen', 'Manual'),
-                    f"{mov['cuenta']} - {self.get_nombre_cuenta(mov['cuenta'])}",
-                    f"Q{Decimal(mov['debe']):.2f}" if Decimal(mov['debe']) > 0 else "",
-                    f"Q{Decimal(mov['haber']):.2f}" if Decimal(mov['haber']) > 0 else "",
-                    mov['concepto']
-                ))
+        """Actualiza la lista del libro diario (una fila por movimiento, por fecha)"""
+        # El índice de fechas de los cierres ya mantiene el diario ordenado
+        filas = [(self.libro_diario[pos], mov)
+                 for _, pos in self.cierres.indice_diario.claves
+                 for mov in self.libro_diario[pos]['movimientos']]
+        self.lista_diario.establecer_datos(filas)
+    
+    def formatear_movimiento(self, fila):
+        asiento, mov = fila
+        return (
+            datetime.fromisoformat(asiento['fecha']).strftime('%d/%m/%Y'),
+            asiento.get('origen', 'Manual'),
+            f"{mov['cuenta']} - {self.get_nombre_cuenta(mov['cuenta'])}",
+            f"Q{mov['debe']:.2f}" if mov['debe'] else "",
+            f"Q{mov['haber']:.2f}" if mov['haber'] else "",
+            mov['concepto']
+        )
 
     # --------------------------------------------
     # Pestaña: Libro Mayor
@@ -393,62 +273,63 @@ class FinanzasTextiles:
         self.tree_mayor.pack(side='left', fill='both', expand=True)
         scrollbar.pack(side='right', fill='y')
         
-        # Botón de actualización
-        ttk.Button(frame, text="Actualizar Mayor", 
-                 command=self.actualizar_mayor).pack(pady=5)
+        # Botones de actualización y verificación
+        btn_frame = ttk.Frame(frame)
+        btn_frame.pack(pady=5)
+        
+        ttk.Button(btn_frame, text="Actualizar Mayor", 
+                 command=self.actualizar_mayor).pack(side='left', padx=5)
+        ttk.Button(btn_frame, text="Verificar Mayor", 
+                 command=self.verificar_mayor).pack(side='left', padx=5)
         
         # Cargar datos iniciales
         self.actualizar_mayor()
     
-    def actualizar_mayor(self):
-        """Actualiza el libro mayor a partir del diario"""
-        self.libro_mayor = {}
-        
-        # Procesar todos los asientos
-        for asiento in self.libro_diario:
-            for mov in asiento['movimientos']:
-                cuenta = mov['cuenta']
-                debe = Decimal(mov['debe'])
-                haber = Decimal(mov['haber'])
-                
-                if cuenta not in self.libro_mayor:
-                    self.libro_mayor[cuenta] = {
-                        "debe": Decimal('0'),
-                        "haber": Decimal('0'),
-                        "saldo": Decimal('0')
-                    }
-                
-                self.libro_mayor[cuenta]["debe"] += debe
-                self.libro_mayor[cuenta]["haber"] += haber
-        
-        # Calcular saldos
-        for cuenta, datos in self.libro_mayor.items():
-            tipo_cuenta = self.get_tipo_cuenta(cuenta)
-            if tipo_cuenta == "debito":
-                datos["saldo"] = datos["debe"] - datos["haber"]
-            else:
-                datos["saldo"] = datos["haber"] - datos["debe"]
-        
-        self.guardar_datos()
+    def actualizar_mayor(self, reconstruir=False):
+        """Aplica al libro mayor solo los asientos nuevos del diario"""
+        self.contable.actualizar_mayor(reconstruir)
         self.actualizar_tree_mayor()
     
+    def verificar_mayor(self):
+        """Compara el mayor incremental con un recálculo completo del diario"""
+        diferencias = self.contable.verificar_mayor()
+        if not diferencias:
+            messagebox.showinfo("Verificación", "El libro mayor coincide con el libro diario")
+            return
+        
+        detalle = "\n".join(f"{cuenta} - {self.get_nombre_cuenta(cuenta)}" for cuenta, _, _ in diferencias[:10])
+        if messagebox.askyesno("Verificación", 
+                               f"{len(diferencias)} cuentas no coinciden:\n{detalle}\n\n¿Reconstruir el libro mayor?"):
+            self.actualizar_mayor(reconstruir=True)
+    
     def actualizar_tree_mayor(self):
         """Actualiza el Treeview con los datos del libro mayor"""
         for item in self.tree_mayor.get_children():
             self.tree_mayor.delete(item)
             
         for cuenta, datos in sorted(self.libro_mayor.items()):
-            nombre = self.get_nombre_cuenta(cuenta)
-            saldo = datos['saldo']
-            
             # Solo mostrar cuentas con saldo diferente de cero
-            if saldo != Decimal('0'):
-                self.tree_mayor.insert('', 'end', values=(
-                    f"{cuenta} - {nombre}",
-                    f"Q{datos['debe']:.2f}",
-                    f"Q{datos['haber']:.2f}",
-                    f"Q{datos['saldo']:.2f}",
-                ))
+            if datos['saldo']:
+                self.tree_mayor.insert('', 'end', iid=cuenta, values=self.valores_mayor(cuenta))
+    
+    def actualizar_cuentas_mayor(self, cuentas):
+        """Actualiza solo las filas del mayor de las cuentas indicadas"""
+        for cuenta in set(cuentas):
+            visible = cuenta in self.libro_mayor and bool(self.libro_mayor[cuenta]['saldo'])
+            if visible and self.tree_mayor.exists(cuenta):
+                self.tree_mayor.item(cuenta, values=self.valores_mayor(cuenta))
+            elif visible or self.tree_mayor.exists(cuenta):
+                self.actualizar_tree_mayor()  # Aparece o desaparece una cuenta
+                return
+    
+    def valores_mayor(self, cuenta):
+        datos = self.libro_mayor[cuenta]
+        return (
+            f"{cuenta} - {self.get_nombre_cuenta(cuenta)}",
+            f"Q{datos['debe']:.2f}",
+            f"Q{datos['haber']:.2f}",
+            f"Q{datos['saldo']:.2f}",
+        )
 
     # --------------------------------------------
     # Pestaña: Registro IVA
@@ -458,70 +339,145 @@ class FinanzasTextiles:
         notebook = ttk.Notebook(self.tab_iva)
         notebook.pack(expand=True, fill='both')
         
-        # Sub-pestañas para IVA Compras/Ventas
+        # Sub-pestañas para declaraciones mensuales e IVA Compras/Ventas
+        tab_declaraciones = ttk.Frame(notebook)
         tab_compras = ttk.Frame(notebook)
         tab_ventas = ttk.Frame(notebook)
         
+        notebook.add(tab_declaraciones, text="Declaraciones")
         notebook.add(tab_compras, text="IVA Compras")
         notebook.add(tab_ventas, text="IVA Ventas")
         
-        # Configurar Treeview para Compras
-        columns = ("fecha", "nit", "numero", "subtotal", "iva", "total")
-        self.tree_iva_compras = ttk.Treeview(tab_compras, columns=columns, show='headings', height=15)
+        # Resumen mensual, calculado con los totales de cada mes
+        columns = ("periodo", "ventas", "debito", "compras", "credito", "remanente_anterior", "a_pagar", "remanente")
+        titulos = ("Período", "Ventas", "Débito fiscal", "Compras", "Crédito fiscal",
+                   "Remanente anterior", "A pagar", "Remanente")
+        self.tree_declaraciones = ttk.Treeview(tab_declaraciones, columns=columns, show='headings', height=15)
         
-        for col in columns:
-            self.tree_iva_compras.heading(col, text=col.capitalize())
-            self.tree_iva_compras.column(col, width=120)
+        for col, titulo in zip(columns, titulos):
+            self.tree_declaraciones.heading(col, text=titulo)
+            self.tree_declaraciones.column(col, width=120)
         
-        scrollbar = ttk.Scrollbar(tab_compras, orient='vertical', command=self.tree_iva_compras.yview)
-        self.tree_iva_compras.configure(yscrollcommand=scrollbar.set)
+        scrollbar = ttk.Scrollbar(tab_declaraciones, orient='vertical', command=self.tree_declaraciones.yview)
+        self.tree_declaraciones.configure(yscrollcommand=scrollbar.set)
         
-        self.tree_iva_compras.pack(side='left', fill='both', expand=True)
+        self.tree_declaraciones.pack(side='left', fill='both', expand=True)
         scrollbar.pack(side='right', fill='y')
         
-        # Configurar Treeview para Ventas
-        self.tree_iva_ventas = ttk.Treeview(tab_ventas, columns=columns, show='headings', height=15)
+        # Facturas de compras y ventas, las más recientes primero
+        columns = ("fecha", "nit", "numero", "subtotal", "iva", "total")
+        claves = {'fecha': lambda registro: registro['fecha']}
+        self.lista_iva_compras = ListaVirtual(tab_compras, columns, self.formatear_iva, alto=15, claves_orden=claves)
+        self.lista_iva_ventas = ListaVirtual(tab_ventas, columns, self.formatear_iva, alto=15, claves_orden=claves)
         
-        for col in columns:
-            self.tree_iva_ventas.heading(col, text=col.capitalize())
-            self.tree_iva_ventas.column(col, width=120)
+        for lista in (self.lista_iva_compras, self.lista_iva_ventas):
+            for col in columns:
+                lista.tree.heading(col, text=col.capitalize())
+                lista.tree.column(col, width=120)
         
-        scrollbar = ttk.Scrollbar(tab_ventas, orient='vertical', command=self.tree_iva_ventas.yview)
-        self.tree_iva_ventas.configure(yscrollcommand=scrollbar.set)
+        self.lista_iva_compras.pack(fill='both', expand=True)
+        ttk.Button(tab_compras, text="Registrar Compra",
+                 command=self.nueva_compra).pack(side='right', padx=5, pady=5)
+        self.lista_iva_ventas.pack(fill='both', expand=True)
         
-        self.tree_iva_ventas.pack(side='left', fill='both', expand=True)
-        scrollbar.pack(side='right', fill='y')
+        self.lista_iva_compras.establecer_datos(Invertida(self.registro_iva["compras"]))
+        self.lista_iva_ventas.establecer_datos(Invertida(self.registro_iva["ventas"]))
         
         # Cargar datos iniciales
         self.actualizar_tree_iva()
     
     def actualizar_tree_iva(self):
-        """Actualiza los Treeview de IVA"""
-        for item in self.tree_iva_compras.get_children():
-            self.tree_iva_compras.delete(item)
-            
-        for item in self.tree_iva_ventas.get_children():
-            self.tree_iva_ventas.delete(item)
-            
-        for registro in self.registro_iva["compras"]:
-            self.tree_iva_compras.insert('', 'end', values=(
-                datetime.fromisoformat(registro['fecha']).strftime('%d/%m/%Y'),
-                registro['nit'],
-                registro['numero_factura'],
-                f"Q{Decimal(registro['subtotal']):.2f}",
-                f"Q{Decimal(registro['iva']):.2f}",
-                f"Q{Decimal(registro['total']):.2f}"
-            ))
-            
-        for registro in self.registro_iva["ventas"]:
-            self.tree_iva_ventas.insert('', 'end', values=(
-                datetime.fromisoformat(registro['fecha']).strftime('%d/%m/%Y'),
-                registro['nit'],
-                registro['numero_factura'],
-                f"Q{Decimal(registro['subtotal']):.2f}",
-                f"Q{Decimal(registro['iva']):.2f}",
-                f"Q{Decimal(registro['total']):.2f}"
+        """Actualiza las declaraciones y las listas de facturas (sin recorrer las facturas)"""
+        for item in self.tree_declaraciones.get_children():
+            self.tree_declaraciones.delete(item)
+        
+        # Las declaraciones se muestran del mes más reciente al más antiguo
+        for declaracion in reversed(list(self.contable.iva.declaraciones())):
+            self.tree_declaraciones.insert('', 'end', values=(
+                declaracion['periodo'],
+                f"Q{declaracion['ventas']['subtotal']:.2f} ({declaracion['ventas']['facturas']})",
+                f"Q{declaracion['debito']:.2f}",
+                f"Q{declaracion['compras']['subtotal']:.2f} ({declaracion['compras']['facturas']})",
+                f"Q{declaracion['credito']:.2f}",
+                f"Q{declaracion['remanente_anterior']:.2f}",
+                f"Q{declaracion['a_pagar']:.2f}",
+                f"Q{declaracion['remanente']:.2f}"
             ))
+        
+        # Las listas ven las mismas listas de facturas: solo se redibuja lo visible
+        self.lista_iva_compras.refrescar()
+        self.lista_iva_ventas.refrescar()
+    
+    def formatear_iva(self, registro):
+        return (
+            datetime.fromisoformat(registro['fecha']).strftime('%d/%m/%Y'),
+            registro['nit'],
+            registro['numero_factura'],
+            f"Q{Dinero.de(registro['subtotal']):.2f}",
+            f"Q{Dinero.de(registro['iva']):.2f}",
+            f"Q{Dinero.de(registro['total']):.2f}"
+        )
+    
+    def nueva_compra(self):
+        """Registra una factura de compra: asiento contable y libro de compras"""
+        def guardar_compra():
+            try:
+                self.contable.registrar_compra(
+                    fecha_entry.get_date().isoformat(),
+                    nit_entry.get(),
+                    numero_entry.get(),
+                    total_entry.get(),
+                    cuenta_debito=debito_cb.get().split(" - ")[0],
+                    cuenta_credito=credito_cb.get().split(" - ")[0]
+                )
+                self.actualizar_tree_diario()
+                self.actualizar_mayor()  # También guarda
+                self.actualizar_tree_iva()
+                top.destroy()
+                messagebox.showinfo("Éxito", "Compra registrada")
+                
+            except Exception as e:
+                messagebox.showerror("Error", f"Datos inválidos: {str(e)}")
+        
+        top = tk.Toplevel(self.window)
+        top.title("Registrar Compra")
+        top.geometry("400x300")
+        
+        cuentas = self.get_lista_cuentas()
+        
+        ttk.Label(top, text="Fecha:").grid(row=0, column=0, padx=5, pady=5)
+        fecha_entry = DateEntry(top, date_pattern='yyyy-mm-dd')
+        fecha_entry.grid(row=0, column=1, padx=5, pady=5)
+        
+        ttk.Label(top, text="NIT Proveedor:").grid(row=1, column=0, padx=5, pady=5)
+        nit_entry = ttk.Entry(top)
+        nit_entry.grid(row=1, column=1, padx=5, pady=5)
+        
+        ttk.Label(top, text="No. Factura:").grid(row=2, column=0, padx=5, pady=5)
+        numero_entry = ttk.Entry(top)
+        numero_entry.grid(row=2, column=1, padx=5, pady=5)
+        
+        ttk.Label(top, text="Total con IVA (Q):").grid(row=3, column=0, padx=5, pady=5)
+        total_entry = ttk.Entry(top)
+        total_entry.grid(row=3, column=1, padx=5, pady=5)
+        
+        ttk.Label(top, text="Cuenta Débito:").grid(row=4, column=0, padx=5, pady=5)
+        debito_cb = ttk.Combobox(top, values=cuentas, state='readonly')
+        debito_cb.grid(row=4, column=1, padx=5, pady=5)
+        
+        ttk.Label(top, text="Pagado con:").grid(row=5, column=0, padx=5, pady=5)
+        credito_cb = ttk.Combobox(top, values=cuentas, state='readonly')
+        credito_cb.grid(row=5, column=1, padx=5, pady=5)
+        
+        # Inventario pagado con caja, como las compras habituales
+        for combo, codigo in ((debito_cb, "1201"), (credito_cb, "1101")):
+            combo.set(next((c for c in cuentas if c.split(" - ")[0] == codigo), ""))
+        
+        btn_frame = ttk.Frame(top)
+        btn_frame.grid(row=6, column=0, columnspan=2, pady=10)
+        
+        ttk.Button(btn_frame, text="Guardar", command=guardar_compra).pack(side='left', padx=5)
+        ttk.Button(btn_frame, text="Cancelar", command=top.destroy).pack(side='right', padx=5)
 
     # --------------------------------------------
     # Pestaña: Balance General
@@ -547,113 +503,121 @@ class FinanzasTextiles:
         self.tree_balance.pack(side='left', fill='both', expand=True)
         scrollbar.pack(side='right', fill='y')
         
-        # Botón de actualización
-        ttk.Button(frame, text="Generar Balance", 
-                 command=self.generar_balance).pack(pady=5)
+        # Filtro por período y cierres
+        periodo_frame = ttk.Frame(self.tab_balance)
+        periodo_frame.pack(fill='x', padx=10, pady=5)
+        
+        self.filtrar_periodo_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(periodo_frame, text="Filtrar por período",
+                        variable=self.filtrar_periodo_var).pack(side='left', padx=5)
+        
+        ttk.Label(periodo_frame, text="Desde:").pack(side='left', padx=5)
+        self.balance_desde = DateEntry(periodo_frame, date_pattern='yyyy-mm-dd')
+        self.balance_desde.pack(side='left', padx=5)
+        
+        ttk.Label(periodo_frame, text="Hasta:").pack(side='left', padx=5)
+        self.balance_hasta = DateEntry(periodo_frame, date_pattern='yyyy-mm-dd')
+        self.balance_hasta.pack(side='left', padx=5)
+        
+        ttk.Button(periodo_frame, text="Generar Balance", 
+                 command=self.generar_balance).pack(side='left', padx=5)
+        ttk.Button(periodo_frame, text="Cerrar Períodos", 
+                 command=self.cerrar_periodos).pack(side='right', padx=5)
+        
+        self.iva_periodo_var = tk.StringVar()
+        ttk.Label(self.tab_balance, textvariable=self.iva_periodo_var).pack(fill='x', padx=10, pady=5)
         
         # Cargar datos iniciales
         self.generar_balance()
     
+    def saldos_periodo(self):
+        """Saldos del período seleccionado, o del mayor completo si no hay filtro"""
+        if not self.filtrar_periodo_var.get():
+            return self.libro_mayor
+        desde = self.balance_desde.get_date().isoformat()
+        hasta = self.balance_hasta.get_date().isoformat()
+        return self.cierres.saldos_entre(desde, hasta)
+    
+    def estados_periodo(self):
+        """Balance y estado de resultados del período (los del mayor completo se reutilizan)"""
+        if not self.filtrar_periodo_var.get():
+            return self.contable.estados_financieros()
+        return self.contable.estados_financieros(self.saldos_periodo())
+    
+    def insertar_grupo_balance(self, estados, grupo, total):
+        self.tree_balance.insert('', 'end', values=(grupo, f"Q{total:.2f}"), tags=('grupo',))
+        for cuenta, nivel, saldo in estados.detalle(grupo):
+            self.tree_balance.insert('', 'end', values=(
+                f"{'   ' * nivel}{cuenta} - {self.get_nombre_cuenta(cuenta)}",
+                f"Q{saldo:.2f}"
+            ))
+    
+    def cerrar_periodos(self):
+        """Registra los cierres mensuales pendientes hasta el mes anterior"""
+        nuevos = self.cierres.cerrar_hasta(datetime.now().date().isoformat())
+        if nuevos:
+            periodos = ", ".join(c['periodo'] for c in nuevos)
+            messagebox.showinfo("Cierre", f"Períodos cerrados: {periodos}")
+        else:
+            messagebox.showinfo("Cierre", "No hay períodos pendientes de cierre")
+    
     def generar_balance(self):
-        """Genera el balance general agrupando cuentas"""
+        """Genera el balance general y el estado de resultados con los subtotales de cada nivel"""
         for item in self.tree_balance.get_children():
             self.tree_balance.delete(item)
-            
-        # Agrupar por categorías
-        categorias = {
-            "ACTIVOS": Decimal('0'),
-            "PASIVOS": Decimal('0'),
-            "PATRIMONIO": Decimal('0'),
-            "RESULTADOS": Decimal('0')
-        }
-        
-        # Calcular totales por categoría
-        for cuenta, datos in self.libro_mayor.items():
-            grupo = self.get_grupo_cuenta(cuenta)
-            if grupo in categorias:
-                categorias[grupo] += datos['saldo']
-        
-        # Insertar en Treeview
-        for grupo, total in categorias.items():
-            self.tree_balance.insert('', 'end', values=(grupo, f"Q{total:.2f}"), tags=('grupo',))
-            
-            # Insertar cuentas detalladas
-            for cuenta, datos in self.libro_mayor.items():
-                if self.get_grupo_cuenta(cuenta) == grupo and abs(datos['saldo']) > Decimal('0.01'):
-                    nombre = self.get_nombre_cuenta(cuenta)
-                    self.tree_balance.insert('', 'end', values=(
-                        f"   {cuenta} - {nombre}",
-                        f"Q{datos['saldo']:.2f}"
-                    ))
+        
+        estados = self.estados_periodo()
+        
+        # Balance general: grupos con sus cuentas y subcuentas
+        for grupo, total in estados.balance():
+            self.insertar_grupo_balance(estados, grupo, total)
+        
+        # Estado de resultados del mismo período
+        self.tree_balance.insert('', 'end', values=("", ""))
+        self.tree_balance.insert('', 'end', values=("ESTADO DE RESULTADOS", ""), tags=('grupo',))
+        for grupo in estados.GRUPOS_RESULTADOS:
+            self.insertar_grupo_balance(estados, grupo, estados.total(grupo))
+        self.tree_balance.insert('', 'end', values=("UTILIDAD NETA", f"Q{estados.utilidad:.2f}"), tags=('grupo',))
         
         # Configurar estilo para grupos
         self.tree_balance.tag_configure('grupo', font=('Arial', 10, 'bold'))
+        
+        # Resumen de IVA del período
+        if self.filtrar_periodo_var.get():
+            desde = self.balance_desde.get_date().isoformat()
+            hasta = self.balance_hasta.get_date().isoformat()
+            debito = self.cierres.iva_entre("ventas", desde, hasta)["iva"]
+            credito = self.cierres.iva_entre("compras", desde, hasta)["iva"]
+            self.iva_periodo_var.set(f"IVA débito: Q{debito:.2f} | IVA crédito: Q{credito:.2f} | Saldo: Q{debito - credito:.2f}")
+        else:
+            self.iva_periodo_var.set("")
 
     # --------------------------------------------
     # Funciones auxiliares
     # --------------------------------------------
     def get_nombre_cuenta(self, codigo):
         """Obtiene el nombre de una cuenta contable"""
-        for grupo in self.cuentas_contables.values():
-            if codigo in grupo['subcuentas']:
-                return grupo['subcuentas'][codigo]['nombre']
-        return "Cuenta no definida"
+        return self.contable.nombre_cuenta(codigo)
     
     def get_tipo_cuenta(self, codigo):
         """Obtiene el tipo de una cuenta (debito/credito)"""
-        for grupo in self.cuentas_contables.values():
-            if codigo in grupo['subcuentas']:
-                return grupo['subcuentas'][codigo]['tipo']
-        return "debito"
+        return self.contable.tipo_cuenta(codigo)
     
     def get_grupo_cuenta(self, codigo):
         """Obtiene el grupo principal de una cuenta"""
-        for grupo_id, grupo in self.cuentas_contables.items():
-            if codigo in grupo['subcuentas']:
-                return grupo['nombre']
-        return "OTROS"
+        return self.contable.grupo_cuenta(codigo)
     
     def nuevo_asiento_manual(self):
         """Permite crear un asiento contable manualmente"""
         def guardar_asiento():
             try:
-                fecha = fecha_entry.get_date().isoformat()
-                cuenta_debito = debito_cb.get().split(" - ")[0]
-                cuenta_credito = credito_cb.get().split(" - ")[0]
-                monto = Decimal(monto_entry.get())
-                concepto = concepto_entry.get()
-                
-                if not cuenta_debito or not cuenta_credito or monto <= 0:
-                    raise ValueError("Datos inválidos")
-                    
-                # Verificar que las cuentas existan
-                if not any(cuenta_debito in grupo['subcuentas'] for grupo in self.cuentas_contables.values()):
-                    raise ValueError(f"Cuenta débito {cuenta_debito} no existe")
-                    
-                if not any(cuenta_credito in grupo['subcuentas'] for grupo in self.cuentas_contables.values()):
-                    raise ValueError(f"Cuenta crédito {cuenta_credito} no existe")
-                
-                asiento = {
-                    "id": str(uuid.uuid4()),
-                    "fecha": fecha,
-                    "origen": "manual",
-                    "movimientos": [
-                        {
-                            "cuenta": cuenta_debito,
-                            "debe": str(monto),
-                            "haber": "0",
-                            "concepto": concepto
-                        },
-                        {
-                            "cuenta": cuenta_credito,
-                            "debe": "0",
-                            "haber": str(monto),
-                            "concepto": concepto
-                        }
-                    ]
-                }
-                
-                self.libro_diario.append(asiento)
+                self.contable.asiento_manual(
+                    fecha_entry.get_date().isoformat(),
+                    debito_cb.get().split(" - ")[0],
+                    credito_cb.get().split(" - ")[0],
+                    monto_entry.get(),
+                    concepto_entry.get()
+                )
                 self.guardar_datos()
                 self.actualizar_tree_diario()
                 self.actualizar_mayor()
@@ -695,11 +659,7 @@ class FinanzasTextiles:
     
     def get_lista_cuentas(self):
         """Genera lista de cuentas para Combobox"""
-        cuentas = []
-        for grupo in self.cuentas_contables.values():
-            for codigo, detalle in grupo['subcuentas'].items():
-                cuentas.append(f"{codigo} - {detalle['nombre']}")
-        return sorted(cuentas)
+        return list(self.contable.catalogo_cuentas.lista())
     
     def actualizar_saldos(self):
         """Actualiza todos los saldos y registros"""
@@ -712,13 +672,6 @@ class FinanzasTextiles:
         """Inicia la aplicación"""
         self.window.mainloop()
 
-class DecimalEncoder(json.JSONEncoder):
-    """Helper para serializar Decimal a JSON"""
-    def default(self, o):
-        if isinstance(o, Decimal):
-            return str(o)
-        return super().default(o)
-
 def iniciar_modulo_finanzas(root=None, ventas=None, inventario=None, rrhh=None):
     # Verificar si ya está abierto
     for widget in root.winfo_children() if root else []:
@@ -0,0 +1,104 @@
+import bisect
+import re
+import unicodedata
+from functools import lru_cache
+
+# Palabras de búsqueda: letras/dígitos, conservando puntos y guiones internos (150.00, 1234-5)
+_PATRON_TOKEN = re.compile(r"\w+(?:[.\-]\w+)*")
+
+
+def normalizar(texto):
+    """Minúsculas y sin tildes, para comparar nombres escritos de distintas formas"""
+    texto = str(texto).lower()
+    if texto.isascii():
+        return texto
+    texto = unicodedata.normalize('NFKD', texto)
+    return "".join(c for c in texto if not unicodedata.combining(c))
+
+
+@lru_cache(maxsize=4096)
+def tokens(texto):
+    """Palabras normalizadas del texto (los nombres y productos se repiten mucho)"""
+    return tuple(_PATRON_TOKEN.findall(normalizar(texto)))
+
+
+class IndiceVentas:
+    """Índices en memoria sobre la lista de ventas.
+
+    - Por fecha: lista ordenada de (fecha ISO, posición) para consultar rangos con bisect.
+    - Por texto: índice invertido palabra -> posiciones sobre cliente, NIT,
+      productos, id y total. Cada palabra buscada se compara como prefijo.
+
+    Las posiciones corresponden al índice de la venta en la lista original.
+    """
+
+    def __init__(self, ventas=()):
+        self.reconstruir(ventas)
+
+    def reconstruir(self, ventas):
+        self.ventas = ventas
+        self.fechas = sorted((venta['fecha'], pos) for pos, venta in enumerate(ventas))
+        self.palabras = {}
+        for pos, venta in enumerate(ventas):
+            self._indexar_texto(venta, pos)
+        self.vocabulario = sorted(self.palabras)
+
+    def agregar(self, venta, posicion=None):
+        """Indexa una venta recién agregada a la lista"""
+        if posicion is None:
+            posicion = len(self.ventas) - 1
+        bisect.insort(self.fechas, (venta['fecha'], posicion))
+        for palabra in self._indexar_texto(venta, posicion):
+            bisect.insort(self.vocabulario, palabra)
+
+    # --------------------------------------------
+    # Consultas
+    # --------------------------------------------
+    def buscar(self, desde=None, hasta=None, texto=""):
+        """Ventas entre las fechas (date, inclusive) que contienen todas las palabras del texto"""
+        posiciones = self.posiciones_entre(desde, hasta)
+        for palabra in tokens(texto):
+            coincidencias = self.posiciones_palabra(palabra)
+            posiciones = [pos for pos in posiciones if pos in coincidencias]
+            if not posiciones:
+                break
+        return [self.ventas[pos] for pos in posiciones]
+
+    def posiciones_entre(self, desde=None, hasta=None):
+        """Posiciones de las ventas con fecha entre desde y hasta, en orden cronológico"""
+        inicio = bisect.bisect_left(self.fechas, (desde.isoformat(),)) if desde else 0
+        # Cualquier fecha-hora del último día es menor que el día siguiente + "￿"
+        fin = bisect.bisect_right(self.fechas, (hasta.isoformat() + "￿",)) if hasta else len(self.fechas)
+        return [pos for _, pos in self.fechas[inicio:fin]]
+
+    def posiciones_palabra(self, prefijo):
+        """Posiciones de las ventas con alguna palabra que empieza con el prefijo"""
+        resultado = set()
+        i = bisect.bisect_left(self.vocabulario, prefijo)
+        while i < len(self.vocabulario) and self.vocabulario[i].startswith(prefijo):
+            resultado |= self.palabras[self.vocabulario[i]]
+            i += 1
+        return resultado
+
+    # --------------------------------------------
+    # Auxiliares
+    # --------------------------------------------
+    def _indexar_texto(self, venta, posicion):
+        """Agrega la venta al índice invertido y devuelve las palabras nuevas"""
+        cliente = venta.get('cliente', {})
+        textos = [
+            venta.get('id', ''),
+            cliente.get('nombre', ''),
+            cliente.get('nit', ''),
+            f"{venta.get('total', 0):.2f}",
+        ]
+        textos += [item.get('producto', '') for item in venta.get('productos', [])]
+
+        nuevas = []
+        for texto in textos:
+            for palabra in tokens(str(texto)):
+                if palabra not in self.palabras:
+                    self.palabras[palabra] = set()
+                    nuevas.append(palabra)
+                self.palabras[palabra].add(posicion)
+        return nuevas
@@ -8,64 +8,77 @@ import tkcalendar
 import json
 import os
 import uuid
+from dinero import Dinero
+from persistencia import abrir_coleccion
+from cliente_api import SERVIDOR, solicitar, servicio_inventario
+from lista_virtual import ListaVirtual, Invertida, HistorialDiferido
+from eventos import BusEventos, STOCK_CAMBIADO, TICKET_CREADO
+from reservas import reservas_para
+from contexto_datos import ContextoDatos
 
 class ProductoTextil:
+    __slots__ = ('tipo', 'cantidad', 'stock')
+    
     def __init__(self, tipo, cantidad=1, stock=0):
         self.tipo = tipo
         self.cantidad = cantidad
         self.stock = stock
     
     def calcular_subtotal(self, precios_productos):
-        return precios_productos[self.tipo] * self.cantidad
+        return Dinero.de(precios_productos[self.tipo]) * self.cantidad
     
     def __str__(self):
         return f"{self.cantidad}x {self.tipo} (Stock: {self.stock})"
 
 class Cliente:
+    __slots__ = ('nombre', 'nit', 'metodo_pago')
+    
     def __init__(self, nombre="", nit="", metodo_pago="Efectivo"):
         self.nombre = nombre
         self.nit = nit
         self.metodo_pago = metodo_pago
 
 class Ticket:
-    def __init__(self, orden_id, productos, total, cliente, timestamp=None):
-        self.ticket_id = str(uuid.uuid4())[:8].upper()
+    """Ticket de pedido. Los datos del establecimiento son iguales para todos
+    los tickets: se guardan una vez en la clase y no en cada ticket ni en
+    tickets.json."""
+    __slots__ = ('ticket_id', 'orden_id', 'productos', 'total', 'cliente', 'timestamp')
+    
+    establecimiento = "Textiles Rosy"
+    direccion = "Dirección de la empresa"
+    ciudad = "Ciudad, País"
+    telefono = "Teléfono de contacto"
+    redes_sociales = {
+        "Facebook": "TextilesRosy",
+        "Instagram": "@textiles_rosy",
+        "Twitter": "@textiles_rosy"
+    }
+    
+    def __init__(self, orden_id, productos, total, cliente, timestamp=None, ticket_id=None):
+        self.ticket_id = ticket_id or str(uuid.uuid4())[:8].upper()
         self.orden_id = orden_id
         self.productos = productos
-        self.total = total
+        self.total = Dinero.de(total)
         self.cliente = cliente
         self.timestamp = timestamp or datetime.now()
-        self.establecimiento = "Textiles Rosy"
-        self.direccion = "Dirección de la empresa"
-        self.ciudad = "Ciudad, País"
-        self.telefono = "Teléfono de contacto"
-        self.redes_sociales = {
-            "Facebook": "TextilesRosy",
-            "Instagram": "@textiles_rosy",
-            "Twitter": "@textiles_rosy"
-        }
 
     def to_dict(self):
         return {
             'ticket_id': self.ticket_id,
             'orden_id': self.orden_id,
             'productos': [(p.tipo, p.cantidad) for p in self.productos],
-            'total': self.total,
+            'total': float(self.total),
             'cliente': {
                 'nombre': self.cliente.nombre,
                 'nit': self.cliente.nit,
                 'metodo_pago': self.cliente.metodo_pago
             },
-            'timestamp': self.timestamp.isoformat(),
-            'establecimiento': self.establecimiento,
-            'direccion': self.direccion,
-            'ciudad': self.ciudad,
-            'telefono': self.telefono,
-            'redes_sociales': self.redes_sociales
+            'timestamp': self.timestamp.isoformat()
         }
 
     @classmethod
     def from_dict(cls, data):
+        # Los tickets guardados antes incluyen los datos del establecimiento; se ignoran
         cliente_data = data.get('cliente', {})
         cliente = Cliente(
             cliente_data.get('nombre', ''),
@@ -73,23 +86,17 @@ class Ticket:
             cliente_data.get('metodo_pago', 'Efectivo')
         )
         
-        ticket = cls(
+        return cls(
             data['orden_id'],
             [ProductoTextil(tipo, cantidad) for tipo, cantidad in data['productos']],
             data['total'],
             cliente,
-            datetime.fromisoformat(data['timestamp'])
+            datetime.fromisoformat(data['timestamp']),
+            data['ticket_id']
         )
-        ticket.ticket_id = data['ticket_id']
-        ticket.establecimiento = data['establecimiento']
-        ticket.direccion = data.get('direccion', ticket.direccion)
-        ticket.ciudad = data.get('ciudad', ticket.ciudad)
-        ticket.telefono = data.get('telefono', ticket.telefono)
-        ticket.redes_sociales = data.get('redes_sociales', ticket.redes_sociales)
-        return ticket
 
 class SistemaPedidosTextiles:
-    def __init__(self, root=None):
+    def __init__(self, root=None, contexto=None):
         self.window = tk.Toplevel(root) if root else tk.Tk()
         self.window.title("Sistema de Pedidos - Textiles Rosy")
         self.window.geometry("1200x800")
@@ -100,9 +107,21 @@ class SistemaPedidosTextiles:
             os.makedirs(self.data_dir)
             
         self.tickets_file = os.path.join(self.data_dir, "tickets.json")
-        self.stock_file = os.path.join(self.data_dir, "stock.json")
-        
-        self.tickets = self.cargar_tickets()
+        self.col_tickets = abrir_coleccion(self.tickets_file, [],
+                                           serializar=Ticket.to_dict,
+                                           deserializar=Ticket.from_dict)
+        
+        # El stock se comparte con las demás ventanas a través del contexto (ContextoDatos)
+        self.contexto = contexto
+        self.inventario = None
+        self.eventos = contexto.eventos if contexto else BusEventos()
+        self.eventos.suscribir(STOCK_CAMBIADO, self.al_cambiar_stock)
+        self.stock_tree = None
+        # Stock apartado por el carrito actual frente a las demás cajas
+        self.reservas = contexto.reservas() if contexto else reservas_para(self.data_dir)
+        self.carrito_id = None
+        
+        self._tickets = None  # Se leen todos solo al filtrar, exportar o generar un ticket
         self.precio_productos, self.stock_productos = self.cargar_stock()
         
         self.conf_estilo()
@@ -131,76 +150,93 @@ class SistemaPedidosTextiles:
         
         self.notebook.bind('<<NotebookTabChanged>>', self.on_tab_change)
 
+    @property
+    def tickets(self):
+        if self._tickets is None:
+            self._tickets = self.cargar_tickets()
+        return self._tickets
+
+    def tickets_recientes(self):
+        """Tickets del más reciente al más antiguo, leyendo del archivo solo los que se piden"""
+        if self._tickets is not None or SERVIDOR:
+            return reversed(self.tickets)
+        try:
+            return self.col_tickets.iterar_recientes()
+        except Exception as e:
+            print(f"Error al cargar tickets: {e}")
+            return iter(())
+
     def cargar_tickets(self):
-        if os.path.exists(self.tickets_file):
-            try:
-                with open(self.tickets_file, 'r') as f:
-                    data = json.load(f)
-                    return [Ticket.from_dict(t) for t in data]
-            except Exception as e:
-                print(f"Error al cargar tickets: {e}")
-                return []
-        return []
+        try:
+            if SERVIDOR:
+                return [Ticket.from_dict(t) for t in solicitar("GET", "/tickets")["tickets"]]
+            return self.col_tickets.cargar()
+        except Exception as e:
+            print(f"Error al cargar tickets: {e}")
+            return []
 
     def cargar_stock(self):
-        precios = {
-            # Guipiles
-            "Petzal Computarizado": 90,
-            "Petzal Alfombra": 800,
-            "Petzal Corona": 750,
-            "San Pedro": 340,
-            "San Lucas": 240,
-            "Mariposa Computarizada": 90,
-            "Canasta Computarizada": 100,
-            "San Pedro Mariposa": 250,
-            "Guipil de Toto": 350,
-            # Cortes
-            "Fino hilo alemán": 1500,
-            "Fino hilo cristal": 2000,
-            "De toto": 750,
-            "Rojo alemán": 1200,
-            # Fajas
-            "Computarizada de 3 dedos": 50,
-            "Computarizada de 4 dedos": 55,
-            "Computarizada de 6 dedos": 80,
-            "Marcador sencillo": 300,
-            "Marcador fino": 1200,
-        }
-        
-        stock = {producto: 0 for producto in precios.keys()}
-        
-        if os.path.exists(self.stock_file):
-            try:
-                with open(self.stock_file, 'r') as f:
-                    stock.update(json.load(f))
-            except Exception as e:
-                print(f"Error al cargar stock: {e}")
+        """Precios del catálogo compartido y stock de cada producto"""
+        try:
+            if self.contexto:
+                self.inventario = self.contexto.inventario()
+            else:
+                self.inventario = servicio_inventario(self.data_dir)
+        except Exception as e:
+            print(f"Error al cargar stock: {e}")
+            return {}, {}
         
-        return precios, stock
+        stock = self.inventario.stock
+        for producto in self.inventario.productos.keys():
+            stock.setdefault(producto, 0)
+        return self.inventario.productos, stock
 
     def guardar_datos(self):
+        if SERVIDOR:
+            return  # Tickets y stock se guardan en el servidor al registrarlos
         try:
-            # Guardar tickets
-            with open(self.tickets_file, 'w') as f:
-                json.dump([t.to_dict() for t in self.tickets], f, indent=4)
+            # Guardar solo los tickets nuevos (si no se leyeron, no hay nuevos)
+            if self._tickets is not None:
+                self.col_tickets.guardar(self._tickets)
             
-            # Guardar stock
-            with open(self.stock_file, 'w') as f:
-                json.dump(self.stock_productos, f, indent=4)
+            # Guardar solo el stock modificado
+            if self.inventario:
+                self.inventario.guardar()
         except Exception as e:
             print(f"Error al guardar datos: {e}")
 
     def generar_ticket(self, orden_id, productos, total, cliente):
-        # Actualizar stock
-        for producto in productos:
-            if producto.tipo in self.stock_productos:
-                self.stock_productos[producto.tipo] -= producto.cantidad
-                if self.stock_productos[producto.tipo] < 0:
-                    self.stock_productos[producto.tipo] = 0
+        if SERVIDOR:
+            return self.generar_ticket_remoto(orden_id, productos, total, cliente)
+        
+        # Actualizar stock confirmando lo apartado por el carrito
+        items = [{'producto': producto.tipo, 'cantidad': producto.cantidad} for producto in productos]
+        try:
+            self.reservas.confirmar(self.carrito_id, items, self.inventario)
+        except ValueError as e:
+            messagebox.showwarning("Stock Insuficiente", str(e))
+            return None
         
         ticket = Ticket(orden_id, productos, total, cliente)
         self.tickets.append(ticket)
         self.guardar_datos()
+        self.eventos.emitir(TICKET_CREADO, ticket=ticket.to_dict())
+        self.eventos.emitir(STOCK_CAMBIADO, productos=[producto.tipo for producto in productos])
+        return ticket
+
+    def generar_ticket_remoto(self, orden_id, productos, total, cliente):
+        """Registra el ticket en el servidor, que descuenta el stock"""
+        ticket = Ticket(orden_id, productos, total, cliente)
+        try:
+            datos = solicitar("POST", "/tickets", dict(ticket.to_dict(), carrito=self.carrito_id))
+        except (ValueError, ConnectionError) as e:
+            messagebox.showerror("Error", f"No se pudo registrar el ticket: {e}")
+            return None
+        
+        self.inventario.aplicar_stock(datos["stock"])
+        self.tickets.append(ticket)
+        self.eventos.emitir(TICKET_CREADO, ticket=datos["ticket"])
+        self.eventos.emitir(STOCK_CAMBIADO, productos=list(datos["stock"]))
         return ticket
 
     def conf_estilo(self):
@@ -380,10 +416,12 @@ class SistemaPedidosTextiles:
                 command=self.limpiar_filtros).pack(side="left", padx=5)
         
         # Lista de tickets con scroll
-        self.tickets_list = ttk.Treeview(self.tickets_frame, 
-            columns=("fecha", "total", "estado", "items"),
-            show="headings",
-            height=15)
+        self.lista_tickets = ListaVirtual(self.tickets_frame,
+            ("fecha", "total", "estado", "items"),
+            self.formatear_ticket,
+            alto=15,
+            claves_orden={"fecha": lambda t: t.timestamp, "total": lambda t: t.total})
+        self.tickets_list = self.lista_tickets.tree
         
         # Configuracion de columnas
         self.tickets_list.heading("fecha", text="Fecha y Hora")
@@ -396,13 +434,7 @@ class SistemaPedidosTextiles:
         self.tickets_list.column("estado", width=100)
         self.tickets_list.column("items", width=400)
         
-        # Scrollbar para la lista
-        scrollbar = ttk.Scrollbar(self.tickets_frame, orient="vertical", 
-                                command=self.tickets_list.yview)
-        self.tickets_list.configure(yscrollcommand=scrollbar.set)
-        
-        self.tickets_list.grid(row=1, column=0, sticky="nsew", padx=10, pady=5)
-        scrollbar.grid(row=1, column=1, sticky="ns")
+        self.lista_tickets.grid(row=1, column=0, sticky="nsew", padx=10, pady=5)
         
         # Botón para ver detalle
         ttk.Button(self.tickets_frame, text="Ver Detalle", 
@@ -449,31 +481,28 @@ class SistemaPedidosTextiles:
             self.actualizar_lista_tickets()
 
     def actualizar_lista_tickets(self, tickets_filtrados=None):
-        # Limpiar lista actual
-        for item in self.tickets_list.get_children():
-            self.tickets_list.delete(item)
-        
-        # Mostrar tickets
+        # Mostrar tickets (solo se dibujan las filas visibles)
+        if tickets_filtrados is None and self._tickets is None:
+            self.lista_tickets.establecer_datos(HistorialDiferido(self.tickets_recientes()))
+            return
         tickets_a_mostrar = tickets_filtrados if tickets_filtrados is not None else self.tickets
-        for ticket in reversed(tickets_a_mostrar):
-            self.tickets_list.insert("", "end", values=(
-                ticket.timestamp.strftime('%d/%m/%Y %H:%M'),
-                f"Q{ticket.total:.2f}",
-                ticket.ticket_id,
-                ", ".join(str(b) for b in ticket.productos)
-            ))
+        self.lista_tickets.establecer_datos(Invertida(tickets_a_mostrar))
+
+    def formatear_ticket(self, ticket):
+        return (
+            ticket.timestamp.strftime('%d/%m/%Y %H:%M'),
+            f"Q{ticket.total:.2f}",
+            ticket.ticket_id,
+            ", ".join(str(b) for b in ticket.productos)
+        )
 
     def ver_ticket_seleccionado(self):
-        seleccion = self.tickets_list.selection()
-        if not seleccion:
+        ticket = self.lista_tickets.seleccionado()
+        if not ticket:
             messagebox.showwarning("Advertencia", "Por favor seleccione un ticket")
             return
         
-        ticket_id = self.tickets_list.item(seleccion[0])['values'][2]
-        ticket = next((t for t in self.tickets if t.ticket_id == ticket_id), None)
-        
-        if ticket:
-            self.mostrar_detalle_ticket(ticket)
+        self.mostrar_detalle_ticket(ticket)
 
     def mostrar_stock(self):
         self.notebook.tab(3, state='normal')
@@ -538,12 +567,24 @@ class SistemaPedidosTextiles:
             
         for producto, precio in self.precio_productos.items():
             stock = self.stock_productos.get(producto, 0)
-            self.stock_tree.insert("", "end", values=(
+            self.stock_tree.insert("", "end", iid=producto, values=(
                 producto,
                 f"{precio:.2f}",
                 stock
             ))
 
+    def al_cambiar_stock(self, productos):
+        """Actualiza las filas de la pestaña de stock, si está abierta"""
+        if not self.stock_tree or not self.stock_tree.winfo_exists():
+            return
+        for producto in productos:
+            if producto in self.precio_productos and self.stock_tree.exists(producto):
+                self.stock_tree.item(producto, values=(
+                    producto,
+                    f"{self.precio_productos[producto]:.2f}",
+                    self.stock_productos.get(producto, 0)
+                ))
+
     def actualizar_stock(self):
         producto = self.stock_producto_var.get()
         cantidad = self.stock_cantidad_var.get()
@@ -556,9 +597,17 @@ class SistemaPedidosTextiles:
             messagebox.showwarning("Advertencia", "La cantidad no puede ser negativa")
             return
             
+        if SERVIDOR:
+            try:
+                datos = solicitar("POST", "/inventario", {"stock": {producto: cantidad}})
+            except (ValueError, ConnectionError) as e:
+                messagebox.showerror("Error", str(e))
+                return
+            self.inventario.aplicar_stock(datos["stock"])
+        
         self.stock_productos[producto] = cantidad
         self.guardar_datos()
-        self.actualizar_lista_stock()
+        self.eventos.emitir(STOCK_CAMBIADO, productos=[producto])
         messagebox.showinfo("Éxito", f"Stock de {producto} actualizado a {cantidad}")
 
     def exportar_stock(self):
@@ -578,8 +627,8 @@ class SistemaPedidosTextiles:
                             writer.writerow([producto, precio, stock])
                 else:
                     data = {
-                        'precios': self.precio_productos,
-                        'stock': self.stock_productos
+                        'precios': dict(self.precio_productos),
+                        'stock': dict(self.stock_productos)
                     }
                     with open(filename, 'w') as f:
                         json.dump(data, f, indent=4)
@@ -687,6 +736,14 @@ class SistemaPedidosTextiles:
                                 f"Solo hay {stock_disponible} unidades disponibles de {producto_seleccionado}")
             return
             
+        try:
+            if self.carrito_id is None:
+                self.carrito_id = self.reservas.nuevo_carrito()
+            self.reservas.reservar(self.carrito_id, producto_seleccionado, cantidad, self.inventario)
+        except (ValueError, ConnectionError) as e:
+            messagebox.showwarning("Stock Insuficiente", str(e))
+            return
+            
         producto = ProductoTextil(producto_seleccionado, cantidad, stock_disponible)
         self.productos_en_carrito.append(producto)
         self.actualizar_carrito()
@@ -713,6 +770,15 @@ class SistemaPedidosTextiles:
             "Confirmar", "¿Está seguro de vaciar el carrito?"):
             self.productos_en_carrito = []
             self.actualizar_carrito()
+            self.liberar_reserva()
+
+    def liberar_reserva(self):
+        """Devuelve al stock disponible lo apartado por el carrito actual"""
+        try:
+            self.reservas.liberar(self.carrito_id)
+        except (ValueError, ConnectionError) as e:
+            print(f"Error liberando la reserva del carrito: {e}")  # Vence sola
+        self.carrito_id = None
 
     def confirmar_orden(self):
         if not self.productos_en_carrito:
@@ -753,12 +819,15 @@ class SistemaPedidosTextiles:
                                        self.productos_en_carrito.copy(), 
                                        total,
                                        self.cliente_actual)
+            if ticket is None:
+                return
             
             # Crear la orden
             self.crear_orden()
             
-            # Limpiar carrito y datos del cliente
+            # Limpiar carrito y datos del cliente (la reserva se borró con el ticket)
             self.productos_en_carrito = []
+            self.carrito_id = None
             self.actualizar_carrito()
             self.cliente_nombre_var.set("")
             self.cliente_nit_var.set("")
@@ -1096,12 +1165,17 @@ class SistemaPedidosTextiles:
             row=1, column=1, sticky="e", padx=5)
         
         row = 2
-        for producto, precio in self.precio_productos.items():
-            ttk.Label(price_frame, text=producto).grid(
-                row=row, column=0, sticky="w", padx=5)
-            ttk.Label(price_frame, text=f"Q{precio:.2f}").grid(
-                row=row, column=1, sticky="e", padx=5)
+        grupos = self.inventario.catalogo.por_categoria() if self.inventario else {}
+        for categoria, productos in grupos.items():
+            ttk.Label(price_frame, text=categoria, style="Bold.TLabelframe.Label").grid(
+                row=row, column=0, sticky="w", padx=5, pady=(5,0))
             row += 1
+            for producto in productos:
+                ttk.Label(price_frame, text=producto.nombre).grid(
+                    row=row, column=0, sticky="w", padx=5)
+                ttk.Label(price_frame, text=f"Q{producto.precio:.2f}").grid(
+                    row=row, column=1, sticky="e", padx=5)
+                row += 1
 
     def setup_info_panel(self):
         """Configura el panel de información con fecha, hora y ubicación"""
@@ -1150,8 +1224,12 @@ class SistemaPedidosTextiles:
         ticket_id = tk.simpledialog.askstring("Buscar Ticket", 
                                             "Ingrese el ID del ticket:")
         if ticket_id:
-            ticket = next((t for t in self.tickets if t.ticket_id == ticket_id.upper()), 
-                         None)
+            ticket_id = ticket_id.upper()
+            if SERVIDOR:
+                # Los tickets del servidor, no los del archivo local
+                ticket = next((t for t in self.tickets if t.ticket_id == ticket_id), None)
+            else:
+                ticket = next(iter(self.col_tickets.buscar('ticket_id', ticket_id)), None)
             if ticket:
                 self.mostrar_detalle_ticket(ticket)
             else:
@@ -1173,6 +1251,8 @@ class SistemaPedidosTextiles:
 
     def salir(self):
         # Guardar tickets antes de salir
+        self.eventos.desuscribir(STOCK_CAMBIADO, self.al_cambiar_stock)
+        self.liberar_reserva()
         self.guardar_datos()
         self.window.quit()
 
@@ -1218,10 +1298,11 @@ class SistemaPedidosTextiles:
         self.window.protocol("WM_DELETE_WINDOW", self.salir)
         self.window.mainloop()
 
-def iniciar_modulo_pedidos(root=None):
-    app = SistemaPedidosTextiles(root)
+def iniciar_modulo_pedidos(root=None, contexto=None):
+    # Sin contexto propio se crea uno, para que los tickets se contabilicen al momento
+    app = SistemaPedidosTextiles(root, contexto or ContextoDatos())
     return app
 
 if __name__ == "__main__":
-    app = SistemaPedidosTextiles()
+    app = SistemaPedidosTextiles(contexto=ContextoDatos())
     app.run()
\ No newline at end of file
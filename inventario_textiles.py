@@ -3,10 +3,15 @@ from tkinter import ttk, messagebox, filedialog
 import json
 import os
 from datetime import datetime
+from cliente_api import servicio_inventario
+from catalogo import CATEGORIAS, OTROS
+from persistencia import esperar_guardados
+from eventos import BusEventos, STOCK_CAMBIADO
 
 class InventarioTextiles:
-    def __init__(self, root=None):
+    def __init__(self, root=None, contexto=None):
         self.root = root
+        self.contexto = contexto  # Datos compartidos con las demás ventanas (ContextoDatos)
         self.window = tk.Toplevel(root) if root else tk.Tk()
         self.window.title("Sistema de Inventario - Textiles Rosy")
         self.window.geometry("1000x600")
@@ -19,20 +24,32 @@ class InventarioTextiles:
         if not os.path.exists(self.data_dir):
             os.makedirs(self.data_dir)
             
-        self.stock_file = os.path.join(self.data_dir, "stock.json")
-        self.precios_file = os.path.join(self.data_dir, "precios.json")
-        
         # Cargar datos
-        self.cargar_datos()
+        if self.contexto:
+            self.servicio = self.contexto.inventario()
+        else:
+            self.servicio = servicio_inventario(self.data_dir)
+            self.servicio.asincrono = True
+        self.catalogo = self.servicio.catalogo
+        self.productos = self.servicio.productos
+        self.stock = self.servicio.stock
         
         # Configurar interfaz
         self.conf_estilo()
         self.conf_gui()
         
+        # Cambios de precio/stock hechos en esta u otras ventanas (ventas, pedidos)
+        self.eventos = self.contexto.eventos if self.contexto else BusEventos()
+        self.eventos.suscribir(STOCK_CAMBIADO, self.al_cambiar_stock)
+        
     def cargar_datos(self):
         """Carga los datos de productos y stock"""
-        self.productos = self.cargar_productos()
-        self.stock = self.cargar_stock()
+        if self.contexto:
+            self.contexto.refrescar()  # Solo relee lo que otro proceso modificó
+        else:
+            self.servicio.cargar()
+        self.productos = self.servicio.productos
+        self.stock = self.servicio.stock
     
     def conf_estilo(self):
         style = ttk.Style()
@@ -49,37 +66,8 @@ class InventarioTextiles:
         style.configure("Treeview", fieldbackground=BG_COLOR, background=BG_COLOR)
         style.configure("Treeview.Heading", background=PRIMARY_COLOR, foreground="white")
         
-    def cargar_productos(self):
-        productos_base = {
-            # ... (todos tus productos aquí)
-            "Marcador fino": 1200
-        }
-        
-        if os.path.exists(self.precios_file):
-            try:
-                with open(self.precios_file, 'r') as f:
-                    return json.load(f)
-            except:
-                return productos_base
-        return productos_base
-    
-    def cargar_stock(self):
-        stock_base = {producto: 0 for producto in self.productos.keys()}
-        
-        if os.path.exists(self.stock_file):
-            try:
-                with open(self.stock_file, 'r') as f:
-                    data = json.load(f)
-                    return {**stock_base, **data}
-            except:
-                return stock_base
-        return stock_base
-    
     def guardar_datos(self):
-        with open(self.stock_file, 'w') as f:
-            json.dump(self.stock, f, indent=4)
-        with open(self.precios_file, 'w') as f:
-            json.dump(self.productos, f, indent=4)
+        self.servicio.guardar()
     
     def conf_gui(self):
         # Frame principal
@@ -118,14 +106,18 @@ class InventarioTextiles:
         ttk.Button(btn_frame, text="Refrescar", command=self.refrescar_datos).pack(side='left', padx=2)
         
         # Treeview para mostrar inventario
-        columns = ('producto', 'precio', 'stock')
+        columns = ('codigo', 'producto', 'categoria', 'precio', 'stock')
         self.tree = ttk.Treeview(main_frame, columns=columns, show='headings')
         
+        self.tree.heading('codigo', text='Código')
         self.tree.heading('producto', text='Producto')
+        self.tree.heading('categoria', text='Categoría')
         self.tree.heading('precio', text='Precio (Q)')
         self.tree.heading('stock', text='Stock')
         
-        self.tree.column('producto', width=400)
+        self.tree.column('codigo', width=80)
+        self.tree.column('producto', width=300)
+        self.tree.column('categoria', width=100)
         self.tree.column('precio', width=200, anchor='e')
         self.tree.column('stock', width=200, anchor='e')
         
@@ -141,6 +133,10 @@ class InventarioTextiles:
         
         ttk.Button(export_frame, text="Exportar a JSON", command=self.exportar_json).pack(side='left', padx=5)
         ttk.Button(export_frame, text="Exportar a CSV", command=self.exportar_csv).pack(side='left', padx=5)
+        ttk.Button(export_frame, text="Stock Bajo", command=self.mostrar_bajo_stock).pack(side='left', padx=5)
+        
+        self.valor_var = tk.StringVar()
+        ttk.Label(export_frame, textvariable=self.valor_var).pack(side='right', padx=5)
         
         # Cargar datos iniciales
         self.actualizar_tabla()
@@ -162,9 +158,40 @@ class InventarioTextiles:
         for item in self.tree.get_children():
             self.tree.delete(item)
             
-        for producto, precio in self.productos.items():
-            stock = self.stock.get(producto, 0)
-            self.tree.insert('', 'end', values=(producto, f"Q{precio:.2f}", stock))
+        for producto in self.productos:
+            self.tree.insert('', 'end', iid=producto, values=self.valores_fila(producto))
+        self.actualizar_valor()
+    
+    def actualizar_valor(self):
+        self.valor_var.set(f"Valor del inventario: Q{self.servicio.valor_inventario():,.2f}")
+    
+    def mostrar_bajo_stock(self, limite=5):
+        productos = self.servicio.bajo_stock(limite)
+        if not productos:
+            messagebox.showinfo("Stock Bajo", f"Ningún producto tiene {limite} unidades o menos")
+            return
+        lineas = [f"{producto}: {self.stock.get(producto, 0)}" for producto in productos]
+        messagebox.showinfo("Stock Bajo", f"Productos con {limite} unidades o menos:\n\n" + "\n".join(lineas))
+    
+    def valores_fila(self, nombre):
+        producto = self.catalogo.producto(nombre)
+        return (producto.id, nombre, producto.categoria, f"Q{producto.precio:.2f}", self.stock.get(nombre, 0))
+    
+    def al_cambiar_stock(self, productos):
+        """Actualiza solo las filas de los productos modificados, agregados o eliminados"""
+        for producto in productos:
+            if producto not in self.productos:
+                if self.tree.exists(producto):
+                    self.tree.delete(producto)
+                continue
+            valores = self.valores_fila(producto)
+            if self.tree.exists(producto):
+                self.tree.item(producto, values=valores)
+            else:
+                self.tree.insert('', 'end', iid=producto, values=valores)
+        if len(self.producto_cb['values']) != len(self.productos):
+            self.producto_cb['values'] = list(self.productos.keys())
+        self.actualizar_valor()
     
     def actualizar_producto(self):
         producto = self.producto_var.get()
@@ -176,13 +203,9 @@ class InventarioTextiles:
             nuevo_precio = float(self.precio_var.get())
             nuevo_stock = int(self.stock_var.get())
             
-            if nuevo_precio <= 0 or nuevo_stock < 0:
-                raise ValueError("Valores inválidos")
-                
-            self.productos[producto] = nuevo_precio
-            self.stock[producto] = nuevo_stock
+            self.servicio.actualizar_producto(producto, nuevo_precio, nuevo_stock)
             self.guardar_datos()
-            self.actualizar_tabla()
+            self.eventos.emitir(STOCK_CAMBIADO, productos=[producto])
             messagebox.showinfo("Éxito", "Producto actualizado correctamente")
             
         except ValueError as e:
@@ -195,16 +218,9 @@ class InventarioTextiles:
                 precio = float(precio_var.get())
                 stock = int(stock_var.get())
                 
-                if not nombre or precio <= 0 or stock < 0:
-                    raise ValueError("Datos inválidos")
-                    
-                if nombre in self.productos:
-                    raise ValueError("El producto ya existe")
-                    
-                self.productos[nombre] = precio
-                self.stock[nombre] = stock
+                self.servicio.agregar_producto(nombre, precio, stock, categoria_var.get())
                 self.guardar_datos()
-                self.refrescar_datos()
+                self.eventos.emitir(STOCK_CAMBIADO, productos=[nombre])
                 top.destroy()
                 messagebox.showinfo("Éxito", "Producto agregado correctamente")
                 
@@ -226,7 +242,12 @@ class InventarioTextiles:
         stock_var = tk.StringVar(value="0")
         ttk.Entry(top, textvariable=stock_var).grid(row=2, column=1, padx=5, pady=5)
         
-        ttk.Button(top, text="Guardar", command=guardar_nuevo).grid(row=3, column=0, columnspan=2, pady=10)
+        ttk.Label(top, text="Categoría:").grid(row=3, column=0, padx=5, pady=5)
+        categoria_var = tk.StringVar(value=OTROS)
+        ttk.Combobox(top, textvariable=categoria_var, values=list(CATEGORIAS),
+                     state='readonly').grid(row=3, column=1, padx=5, pady=5)
+        
+        ttk.Button(top, text="Guardar", command=guardar_nuevo).grid(row=4, column=0, columnspan=2, pady=10)
     
     def eliminar_producto(self):
         producto = self.producto_var.get()
@@ -235,10 +256,9 @@ class InventarioTextiles:
             return
             
         if messagebox.askyesno("Confirmar", f"¿Eliminar el producto {producto}?"):
-            del self.productos[producto]
-            del self.stock[producto]
+            self.servicio.eliminar_producto(producto)
             self.guardar_datos()
-            self.refrescar_datos()
+            self.eventos.emitir(STOCK_CAMBIADO, productos=[producto])
             self.producto_var.set('')
             self.precio_var.set(0)
             self.stock_var.set(0)
@@ -252,8 +272,9 @@ class InventarioTextiles:
         if filename:
             try:
                 data = {
-                    'productos': self.productos,
-                    'stock': self.stock,
+                    'productos': dict(self.productos),
+                    'catalogo': self.catalogo.registros(),
+                    'stock': dict(self.stock),
                     'fecha_exportacion': datetime.now().isoformat()
                 }
                 with open(filename, 'w') as f:
@@ -272,17 +293,19 @@ class InventarioTextiles:
                 import csv
                 with open(filename, 'w', newline='') as f:
                     writer = csv.writer(f)
-                    writer.writerow(['Producto', 'Precio', 'Stock'])
-                    for producto, precio in self.productos.items():
-                        stock = self.stock.get(producto, 0)
-                        writer.writerow([producto, precio, stock])
+                    writer.writerow(['Código', 'Producto', 'Categoría', 'Precio', 'Stock'])
+                    for producto in self.catalogo.por_id.values():
+                        stock = self.stock.get(producto.nombre, 0)
+                        writer.writerow([producto.id, producto.nombre, producto.categoria, producto.precio, stock])
                 messagebox.showinfo("Éxito", "Datos exportados a CSV correctamente")
             except Exception as e:
                 messagebox.showerror("Error", f"No se pudo exportar: {str(e)}")
     
     def cerrar_ventana(self):
         """Maneja el cierre de la ventana"""
+        self.eventos.desuscribir(STOCK_CAMBIADO, self.al_cambiar_stock)
         self.guardar_datos()
+        esperar_guardados()
         self.window.destroy()
         if not self.root:  # Si es la ventana principal
             try:
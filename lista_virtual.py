@@ -0,0 +1,258 @@
+from tkinter import ttk
+from collections.abc import Sequence
+from itertools import islice
+
+
+class Invertida(Sequence):
+    """Vista en orden inverso de una secuencia, sin copiarla (más recientes primero)"""
+
+    def __init__(self, datos):
+        self.datos = datos
+
+    def __len__(self):
+        return len(self.datos)
+
+    def __getitem__(self, indice):
+        if isinstance(indice, slice):
+            return [self[i] for i in range(*indice.indices(len(self)))]
+        if indice < 0:
+            indice += len(self)
+        if not 0 <= indice < len(self):
+            raise IndexError(indice)
+        return self.datos[len(self.datos) - 1 - indice]
+
+
+class HistorialDiferido(Sequence):
+    """Registros de un iterador (el más reciente primero) que se leen a medida que se piden.
+
+    Al abrir un historial solo se leen los registros de la primera página; la
+    ListaVirtual pide los más antiguos con leer() al desplazarse hacia ellos,
+    o todos al ordenar.
+    """
+
+    def __init__(self, registros):
+        self._iterador = iter(registros)
+        self._leidos = []
+        self.completo = False
+
+    def leer(self, cantidad=None):
+        """Lee 'cantidad' registros más (o todos los que faltan)"""
+        if self.completo:
+            return
+        antes = len(self._leidos)
+        if cantidad is None:
+            self._leidos.extend(self._iterador)
+        else:
+            self._leidos.extend(islice(self._iterador, cantidad))
+        if cantidad is None or len(self._leidos) - antes < cantidad:
+            self.completo = True
+
+    def __len__(self):
+        return len(self._leidos)
+
+    def __getitem__(self, indice):
+        return self._leidos[indice]
+
+
+class ListaVirtual(ttk.Frame):
+    """Treeview que solo crea las filas visibles de una secuencia de registros.
+
+    El Treeview mantiene tantas filas como caben en pantalla y al desplazarse
+    se reescriben sus valores con los registros de la ventana actual. El
+    desplazamiento, la selección y el ordenamiento se calculan sobre los datos,
+    no sobre los elementos del Treeview.
+
+    formatear(registro) devuelve la tupla de valores de las columnas.
+    claves_orden permite indicar por columna la clave usada al ordenar; por
+    defecto se ordena por el valor formateado. Con un HistorialDiferido los
+    registros se leen a medida que la vista se acerca al final.
+    """
+
+    ALTO_FILA = 20
+
+    def __init__(self, parent, columnas, formatear, alto=15, claves_orden=None):
+        super().__init__(parent)
+        self.columnas = tuple(columnas)
+        self.formatear = formatear
+        self.claves_orden = claves_orden or {}
+
+        self.datos = []
+        self._orden = None        # Índices de datos en el orden mostrado
+        self._orden_columna = None
+        self._orden_desc = False
+        self._inicio = 0          # Primer registro visible
+        self._visibles = alto
+        self._seleccion = None    # Posición seleccionada (en el orden mostrado)
+
+        self.tree = ttk.Treeview(self, columns=self.columnas, show='headings',
+                                 height=alto, selectmode='browse')
+        for col in self.columnas:
+            self.tree.heading(col, command=lambda c=col: self.ordenar(c))
+
+        self.scrollbar = ttk.Scrollbar(self, orient='vertical', command=self._desplazar_barra)
+
+        self.tree.pack(side='left', fill='both', expand=True)
+        self.scrollbar.pack(side='right', fill='y')
+
+        self.tree.bind('<<TreeviewSelect>>', self._al_seleccionar)
+        self.tree.bind('<Configure>', self._al_redimensionar)
+        self.tree.bind('<MouseWheel>', lambda e: self._rueda(-1 if e.delta > 0 else 1))
+        self.tree.bind('<Button-4>', lambda e: self._rueda(-1))
+        self.tree.bind('<Button-5>', lambda e: self._rueda(1))
+        self.tree.bind('<Up>', lambda e: self._mover_seleccion(-1))
+        self.tree.bind('<Down>', lambda e: self._mover_seleccion(1))
+        self.tree.bind('<Prior>', lambda e: self._mover_seleccion(-self._visibles))
+        self.tree.bind('<Next>', lambda e: self._mover_seleccion(self._visibles))
+        self.tree.bind('<Home>', lambda e: self._mover_seleccion(-len(self)))
+        self.tree.bind('<End>', lambda e: self._mover_seleccion(len(self)))
+
+    # --------------------------------------------
+    # Interfaz pública
+    # --------------------------------------------
+    def establecer_datos(self, datos):
+        """Muestra una nueva secuencia de registros desde el principio"""
+        self.datos = datos
+        self._inicio = 0
+        self._seleccion = None
+        self._aplicar_orden()
+        self.refrescar()
+
+    def refrescar(self):
+        """Vuelve a dibujar la ventana visible (p.ej. si los datos crecieron)"""
+        if self._orden is not None and len(self._orden) != len(self.datos):
+            self._aplicar_orden()
+        self._inicio = max(0, min(self._inicio, len(self) - self._visibles))
+        self._dibujar()
+
+    def ordenar(self, columna):
+        """Ordena por la columna; un segundo clic invierte el orden"""
+        if self._orden_columna == columna:
+            self._orden_desc = not self._orden_desc
+        else:
+            self._orden_columna = columna
+            self._orden_desc = False
+        self._seleccion = None
+        self._aplicar_orden()
+        self._inicio = 0
+        self._dibujar()
+
+    def seleccionado(self):
+        """Registro seleccionado o None"""
+        if self._seleccion is None or self._seleccion >= len(self):
+            return None
+        return self._registro(self._seleccion)
+
+    def ver(self, posicion):
+        """Desplaza la vista para que la posición quede visible"""
+        if posicion < self._inicio:
+            self._inicio = posicion
+        elif posicion >= self._inicio + self._visibles:
+            self._inicio = posicion - self._visibles + 1
+        self.refrescar()
+
+    def __len__(self):
+        return len(self.datos)
+
+    # --------------------------------------------
+    # Modelo
+    # --------------------------------------------
+    def _registro(self, posicion):
+        indice = self._orden[posicion] if self._orden is not None else posicion
+        return self.datos[indice]
+
+    def _aplicar_orden(self):
+        if self._orden_columna is None:
+            self._orden = None
+            return
+        if isinstance(self.datos, HistorialDiferido):
+            self.datos.leer()  # Ordenar necesita todos los registros
+        clave = self.claves_orden.get(self._orden_columna)
+        if clave is None:
+            n = self.columnas.index(self._orden_columna)
+            clave = lambda registro: self.formatear(registro)[n]
+        datos = self.datos
+        self._orden = sorted(range(len(datos)), key=lambda i: clave(datos[i]),
+                             reverse=self._orden_desc)
+
+    # --------------------------------------------
+    # Dibujo
+    # --------------------------------------------
+    def _leer_por_adelantado(self):
+        # Mantiene leídas dos páginas más allá de la vista
+        if isinstance(self.datos, HistorialDiferido) and self._orden is None:
+            faltan = self._inicio + 3 * self._visibles - len(self.datos)
+            if faltan > 0:
+                self.datos.leer(faltan)
+
+    def _dibujar(self):
+        self._leer_por_adelantado()
+        total = len(self)
+        filas = min(self._visibles, max(0, total - self._inicio))
+
+        for slot in range(filas):
+            valores = self.formatear(self._registro(self._inicio + slot))
+            iid = str(slot)
+            if self.tree.exists(iid):
+                self.tree.item(iid, values=valores)
+            else:
+                self.tree.insert('', 'end', iid=iid, values=valores)
+
+        sobrantes = [iid for iid in self.tree.get_children() if int(iid) >= filas]
+        if sobrantes:
+            self.tree.delete(*sobrantes)
+
+        slot = None if self._seleccion is None else self._seleccion - self._inicio
+        if slot is not None and 0 <= slot < filas:
+            if self.tree.selection() != (str(slot),):
+                self.tree.selection_set(str(slot))
+            self.tree.focus(str(slot))
+        elif self.tree.selection():
+            self.tree.selection_remove(*self.tree.selection())
+
+        if total:
+            self.scrollbar.set(self._inicio / total, (self._inicio + filas) / total)
+        else:
+            self.scrollbar.set(0, 1)
+
+    def _desplazar_a(self, inicio):
+        inicio = max(0, min(inicio, len(self) - self._visibles))
+        if inicio != self._inicio:
+            self._inicio = inicio
+            self._dibujar()
+
+    # --------------------------------------------
+    # Eventos
+    # --------------------------------------------
+    def _desplazar_barra(self, accion, cantidad, unidad=None):
+        if accion == 'moveto':
+            self._desplazar_a(int(float(cantidad) * len(self)))
+        elif accion == 'scroll':
+            paso = self._visibles if unidad == 'pages' else 1
+            self._desplazar_a(self._inicio + int(cantidad) * paso)
+
+    def _rueda(self, direccion):
+        self._desplazar_a(self._inicio + direccion * 3)
+        return 'break'
+
+    def _mover_seleccion(self, delta):
+        if not len(self):
+            return 'break'
+        actual = self._seleccion if self._seleccion is not None else self._inicio - (1 if delta > 0 else 0)
+        self._seleccion = max(0, min(len(self) - 1, actual + delta))
+        self.ver(self._seleccion)
+        self.tree.event_generate('<<TreeviewSelect>>')
+        return 'break'
+
+    def _al_seleccionar(self, event=None):
+        seleccion = self.tree.selection()
+        if seleccion:
+            self._seleccion = self._inicio + int(seleccion[0])
+
+    def _al_redimensionar(self, event):
+        primera = self.tree.bbox(str(0)) if self.tree.exists('0') else None
+        alto_fila = primera[3] if primera else self.ALTO_FILA
+        encabezado = primera[1] if primera else self.ALTO_FILA
+        visibles = max(1, (event.height - encabezado) // alto_fila)
+        if visibles != self._visibles:
+            self._visibles = visibles
+            self.refrescar()
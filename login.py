@@ -1,11 +1,8 @@
+from arranque import cargar_clase, marcar_ventana_visible
 import tkinter as tk
 from tkinter import ttk, messagebox
-import json
-import os
-from inventario_textiles import InventarioTextiles
-from ventas_textiles import VentasTextiles
-from recursos_humanos import RecursosHumanos
-from finanzas_textiles import FinanzasTextiles
+from contexto_datos import ContextoDatos
+from persistencia import escribir_json, leer_json, esperar_guardados
 
 class SistemaAutenticacion:
     USUARIOS_FILE = "usuarios.json"
@@ -16,13 +13,10 @@ class SistemaAutenticacion:
         self.crear_admin_si_no_existe()
     
     def cargar_usuarios(self):
-        if os.path.exists(self.USUARIOS_FILE):
-            with open(self.USUARIOS_FILE, 'r') as f:
-                self.usuarios = json.load(f)
+        self.usuarios = leer_json(self.USUARIOS_FILE, {})
     
     def guardar_usuarios(self):
-        with open(self.USUARIOS_FILE, 'w') as f:
-            json.dump(self.usuarios, f, indent=4)
+        escribir_json(self.USUARIOS_FILE, self.usuarios, esperar=True)
     
     def crear_admin_si_no_existe(self):
         if "admin" not in self.usuarios:
@@ -220,6 +214,9 @@ class TextilesRosy:
         self.modulo_rrhh = None
         self.modulo_finanzas = None
 
+        # Datos compartidos por todos los módulos; cada archivo se lee una sola vez
+        self.contexto = ContextoDatos()
+
         self.conf_estilo()
         self.mostrar_login()
         self.root.protocol("WM_DELETE_WINDOW", self.cerrar_aplicacion)
@@ -330,7 +327,8 @@ class TextilesRosy:
 
     def abrir_inventario(self):
         if self.modulo_inventario is None or not self.modulo_inventario.window.winfo_exists():
-            self.modulo_inventario = InventarioTextiles(self.root)
+            InventarioTextiles = cargar_clase("inventario_textiles", "InventarioTextiles")
+            self.modulo_inventario = InventarioTextiles(self.root, contexto=self.contexto)
             if self.modulo_ventas:
                 self.modulo_ventas.inventario = self.modulo_inventario
             if self.modulo_finanzas:
@@ -339,31 +337,37 @@ class TextilesRosy:
     def abrir_ventas(self):
         if self.modulo_ventas is None or not self.modulo_ventas.window.winfo_exists():
             inventario_ref = self.modulo_inventario if self.modulo_inventario else None
-            self.modulo_ventas = VentasTextiles(self.root, inventario_ref)
+            VentasTextiles = cargar_clase("ventas_textiles", "VentasTextiles")
+            self.modulo_ventas = VentasTextiles(self.root, inventario_ref, contexto=self.contexto)
             if self.modulo_finanzas:
                 self.modulo_finanzas.modulo_ventas = self.modulo_ventas
 
     def abrir_rrhh(self):
         if self.modulo_rrhh is None or not self.modulo_rrhh.window.winfo_exists():
-            self.modulo_rrhh = RecursosHumanos(self.root)
+            RecursosHumanos = cargar_clase("recursos_humanos", "RecursosHumanos")
+            self.modulo_rrhh = RecursosHumanos(self.root, contexto=self.contexto)
             if self.modulo_finanzas:
                 self.modulo_finanzas.modulo_rrhh = self.modulo_rrhh
 
     def abrir_finanzas(self):
         if self.modulo_finanzas is None or not self.modulo_finanzas.window.winfo_exists():
+            FinanzasTextiles = cargar_clase("finanzas_textiles", "FinanzasTextiles")
             self.modulo_finanzas = FinanzasTextiles(
                 self.root,
                 ventas=self.modulo_ventas,
                 inventario=self.modulo_inventario,
-                rrhh=self.modulo_rrhh
+                rrhh=self.modulo_rrhh,
+                contexto=self.contexto
             )
 
     def cerrar_aplicacion(self):
         self.cerrar_modulos()
+        esperar_guardados()
         self.root.quit()
         self.root.destroy()
 
     def run(self):
+        self.root.after_idle(marcar_ventana_visible)
         self.root.mainloop()
 
 if __name__ == "__main__":
@@ -0,0 +1,780 @@
+import atexit
+import copy
+import gc
+import json
+import os
+import queue
+import shutil
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from itertools import islice
+
+from arranque import medir
+
+
+# Backend de almacenamiento: "json" (snapshot + bitácora) o "sqlite"
+BACKEND = os.environ.get("TEXTILES_BACKEND", "json")
+RUTA_DB = os.environ.get("TEXTILES_DB", "textiles_rosy.db")
+
+# umask del proceso, para dar a los archivos nuevos los permisos habituales
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+# Segundos durante los que se agrupan los guardados antes de un único fsync
+VENTANA_SINCRONIZACION = float(os.environ.get("TEXTILES_VENTANA_FSYNC", "0.05"))
+
+# Campos consultables por colección (se indexan en el backend SQLite)
+CAMPOS_INDICE = {
+    "ventas": {
+        "venta_id": lambda r: r.get("id"),
+        "fecha": lambda r: r.get("fecha"),
+        "nit": lambda r: r.get("cliente", {}).get("nit"),
+    },
+    "tickets": {
+        "ticket_id": lambda r: r.get("ticket_id"),
+        "fecha": lambda r: r.get("timestamp"),
+    },
+    "libro_diario": {
+        "origen": lambda r: r.get("origen"),
+        "fecha": lambda r: r.get("fecha"),
+    },
+    "empleados": {
+        "codigo": lambda r: r.get("codigo"),
+    },
+    "contratados": {
+        "codigo": lambda r: r.get("codigo"),
+    },
+    "catalogo": {
+        "nombre": lambda r: r.get("nombre"),
+        "categoria": lambda r: r.get("categoria"),
+    },
+}
+
+
+def configurar_backend(nombre, ruta_db=None):
+    """Selecciona el backend usado por abrir_coleccion"""
+    global BACKEND, RUTA_DB
+    if nombre not in ("json", "sqlite"):
+        raise ValueError(f"Backend desconocido: {nombre}")
+    BACKEND = nombre
+    if ruta_db:
+        RUTA_DB = ruta_db
+
+
+def abrir_coleccion(archivo, default, **opciones):
+    """Crea la colección persistente de un archivo de datos según el backend activo"""
+    if BACKEND == "sqlite":
+        from persistencia_sqlite import ColeccionSQLite
+        return ColeccionSQLite(archivo, default, ruta_db=RUTA_DB, **opciones)
+    return ColeccionBitacora(archivo, default, **opciones)
+
+
+def nombre_coleccion(archivo):
+    """Nombre lógico de la colección a partir de su archivo (data/ventas.json -> ventas)"""
+    return os.path.splitext(os.path.basename(archivo))[0]
+
+
+def escribir_json(archivo, datos, encoder=None, esperar=False):
+    """Escribe un archivo JSON completo con el formato usado por el sistema.
+
+    El contenido se serializa en el momento y se escribe de forma atómica en el
+    siguiente commit grupal; con esperar=True se espera a que quede en disco.
+    """
+    _commit.escribir(archivo, json.dumps(datos, indent=4, cls=encoder))
+    if esperar:
+        sincronizar()
+
+
+def leer_json(archivo, default):
+    """Lee un archivo JSON, incluyendo una escritura aún pendiente de este proceso.
+
+    Si el archivo está dañado se conserva una copia <archivo>.corrupto antes de
+    devolver el valor por defecto, para que el siguiente guardado no la pierda.
+    """
+    with medir("datos", archivo):
+        return _leer_json(archivo, default)
+
+
+def _leer_json(archivo, default):
+    pendiente = _commit.pendiente(archivo)
+    if pendiente is not None:
+        return json.loads(pendiente)
+    if not os.path.exists(archivo):
+        return copy.deepcopy(default)
+    try:
+        with open(archivo, 'r') as f:
+            return json.load(f)
+    except ValueError as e:
+        respaldo = archivo + ".corrupto"
+        shutil.copyfile(archivo, respaldo)
+        print(f"Error cargando {archivo}: {e}. Copia guardada en {respaldo}")
+    except OSError as e:
+        print(f"Error cargando {archivo}: {e}")
+    return copy.deepcopy(default)
+
+
+def _es_ndjson(archivo):
+    """Los snapshots de listas se guardan con un registro por línea (NDJSON);
+    los anteriores, como arreglo JSON"""
+    try:
+        with open(archivo, 'rb') as f:
+            for linea in f:
+                linea = linea.strip()
+                if linea:
+                    return not linea.startswith(b"[") and linea not in (b"{", b"{}")
+    except FileNotFoundError:
+        pass
+    return True
+
+
+def _leer_ndjson(archivo):
+    """Lee un registro por línea; si una línea está dañada conserva una copia <archivo>.corrupto"""
+    registros = []
+    if not os.path.exists(archivo):
+        return registros
+    try:
+        with open(archivo, 'r') as f:
+            lineas = [linea for linea in f if linea.strip()]
+        try:
+            return json.loads("[" + ",".join(lineas) + "]")  # Un solo llamado al decodificador
+        except ValueError:
+            pass
+        for linea in lineas:  # Hay una línea dañada: se leen las anteriores a ella
+            registros.append(json.loads(linea))
+    except ValueError as e:
+        respaldo = archivo + ".corrupto"
+        shutil.copyfile(archivo, respaldo)
+        print(f"Error cargando {archivo}: {e}. Copia guardada en {respaldo}")
+    except OSError as e:
+        print(f"Error cargando {archivo}: {e}")
+    return registros
+
+
+def _lineas_desde_el_final(archivo, bloque=1 << 16):
+    """Líneas no vacías de la última a la primera, leyendo el archivo en bloques desde el final"""
+    with open(archivo, 'rb') as f:
+        posicion = f.seek(0, os.SEEK_END)
+        resto = b""
+        while posicion > 0:
+            tamano = min(bloque, posicion)
+            posicion -= tamano
+            f.seek(posicion)
+            partes = (f.read(tamano) + resto).split(b"\n")
+            resto = partes[0]
+            for linea in reversed(partes[1:]):
+                if linea.strip():
+                    yield linea
+        if resto.strip():
+            yield resto
+
+
+def _contar_lineas(archivo, bloque=1 << 20):
+    total = 0
+    with open(archivo, 'rb') as f:
+        for trozo in iter(lambda: f.read(bloque), b""):
+            total += trozo.count(b"\n")
+    return total
+
+
+@contextmanager
+def _sin_recoleccion():
+    """Pausa el recolector de ciclos mientras se crean los registros de una carga o compactación.
+
+    Los registros cargados no forman ciclos, pero con miles de objetos nuevos
+    el recolector se ejecutaría muchas veces recorriendo todos los anteriores.
+    """
+    activo = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if activo:
+            gc.enable()
+
+
+def _permisos(archivo):
+    """Permisos del archivo existente, o los de un archivo nuevo según la umask"""
+    try:
+        return os.stat(archivo).st_mode & 0o7777
+    except FileNotFoundError:
+        return 0o666 & ~_UMASK
+
+
+def escribir_atomico(archivo, texto):
+    """Escribe en un temporal del mismo directorio, hace fsync y lo renombra sobre el archivo"""
+    directorio = os.path.dirname(os.path.abspath(archivo))
+    fd, temporal = tempfile.mkstemp(prefix=os.path.basename(archivo) + ".", suffix=".tmp", dir=directorio)
+    try:
+        # mkstemp crea el temporal con 0600; el archivo conserva sus permisos
+        os.chmod(temporal, _permisos(archivo))
+        with os.fdopen(fd, 'w') as f:
+            f.write(texto)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporal, archivo)
+    except BaseException:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+        raise
+    _fsync_directorio(directorio)
+
+
+def _marca_archivo(archivo):
+    try:
+        estado = os.stat(archivo)
+    except FileNotFoundError:
+        return None
+    return estado.st_mtime_ns, estado.st_size
+
+
+@contextmanager
+def bloqueo_archivo(ruta, espera=5.0, abandono=30.0):
+    """Exclusión mutua entre procesos (varias cajas) con un archivo de bloqueo.
+
+    Crear el archivo con O_EXCL es atómico también en Windows. Un bloqueo más
+    antiguo que 'abandono' segundos se considera de un proceso que terminó.
+    """
+    limite = time.monotonic() + espera
+    while True:
+        try:
+            fd = os.open(ruta, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            try:
+                if time.time() - os.path.getmtime(ruta) > abandono:
+                    os.remove(ruta)
+                    continue
+            except FileNotFoundError:
+                continue
+            if time.monotonic() > limite:
+                raise TimeoutError(f"No se pudo obtener el bloqueo {ruta}")
+            time.sleep(0.01)
+    try:
+        os.write(fd, str(os.getpid()).encode())
+        os.close(fd)
+        yield
+    finally:
+        os.remove(ruta)
+
+
+def sincronizar():
+    """Escribe y lleva a disco todo lo pendiente del commit grupal"""
+    _commit.sincronizar()
+
+
+def _fsync_directorio(directorio):
+    # Hace durable el renombrado; en Windows no se puede abrir un directorio
+    if os.name != "posix":
+        return
+    fd = os.open(directorio, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class CommitGrupal:
+    """Agrupa los guardados de una ventana corta de tiempo en un solo fsync por archivo.
+
+    - Los archivos completos (escribir) quedan pendientes y solo se escribe la
+      última versión de cada uno, de forma atómica.
+    - Las líneas de bitácora (anexar) se escriben al momento y el fsync se hace
+      una vez por archivo en el siguiente commit.
+    Un hilo en segundo plano aplica los commits; sincronizar() lo hace en el momento.
+    """
+
+    def __init__(self, ventana=VENTANA_SINCRONIZACION):
+        self.ventana = ventana
+        self._condicion = threading.Condition()
+        self._escritura = threading.Lock()  # Los commits se aplican en orden
+        self._completos = {}   # archivo -> texto pendiente
+        self._anexados = set() # archivos con líneas aún sin fsync
+        self._hilo = None
+
+    def escribir(self, archivo, texto):
+        with self._condicion:
+            self._completos[archivo] = texto
+            self._despertar()
+
+    def anexar(self, archivo, texto):
+        with self._condicion:
+            with open(archivo, 'a') as f:
+                f.write(texto)
+            self._anexados.add(archivo)
+            self._despertar()
+
+    def pendiente(self, archivo):
+        with self._condicion:
+            return self._completos.get(archivo)
+
+    def sincronizar(self):
+        with self._escritura:
+            self._aplicar(*self._tomar_lote())
+
+    def _despertar(self):
+        if self._hilo is None or not self._hilo.is_alive():
+            self._hilo = threading.Thread(target=self._bucle, name="commit-grupal", daemon=True)
+            self._hilo.start()
+        self._condicion.notify()
+
+    def _bucle(self):
+        while True:
+            with self._condicion:
+                while not self._completos and not self._anexados:
+                    self._condicion.wait()
+            # Se deja pasar la ventana para juntar más guardados en el mismo commit
+            time.sleep(self.ventana)
+            with self._escritura:
+                try:
+                    self._aplicar(*self._tomar_lote())
+                except OSError as e:
+                    print(f"Error sincronizando datos: {e}")
+
+    def _tomar_lote(self):
+        with self._condicion:
+            completos, self._completos = self._completos, {}
+            anexados, self._anexados = self._anexados, set()
+        return completos, anexados
+
+    def _aplicar(self, completos, anexados):
+        for archivo, texto in completos.items():
+            escribir_atomico(archivo, texto)
+        for archivo in anexados:
+            try:
+                fd = os.open(archivo, os.O_RDONLY)
+            except FileNotFoundError:
+                continue  # La bitácora se compactó antes del commit
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+
+
+_commit = CommitGrupal()
+atexit.register(sincronizar)
+
+
+class TrabajadorPersistencia:
+    """Hilo que guarda colecciones fuera del hilo de la interfaz.
+
+    guardar() toma una instantánea de los datos (ver
+    ColeccionPersistente.instantanea) y la encola; la serialización y la
+    escritura ocurren en el hilo. Si una colección ya tiene un guardado en cola
+    solo se reemplaza su instantánea. La cola es acotada: si se llena,
+    guardar() espera.
+    """
+
+    LIMITE_COLA = 64
+
+    def __init__(self, limite=None):
+        self._cola = queue.Queue(maxsize=limite or self.LIMITE_COLA)
+        self._pendientes = {}  # colección -> copia a guardar
+        self._en_curso = 0
+        self._lock = threading.Lock()
+        self._hilo = threading.Thread(target=self._bucle, name="persistencia", daemon=True)
+        self._hilo.start()
+
+    def guardar(self, coleccion, datos):
+        copia = coleccion.instantanea(datos)
+        with self._lock:
+            encolar = coleccion not in self._pendientes
+            self._pendientes[coleccion] = copia
+        if encolar:
+            self._cola.put(coleccion)
+
+    def descartar(self, coleccion):
+        """Quita de la cola la instantánea pendiente de una colección que se va a guardar al momento"""
+        with self._lock:
+            self._pendientes.pop(coleccion, None)
+
+    def pendientes(self):
+        """Cantidad de colecciones con cambios aún no escritos"""
+        with self._lock:
+            return len(self._pendientes) + self._en_curso
+
+    def esperar(self):
+        """Espera a que se escriba todo lo encolado y lo lleva a disco"""
+        self._cola.join()
+        sincronizar()
+
+    def _bucle(self):
+        while True:
+            coleccion = self._cola.get()
+            try:
+                with self._lock:
+                    datos = self._pendientes.pop(coleccion, None)
+                    self._en_curso += 1
+                if datos is not None:  # None: se descartó porque ya se guardó al momento
+                    coleccion.guardar(datos)
+            except Exception as e:
+                print(f"Error guardando {coleccion.archivo}: {e}")
+            finally:
+                with self._lock:
+                    self._en_curso -= 1
+                self._cola.task_done()
+
+
+_trabajador = None
+
+
+def obtener_trabajador():
+    global _trabajador
+    if _trabajador is None:
+        _trabajador = TrabajadorPersistencia()
+        # atexit ejecuta en orden inverso: primero se vacía la cola, luego el commit
+        atexit.register(_trabajador.esperar)
+    return _trabajador
+
+
+def guardados_pendientes():
+    return _trabajador.pendientes() if _trabajador else 0
+
+
+def guardar_al_momento(coleccion, datos):
+    """Guarda una colección en este hilo, descartando su guardado en cola (que sería anterior).
+
+    Solo espera al hilo de persistencia si está escribiendo esta misma
+    colección; los cambios quedan en el siguiente commit grupal.
+    """
+    if _trabajador:
+        _trabajador.descartar(coleccion)
+    coleccion.guardar(datos)
+
+
+def esperar_guardados():
+    """Espera los guardados en segundo plano y el commit grupal"""
+    if _trabajador:
+        _trabajador.esperar()
+    else:
+        sincronizar()
+
+
+class _CopiaLista(list):
+    """Instantánea de una lista: desde 'inicio' sus registros son copias de 'originales'"""
+
+    def __init__(self, datos, inicio):
+        self.inicio = inicio
+        self.originales = datos[inicio:]
+        super().__init__(datos[:inicio] + copy.deepcopy(self.originales))
+
+    def original(self, posicion):
+        """Registro de la lista original en la posición (las comparaciones son por identidad)"""
+        return self.originales[posicion - self.inicio] if posicion >= self.inicio else self[posicion]
+
+
+def _original(datos, posicion):
+    return datos.original(posicion) if isinstance(datos, _CopiaLista) else datos[posicion]
+
+
+class ColeccionPersistente:
+    """Base de las colecciones que persisten solo lo que cambió.
+
+    Las listas (ventas, tickets, libro diario) se tratan como registros que solo
+    crecen: guardar escribe únicamente los elementos nuevos. Los diccionarios
+    (stock, empleados) escriben solo las claves modificadas o eliminadas.
+    Cualquier otro cambio en una lista provoca una reescritura completa.
+    """
+
+    def __init__(self, archivo, default, encoder=None, serializar=None, deserializar=None):
+        self.archivo = archivo
+        self.nombre = nombre_coleccion(archivo)
+        self.default = default
+        self.encoder = encoder
+        self.serializar = serializar
+        self.deserializar = deserializar
+        self.campos = CAMPOS_INDICE.get(self.nombre, {})
+
+        self._lock = threading.RLock()  # guardar puede llamarse desde el hilo de persistencia
+        self._datos = None
+        self._guardados = 0   # Cantidad de elementos de lista ya persistidos
+        self._ultimo = None   # Último elemento persistido (se compara por identidad)
+        self._cache = {}      # Clave -> JSON persistido (colecciones tipo dict)
+        self._marca = None    # Marca de los archivos tras la última carga o guardado
+
+    # --------------------------------------------
+    # Interfaz pública
+    # --------------------------------------------
+    def cargar(self):
+        """Carga la colección completa"""
+        with medir("datos", self.archivo):
+            return self._cargar()
+
+    def _cargar(self):
+        # El hilo de persistencia puede estar guardando esta colección
+        with self._lock, _sin_recoleccion():
+            datos = self._leer()
+            self._marcar_cache(datos)
+
+            if self.deserializar:
+                if isinstance(datos, list):
+                    datos = [self.deserializar(r) for r in datos]
+                else:
+                    datos = {k: self.deserializar(v) for k, v in datos.items()}
+
+            self._marcar_lista(datos)
+            self._datos = datos
+            self._marca = self.marca()
+        return datos
+
+    def guardar(self, datos):
+        """Persiste solo lo que cambió desde la última carga o guardado"""
+        with self._lock:
+            self._guardar(datos)
+
+    def guardar_async(self, datos):
+        """Encola el guardado en el hilo de persistencia y vuelve de inmediato"""
+        obtener_trabajador().guardar(self, datos)
+
+    def _guardar(self, datos):
+        if isinstance(datos, list):
+            nuevos = self._delta_lista(datos)
+            if nuevos is None:
+                self.compactar(datos)
+                return
+            if nuevos:
+                self._escribir_nuevos(self._guardados, [self._ser(r) for r in nuevos])
+        else:
+            cambios, eliminados = self._delta_dict(datos)
+            if cambios or eliminados:
+                self._escribir_cambios(cambios, eliminados)
+
+        self._marcar_lista(datos)
+        self._datos = datos
+        self._marca = self.marca()
+
+    def instantanea(self, datos):
+        """Copia de los datos para guardarlos desde otro hilo.
+
+        Se copian en profundidad los valores de un diccionario y los registros
+        de una lista que aún no se guardaron, así la interfaz puede seguir
+        modificándolos mientras el hilo de persistencia los serializa. Los ya
+        guardados se comparten: los registros no cambian después de agregarse.
+        """
+        if not isinstance(datos, list):
+            return copy.deepcopy(dict(datos))
+        # Si el hilo todavía está guardando la instantánea anterior, _guardados
+        # puede quedarse corto: esos registros también se copian, pero la copia
+        # recuerda los originales y el guardado sigue siendo solo de los nuevos
+        return _CopiaLista(datos, min(self._guardados, len(datos)))
+
+    def compactar(self, datos):
+        """Reescribe la colección completa"""
+        with self._lock, _sin_recoleccion():
+            if isinstance(datos, list):
+                snapshot = [self._ser(r) for r in datos]
+            else:
+                snapshot = {k: self._ser(v) for k, v in datos.items()}
+
+            self._reescribir(snapshot)
+            self._marcar_cache(snapshot)
+            self._marcar_lista(datos)
+            self._datos = datos
+            self._marca = self.marca()
+
+    def iterar_recientes(self):
+        """Registros de una lista, del más reciente al más antiguo.
+
+        Los backends que pueden leer desde el final lo hacen a medida que se
+        piden registros; este método base lee la colección completa.
+        """
+        for registro in reversed(self._leer()):
+            yield self._des(registro)
+
+    def leer_recientes(self, cantidad):
+        """Los 'cantidad' registros más recientes de una lista, el más reciente primero"""
+        return list(islice(self.iterar_recientes(), cantidad))
+
+    def modificada_externamente(self):
+        """Indica si otro proceso cambió los datos después de la última carga o guardado"""
+        with self._lock:
+            return self._marca is not None and self.marca() != self._marca
+
+    def marca(self):
+        """Huella del almacenamiento (mtime y tamaño de los archivos)"""
+        return _marca_archivo(self.archivo)
+
+    def buscar(self, campo, valor):
+        """Registros cuyo campo indexado coincide con el valor"""
+        extraer = self.campos[campo]
+        with self._lock:
+            datos = self._datos
+        if datos is None:
+            # Aún no se cargó (carga diferida): se busca en el archivo sin retenerlo
+            registros = self._leer()
+            registros = registros.values() if isinstance(registros, dict) else registros
+            return [self._des(r) for r in registros if extraer(r) == valor]
+        registros = datos.values() if isinstance(datos, dict) else datos
+        return [r for r in registros if extraer(self._ser(r)) == valor]
+
+    # --------------------------------------------
+    # Operaciones del backend
+    # --------------------------------------------
+    def _leer(self):
+        raise NotImplementedError
+
+    def _escribir_nuevos(self, inicio, registros):
+        raise NotImplementedError
+
+    def _escribir_cambios(self, cambios, eliminados):
+        raise NotImplementedError
+
+    def _reescribir(self, snapshot):
+        raise NotImplementedError
+
+    # --------------------------------------------
+    # Cálculo de cambios
+    # --------------------------------------------
+    def _delta_lista(self, datos):
+        """Elementos agregados al final, o None si la lista cambió de otra forma"""
+        n = self._guardados
+        if len(datos) < n or (n and _original(datos, n - 1) is not self._ultimo):
+            return None
+        return datos[n:]
+
+    def _delta_dict(self, datos):
+        """Claves nuevas o modificadas (con su JSON) y claves eliminadas"""
+        cambios = []
+        for clave, valor in datos.items():
+            texto = self._dumps(self._ser(valor))
+            if self._cache.get(clave) != texto:
+                self._cache[clave] = texto
+                cambios.append((clave, texto))
+        eliminados = [k for k in self._cache if k not in datos]
+        for clave in eliminados:
+            del self._cache[clave]
+        return cambios, eliminados
+
+    # --------------------------------------------
+    # Auxiliares
+    # --------------------------------------------
+    def _ser(self, registro):
+        return self.serializar(registro) if self.serializar else registro
+
+    def _des(self, registro):
+        return self.deserializar(registro) if self.deserializar else registro
+
+    def _dumps(self, valor):
+        return json.dumps(valor, cls=self.encoder)
+
+    def _marcar_lista(self, datos):
+        if isinstance(datos, list):
+            self._guardados = len(datos)
+            self._ultimo = _original(datos, len(datos) - 1) if datos else None
+
+    def _marcar_cache(self, datos):
+        if isinstance(datos, dict):
+            self._cache = {k: self._dumps(v) for k, v in datos.items()}
+
+
+class ColeccionBitacora(ColeccionPersistente):
+    """Colección guardada como snapshot JSON más una bitácora append-only de cambios.
+
+    El archivo original se conserva como snapshot y cada guardado agrega líneas a
+    <archivo>.bitacora.jsonl. Cuando la bitácora supera el límite se compacta
+    en el snapshot. Los snapshots de listas se escriben con un registro por
+    línea (NDJSON), así los historiales se pueden leer desde el final sin
+    cargar el archivo completo (ver iterar_recientes).
+    """
+
+    LIMITE_COMPACTACION = 1000
+
+    def __init__(self, archivo, default, limite_compactacion=None, **opciones):
+        super().__init__(archivo, default, **opciones)
+        self.bitacora_file = os.path.splitext(archivo)[0] + ".bitacora.jsonl"
+        self.limite_compactacion = limite_compactacion or self.LIMITE_COMPACTACION
+        self._entradas_bitacora = 0
+
+    def _guardar(self, datos):
+        super()._guardar(datos)
+        if self._entradas_bitacora >= self.limite_compactacion:
+            self.compactar(datos)
+
+    def _leer(self):
+        """Lee el snapshot y reaplica la bitácora pendiente"""
+        datos = self._leer_snapshot()
+        entradas = 0
+
+        if os.path.exists(self.bitacora_file):
+            try:
+                with open(self.bitacora_file, 'r') as f:
+                    for linea in f:
+                        try:
+                            entrada = json.loads(linea)
+                        except ValueError:
+                            break  # Última línea incompleta por una escritura interrumpida
+                        self._aplicar(datos, entrada)
+                        entradas += 1
+            except OSError as e:
+                print(f"Error leyendo bitácora {self.bitacora_file}: {e}")
+
+        self._entradas_bitacora = entradas
+        return datos
+
+    def marca(self):
+        return _marca_archivo(self.archivo), _marca_archivo(self.bitacora_file)
+
+    def _leer_snapshot(self):
+        if isinstance(self.default, list) and _es_ndjson(self.archivo):
+            return _leer_ndjson(self.archivo)
+        return _leer_json(self.archivo, self.default)
+
+    def iterar_recientes(self):
+        """Lee de a bloques desde el final de la bitácora y del snapshot, solo lo que se pide"""
+        if not isinstance(self.default, list) or not _es_ndjson(self.archivo):
+            yield from super().iterar_recientes()  # Snapshot anterior en arreglo JSON
+            return
+
+        en_snapshot = _contar_lineas(self.archivo) if os.path.exists(self.archivo) else 0
+        if os.path.exists(self.bitacora_file):
+            vistos = set()
+            for linea in _lineas_desde_el_final(self.bitacora_file):
+                try:
+                    entrada = json.loads(linea)
+                except ValueError:
+                    continue  # Última línea incompleta por una escritura interrumpida
+                # Las entradas con índice menor ya están en el snapshot (compactación interrumpida)
+                indice = entrada.get("i", en_snapshot)
+                if entrada.get("op") == "add" and indice >= en_snapshot and indice not in vistos:
+                    vistos.add(indice)
+                    yield self._des(entrada["v"])
+        if en_snapshot:
+            for linea in _lineas_desde_el_final(self.archivo):
+                yield self._des(json.loads(linea))
+
+    def _aplicar(self, datos, entrada):
+        op = entrada.get("op")
+        if op == "add":
+            # El índice evita duplicar registros si una compactación se interrumpió
+            if entrada.get("i", len(datos)) >= len(datos):
+                datos.append(entrada["v"])
+        elif op == "set":
+            datos[entrada["k"]] = entrada["v"]
+        elif op == "del":
+            datos.pop(entrada["k"], None)
+
+    def _escribir_nuevos(self, inicio, registros):
+        self._anexar([self._dumps({"op": "add", "i": inicio + n, "v": r})
+                      for n, r in enumerate(registros)])
+
+    def _escribir_cambios(self, cambios, eliminados):
+        lineas = [f'{{"op": "set", "k": {json.dumps(clave)}, "v": {texto}}}'
+                  for clave, texto in cambios]
+        lineas += [self._dumps({"op": "del", "k": clave}) for clave in eliminados]
+        self._anexar(lineas)
+
+    def _reescribir(self, snapshot):
+        # El snapshot debe quedar en disco antes de borrar la bitácora
+        if isinstance(snapshot, list):
+            texto = "".join(self._dumps(r) + "\n" for r in snapshot)
+        else:
+            texto = json.dumps(snapshot, indent=4, cls=self.encoder)
+        escribir_atomico(self.archivo, texto)
+        if os.path.exists(self.bitacora_file):
+            os.remove(self.bitacora_file)
+        self._entradas_bitacora = 0
+
+    def _anexar(self, lineas):
+        _commit.anexar(self.bitacora_file, "\n".join(lineas) + "\n")
+        self._entradas_bitacora += len(lineas)
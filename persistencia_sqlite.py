@@ -0,0 +1,210 @@
+import json
+import os
+import sqlite3
+import sys
+import threading
+
+from persistencia import ColeccionPersistente, ColeccionBitacora, nombre_coleccion
+
+# Archivos de datos que el migrador copia a SQLite, con el default con que
+# los abre cada módulo (lista de registros o diccionario)
+ARCHIVOS_DATOS = [
+    (os.path.join("data", "ventas.json"), []),
+    (os.path.join("data", "stock.json"), {}),
+    (os.path.join("data", "precios.json"), {}),
+    (os.path.join("data", "catalogo.json"), {}),
+    (os.path.join("data", "tickets.json"), []),
+    (os.path.join("data_finanzas", "libro_diario.json"), []),
+    (os.path.join("data_finanzas", "libro_mayor.json"), {}),
+    (os.path.join("data_finanzas", "iva_ventas.json"), []),
+    (os.path.join("data_finanzas", "iva_compras.json"), []),
+    (os.path.join("data_finanzas", "iva_mensual.json"), {}),
+    (os.path.join("data_rrhh", "empleados.json"), {}),
+    (os.path.join("data_rrhh", "seleccionados.json"), []),
+    (os.path.join("data_rrhh", "contratados.json"), {}),
+]
+
+_conexiones = {}
+_lock = threading.RLock()
+
+
+def obtener_conexion(ruta_db):
+    """Conexión compartida por base de datos, en modo WAL"""
+    with _lock:
+        if ruta_db not in _conexiones:
+            conexion = sqlite3.connect(ruta_db, check_same_thread=False)
+            conexion.execute("PRAGMA journal_mode=WAL")
+            conexion.execute("PRAGMA synchronous=NORMAL")
+            _conexiones[ruta_db] = conexion
+        return _conexiones[ruta_db]
+
+
+class ColeccionSQLite(ColeccionPersistente):
+    """Colección guardada en una tabla SQLite con índices sobre los campos consultables.
+
+    Las listas usan la posición como clave primaria y los diccionarios su clave.
+    Cada registro se guarda como JSON en la columna datos, y los campos de
+    CAMPOS_INDICE se copian a columnas indexadas para las búsquedas.
+    """
+
+    def __init__(self, archivo, default, ruta_db="textiles_rosy.db", **opciones):
+        opciones.pop("limite_compactacion", None)
+        super().__init__(archivo, default, **opciones)
+        self.ruta_db = ruta_db
+        self.es_lista = isinstance(default, list)
+        self.tabla = self.nombre
+        self.conexion = obtener_conexion(ruta_db)
+        self._crear_tabla()
+
+    def _crear_tabla(self):
+        clave = "pos INTEGER PRIMARY KEY" if self.es_lista else "clave TEXT PRIMARY KEY"
+        columnas = "".join(f", {campo} TEXT" for campo in self.campos)
+        with _lock, self.conexion:
+            self.conexion.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.tabla} ({clave}, datos TEXT NOT NULL{columnas})")
+            for campo in self.campos:
+                self.conexion.execute(
+                    f"CREATE INDEX IF NOT EXISTS idx_{self.tabla}_{campo} ON {self.tabla} ({campo})")
+
+    def marca(self):
+        # data_version cambia solo cuando otra conexión (otro proceso) hace commit
+        with _lock:
+            return self.conexion.execute("PRAGMA data_version").fetchone()[0]
+
+    # --------------------------------------------
+    # Operaciones del backend
+    # --------------------------------------------
+    def _leer(self):
+        with _lock:
+            if self.es_lista:
+                filas = self.conexion.execute(f"SELECT datos FROM {self.tabla} ORDER BY pos")
+                return [json.loads(datos) for (datos,) in filas]
+            filas = self.conexion.execute(f"SELECT clave, datos FROM {self.tabla}")
+            return {clave: json.loads(datos) for clave, datos in filas}
+
+    def iterar_recientes(self, pagina=500):
+        """Lee la tabla desde la última posición, de a páginas"""
+        if not self.es_lista:
+            yield from super().iterar_recientes()
+            return
+        ultima = None
+        while True:
+            with _lock:
+                if ultima is None:
+                    filas = self.conexion.execute(
+                        f"SELECT pos, datos FROM {self.tabla} ORDER BY pos DESC LIMIT ?", (pagina,)).fetchall()
+                else:
+                    filas = self.conexion.execute(
+                        f"SELECT pos, datos FROM {self.tabla} WHERE pos < ? ORDER BY pos DESC LIMIT ?",
+                        (ultima, pagina)).fetchall()
+            if not filas:
+                return
+            for _, datos in filas:
+                yield self._des(json.loads(datos))
+            ultima = filas[-1][0]
+
+    def _escribir_nuevos(self, inicio, registros):
+        filas = [(inicio + n, self._dumps(r), *self._valores(r)) for n, r in enumerate(registros)]
+        with _lock, self.conexion:
+            self.conexion.executemany(self._sql_insertar("pos"), filas)
+
+    def _escribir_cambios(self, cambios, eliminados):
+        filas = [(clave, texto, *self._valores(json.loads(texto))) for clave, texto in cambios]
+        with _lock, self.conexion:
+            self.conexion.executemany(self._sql_insertar("clave"), filas)
+            self.conexion.executemany(f"DELETE FROM {self.tabla} WHERE clave = ?",
+                                      [(clave,) for clave in eliminados])
+
+    def _reescribir(self, snapshot):
+        if self.es_lista:
+            filas = [(n, self._dumps(r), *self._valores(r)) for n, r in enumerate(snapshot)]
+            sql = self._sql_insertar("pos")
+        else:
+            filas = [(k, self._dumps(v), *self._valores(v)) for k, v in snapshot.items()]
+            sql = self._sql_insertar("clave")
+        with _lock, self.conexion:
+            self.conexion.execute(f"DELETE FROM {self.tabla}")
+            self.conexion.executemany(sql, filas)
+
+    # --------------------------------------------
+    # Consultas indexadas
+    # --------------------------------------------
+    def buscar(self, campo, valor):
+        """Registros cuyo campo indexado coincide con el valor"""
+        if campo not in self.campos:
+            raise KeyError(campo)
+        with _lock:
+            filas = self.conexion.execute(
+                f"SELECT datos FROM {self.tabla} WHERE {campo} = ?", (valor,)).fetchall()
+        return self._deserializar_filas(filas)
+
+    def rango(self, campo, desde, hasta):
+        """Registros con el campo indexado entre desde y hasta (inclusive)"""
+        if campo not in self.campos:
+            raise KeyError(campo)
+        with _lock:
+            filas = self.conexion.execute(
+                f"SELECT datos FROM {self.tabla} WHERE {campo} BETWEEN ? AND ? ORDER BY {campo}",
+                (desde, hasta)).fetchall()
+        return self._deserializar_filas(filas)
+
+    # --------------------------------------------
+    # Auxiliares
+    # --------------------------------------------
+    def _sql_insertar(self, clave):
+        columnas = ", ".join([clave, "datos", *self.campos])
+        marcas = ", ".join("?" * (2 + len(self.campos)))
+        return f"INSERT OR REPLACE INTO {self.tabla} ({columnas}) VALUES ({marcas})"
+
+    def _valores(self, registro):
+        valores = []
+        for extraer in self.campos.values():
+            try:
+                valor = extraer(registro)
+            except (AttributeError, TypeError):
+                valor = None
+            valores.append(None if valor is None else str(valor))
+        return valores
+
+    def _deserializar_filas(self, filas):
+        registros = [json.loads(datos) for (datos,) in filas]
+        if self.deserializar:
+            registros = [self.deserializar(r) for r in registros]
+        return registros
+
+
+def migrar_json_a_sqlite(ruta_db="textiles_rosy.db", archivos=None):
+    """Copia los archivos JSON (snapshot + bitácora) a la base SQLite.
+
+    'archivos' son pares (archivo, default) como ARCHIVOS_DATOS, o rutas
+    sueltas; de estas se lee el archivo para saber si es lista o diccionario.
+    """
+    resumen = {}
+    for entrada in archivos or ARCHIVOS_DATOS:
+        archivo, default = entrada if isinstance(entrada, tuple) else (entrada, None)
+        if not os.path.exists(archivo):
+            continue
+        if default is None:
+            default = _default_de(archivo)
+
+        origen = ColeccionBitacora(archivo, default)
+        destino = ColeccionSQLite(archivo, default, ruta_db=ruta_db)
+        datos = origen.cargar()
+        destino.compactar(datos)
+        resumen[nombre_coleccion(archivo)] = len(datos)
+    return resumen
+
+
+def _default_de(archivo):
+    """[] o {} según el contenido de un archivo JSON, o [] si es NDJSON de varias líneas"""
+    try:
+        with open(archivo, 'r') as f:
+            return {} if isinstance(json.load(f), dict) else []
+    except ValueError:
+        return []  # Un registro por línea
+
+
+if __name__ == "__main__":
+    ruta = sys.argv[1] if len(sys.argv) > 1 else "textiles_rosy.db"
+    for coleccion, cantidad in migrar_json_a_sqlite(ruta).items():
+        print(f"{coleccion}: {cantidad} registros migrados")
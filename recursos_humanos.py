@@ -1,18 +1,22 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
-import json
 import os
 from datetime import datetime
 import webbrowser
+from persistencia import abrir_coleccion
+from servicios import ServicioPlanilla
+from eventos import BusEventos, PLANILLA_CALCULADA
 
 class RecursosHumanos:
-    def __init__(self, root=None):
+    def __init__(self, root=None, contexto=None):
         self.root = root
+        self.contexto = contexto  # Datos compartidos con las demás ventanas (ContextoDatos)
         self.window = tk.Toplevel(root) if root else tk.Tk()
         self.window.title("Recursos Humanos - Textiles Rosy")
         self.window.geometry("1000x700")
         self.window.resizable(True, True)
         self.callback_nomina = None
+        self.planilla = ServicioPlanilla()
         
         # Control para evitar múltiples instancias
         self.window.protocol("WM_DELETE_WINDOW", self.cerrar_ventana)
@@ -25,6 +29,14 @@ class RecursosHumanos:
         self.empleados_file = os.path.join(self.data_dir, "empleados.json")
         self.seleccionados_file = os.path.join(self.data_dir, "seleccionados.json")
         self.contratados_file = os.path.join(self.data_dir, "contratados.json")
+        if self.contexto:
+            self.col_empleados = self.contexto.coleccion(self.empleados_file, {})
+            self.col_seleccionados = self.contexto.coleccion(self.seleccionados_file, [])
+            self.col_contratados = self.contexto.coleccion(self.contratados_file, {})
+        else:
+            self.col_empleados = abrir_coleccion(self.empleados_file, {})
+            self.col_seleccionados = abrir_coleccion(self.seleccionados_file, [])
+            self.col_contratados = abrir_coleccion(self.contratados_file, {})
         
         # Cargar datos
         self.cargar_datos()
@@ -42,30 +54,26 @@ class RecursosHumanos:
         # Configurar interfaz
         self.conf_estilo()
         self.conf_gui()
+        
+        # Avisa a finanzas de cada planilla calculada
+        self.eventos = self.contexto.eventos if self.contexto else BusEventos()
     
     def cargar_datos(self):
         """Carga los datos de empleados, seleccionados y contratados"""
-        self.empleados = self._cargar_json(self.empleados_file, {})
-        self.seleccionados = self._cargar_json(self.seleccionados_file, [])
-        self.contratados = self._cargar_json(self.contratados_file, {})
-    
-    def _cargar_json(self, file, default):
-        if os.path.exists(file):
-            try:
-                with open(file, 'r') as f:
-                    return json.load(f)
-            except:
-                return default
-        return default
+        if self.contexto:
+            self.empleados = self.contexto.datos(self.empleados_file, {})
+            self.seleccionados = self.contexto.datos(self.seleccionados_file, [])
+            self.contratados = self.contexto.datos(self.contratados_file, {})
+            return
+        self.empleados = self.col_empleados.cargar()
+        self.seleccionados = self.col_seleccionados.cargar()
+        self.contratados = self.col_contratados.cargar()
     
     def guardar_datos(self):
-        """Guarda todos los datos en archivos JSON"""
-        with open(self.empleados_file, 'w') as f:
-            json.dump(self.empleados, f, indent=4)
-        with open(self.seleccionados_file, 'w') as f:
-            json.dump(self.seleccionados, f, indent=4)
-        with open(self.contratados_file, 'w') as f:
-            json.dump(self.contratados, f, indent=4)
+        """Guarda solo los cambios de empleados, seleccionados y contratados"""
+        self.col_empleados.guardar(self.empleados)
+        self.col_seleccionados.guardar(self.seleccionados)
+        self.col_contratados.guardar(self.contratados)
     
     def conf_estilo(self):
         """Configura el estilo visual mejorado"""
@@ -688,6 +696,7 @@ Documentos:
             return
         
         self.empleado_planilla = empleado
+        self.codigo_empleado_planilla = codigo
         
         # Mostrar información del empleado
         self.empleado_planilla_info.config(state='normal')
@@ -716,52 +725,27 @@ Jornada: {empleado.get('jornada', 'N/A')}
             prestamos = float(self.prestamos_var.get())
             sanciones = float(self.sanciones_var.get())
             
-            if any(val < 0 for val in [horas_extras, bono, adelantos, prestamos, sanciones]):
-                raise ValueError("Todos los valores deben ser positivos")
-                
+            calculo = self.planilla.calcular(self.empleado_planilla, horas_extras, bono,
+                                             adelantos, prestamos, sanciones)
         except ValueError as e:
             messagebox.showerror("Error", f"Datos inválidos: {str(e)}")
             return
         
-        # Cálculos
-        sueldo_base = self.empleado_planilla['sueldo_base']
-        valor_hora_extra = (sueldo_base / 160) * 1.5  # Suponiendo 160 horas/mes
-        comision = self.empleado_planilla.get('comision', 0)
-        
-        total_horas_extras = horas_extras * valor_hora_extra
-        total_comision = sueldo_base * (comision / 100)
-        ingresos = sueldo_base + total_horas_extras + bono + total_comision
-        deducciones = adelantos + prestamos + sanciones
-        total = ingresos - deducciones
-        
         # Mostrar resultados
-        self.sueldo_base_var.set(f"Q{sueldo_base:.2f}")
-        self.horas_extras_total_var.set(f"Q{total_horas_extras:.2f}")
-        self.bono_total_var.set(f"Q{bono:.2f}")
-        self.comision_total_var.set(f"Q{total_comision:.2f}")
-        self.ingresos_var.set(f"Q{ingresos:.2f}")
-        self.deducciones_var.set(f"Q{deducciones:.2f}")
-        self.total_var.set(f"Q{total:.2f}")
+        self.sueldo_base_var.set(f"Q{calculo['sueldo_base']:.2f}")
+        self.horas_extras_total_var.set(f"Q{calculo['total_horas_extras']:.2f}")
+        self.bono_total_var.set(f"Q{calculo['bono']:.2f}")
+        self.comision_total_var.set(f"Q{calculo['total_comision']:.2f}")
+        self.ingresos_var.set(f"Q{calculo['ingresos']:.2f}")
+        self.deducciones_var.set(f"Q{calculo['deducciones']:.2f}")
+        self.total_var.set(f"Q{calculo['total']:.2f}")
         
         # Guardar historial de planilla
-        if 'historial_planilla' not in self.empleado_planilla:
-            self.empleado_planilla['historial_planilla'] = []
-        
-        self.empleado_planilla['historial_planilla'].append({
-            "fecha": datetime.now().strftime("%Y-%m-%d"),
-            "ingresos": ingresos,
-            "deducciones": deducciones,
-            "total": total,
-            "horas_extras": horas_extras,
-            "bono": bono,
-            "adelantos": adelantos,
-            "prestamos": prestamos,
-            "sanciones": sanciones
-        
-        
-        })
+        registro = self.planilla.registrar(self.empleado_planilla, calculo)
         
         self.guardar_datos()
+        self.eventos.emitir(PLANILLA_CALCULADA, codigo=self.codigo_empleado_planilla,
+                            empleado=self.empleado_planilla, planilla=registro)
         self.actualizar_status(f"Planilla calculada para {self.empleado_planilla['nombre']}")
         
     
@@ -0,0 +1,143 @@
+"""Libro de compras y ventas del IVA con totales por mes para la declaración SAT.
+
+Cada factura se guarda en data_finanzas/iva_ventas.json o iva_compras.json
+(colecciones con bitácora: registrar una factura anexa una línea en lugar de
+reescribir todo el registro) y se suma en el mismo momento a los totales de
+su mes, guardados en data_finanzas/iva_mensual.json. Las declaraciones y la
+pestaña de IVA se calculan con esos totales; las facturas solo se recorren
+para reconstruirlos si faltan o no cuadran con el número de facturas.
+
+Antes el registro completo estaba en registro_iva.json ({"compras": [...],
+"ventas": [...]}); se importa la primera vez que se abre.
+"""
+import os
+
+from dinero import Dinero, CERO
+from persistencia import abrir_coleccion, leer_json
+
+TIPOS = ("ventas", "compras")
+CAMPOS = ("subtotal", "iva", "total")
+
+
+def periodo_de(fecha):
+    """Mes (AAAA-MM) de una fecha ISO"""
+    return fecha[:7]
+
+
+class RegistroIVA:
+    """Facturas de ventas y compras y sus totales mensuales.
+
+    'registros' es {"ventas": [...], "compras": [...]}, el mismo formato del
+    registro anterior (montos como texto), y es el que indexan los cierres.
+    'mensual' es {periodo: {tipo: [facturas, subtotal, iva, total]}} con los
+    montos en centavos enteros.
+    """
+
+    def __init__(self, data_dir="data_finanzas"):
+        self.colecciones = {tipo: abrir_coleccion(os.path.join(data_dir, f"iva_{tipo}.json"), [])
+                            for tipo in TIPOS}
+        self.col_mensual = abrir_coleccion(os.path.join(data_dir, "iva_mensual.json"), {})
+
+        self.registros = {tipo: coleccion.cargar() for tipo, coleccion in self.colecciones.items()}
+        self.mensual = self.col_mensual.cargar()
+
+        anterior = os.path.join(data_dir, "registro_iva.json")
+        if not any(self.registros.values()) and os.path.exists(anterior):
+            self._importar(anterior)
+        if not self._totales_al_dia():
+            self.reconstruir()
+
+    def guardar(self):
+        """Guarda solo las facturas nuevas y los meses que cambiaron"""
+        for tipo, coleccion in self.colecciones.items():
+            coleccion.guardar(self.registros[tipo])
+        self.col_mensual.guardar(self.mensual)
+
+    # --------------------------------------------
+    # Registro de facturas
+    # --------------------------------------------
+    def registrar(self, tipo, fecha, nit, numero_factura, subtotal, iva):
+        """Agrega una factura y la suma a los totales de su mes"""
+        if tipo not in TIPOS:
+            raise ValueError(f"Tipo de IVA desconocido: {tipo}")
+        registro = {
+            "fecha": fecha,
+            "nit": nit,
+            "numero_factura": numero_factura,
+            "subtotal": str(subtotal),
+            "iva": str(iva),
+            "total": str(subtotal + iva)
+        }
+        self.registros[tipo].append(registro)
+        self._acumular(tipo, registro)
+        return registro
+
+    def reconstruir(self):
+        """Recalcula los totales mensuales recorriendo todas las facturas"""
+        self.mensual.clear()
+        for tipo in TIPOS:
+            for registro in self.registros[tipo]:
+                self._acumular(tipo, registro)
+
+    # --------------------------------------------
+    # Consultas
+    # --------------------------------------------
+    def meses(self):
+        """Períodos con facturas, en orden cronológico"""
+        return sorted(self.mensual)
+
+    def totales(self, periodo, tipo):
+        """Facturas y montos (Dinero) de un tipo en un mes"""
+        facturas, *montos = self.mensual.get(periodo, {}).get(tipo, [0, 0, 0, 0])
+        return dict(facturas=facturas, **{campo: Dinero(c) for campo, c in zip(CAMPOS, montos)})
+
+    def declaraciones(self):
+        """Declaración de cada mes: débito y crédito fiscal, saldo a pagar y remanente.
+
+        Si el crédito del mes (más el remanente anterior) supera al débito, la
+        diferencia pasa como remanente al mes siguiente.
+        """
+        remanente = CERO
+        for periodo in self.meses():
+            ventas = self.totales(periodo, "ventas")
+            compras = self.totales(periodo, "compras")
+            saldo = ventas['iva'] - compras['iva'] - remanente
+            yield {
+                "periodo": periodo,
+                "ventas": ventas,
+                "compras": compras,
+                "debito": ventas['iva'],
+                "credito": compras['iva'],
+                "remanente_anterior": remanente,
+                "a_pagar": max(saldo, CERO),
+                "remanente": max(-saldo, CERO),
+            }
+            remanente = max(-saldo, CERO)
+
+    def declaracion(self, periodo):
+        """Declaración de un mes (AAAA-MM), o None si no tiene facturas"""
+        for declaracion in self.declaraciones():
+            if declaracion['periodo'] == periodo:
+                return declaracion
+        return None
+
+    # --------------------------------------------
+    # Auxiliares
+    # --------------------------------------------
+    def _acumular(self, tipo, registro):
+        totales = self.mensual.setdefault(periodo_de(registro['fecha']), {}).setdefault(tipo, [0, 0, 0, 0])
+        totales[0] += 1
+        for n, campo in enumerate(CAMPOS, 1):
+            totales[n] += Dinero.de(registro[campo]).centavos
+
+    def _totales_al_dia(self):
+        """Los totales cuentan exactamente las facturas cargadas"""
+        return all(sum(mes.get(tipo, [0])[0] for mes in self.mensual.values()) == len(self.registros[tipo])
+                   for tipo in TIPOS)
+
+    def _importar(self, archivo):
+        """Pasa las facturas de registro_iva.json a las colecciones nuevas"""
+        anterior = leer_json(archivo, {})
+        for tipo in TIPOS:
+            self.registros[tipo].extend(anterior.get(tipo, []))
+            self.colecciones[tipo].compactar(self.registros[tipo])
@@ -0,0 +1,165 @@
+"""Reservas de stock por carrito, para que varias cajas no vendan las mismas unidades.
+
+Al agregar un producto al carrito se apartan sus unidades en
+data/reservas.json con un vencimiento. Lo disponible para un carrito es el
+stock menos lo apartado por los demás carritos vigentes. Al finalizar la
+venta la reserva se confirma: se descuenta el stock y se borra la reserva.
+Reservar y confirmar se hacen bajo un archivo de bloqueo, releyendo el
+stock si otra caja lo modificó, por lo que el stock nunca queda vendido de más.
+"""
+import os
+import time
+import uuid
+from contextlib import contextmanager
+
+from persistencia import bloqueo_archivo, escribir_json, leer_json
+from servicios import SERVIDOR
+
+
+class ErrorReserva(ValueError):
+    """Stock insuficiente o no se pudo reservar; el mensaje es para el usuario"""
+
+
+class ReservasStock:
+    """Reservas guardadas junto a data/stock.json.
+
+    Cada confirmación aumenta la versión del stock. Si una reserva vigente se
+    hizo con la versión actual, nadie vendió desde entonces y basta verificar
+    el stock; si no, también se descuenta lo apartado por los demás carritos.
+    """
+
+    DURACION = 15 * 60  # Segundos que se mantiene un carrito sin actividad
+
+    def __init__(self, data_dir="data", duracion=None):
+        self.archivo = os.path.join(data_dir, "reservas.json")
+        self.bloqueo = os.path.join(data_dir, "reservas.lock")
+        self.duracion = duracion or self.DURACION
+
+    def nuevo_carrito(self):
+        return uuid.uuid4().hex[:12]
+
+    def reservar(self, carrito, producto, cantidad, inventario):
+        """Aparta unidades del producto para el carrito o lanza ErrorReserva"""
+        with self._bloqueado(inventario):
+            estado = self._leer()
+            reserva = estado["reservas"].setdefault(carrito, {"items": {}})
+            apartado = reserva["items"].get(producto, 0)
+            disponible = self._disponible(estado, producto, carrito, inventario) - apartado
+            if cantidad > disponible:
+                raise ErrorReserva(f"No hay suficiente stock de {producto} (disponible: {max(disponible, 0)})")
+
+            reserva["items"][producto] = apartado + cantidad
+            reserva["expira"] = time.time() + self.duracion
+            reserva["version"] = estado["version"]
+            self._escribir(estado)
+
+    def liberar(self, carrito, producto=None):
+        """Devuelve lo apartado por el carrito (o solo un producto)"""
+        if not carrito:
+            return
+        with self._bloqueado():
+            estado = self._leer()
+            reserva = estado["reservas"].get(carrito)
+            if reserva is None:
+                return
+            if producto is None:
+                del estado["reservas"][carrito]
+            else:
+                reserva["items"].pop(producto, None)
+            self._escribir(estado)
+
+    def confirmar(self, carrito, items, inventario):
+        """Descuenta el stock de la venta y borra la reserva del carrito.
+
+        Sin carrito (o con la reserva vencida) la venta se valida contra el
+        stock menos lo apartado por los demás carritos.
+        """
+        with self._bloqueado(inventario):
+            estado = self._leer()
+            reserva = estado["reservas"].get(carrito) if carrito else None
+            pedidos = {}
+            for item in items:
+                pedidos[item['producto']] = pedidos.get(item['producto'], 0) + item['cantidad']
+
+            vigente = reserva is not None and reserva.get("version") == estado["version"]
+            for producto, cantidad in pedidos.items():
+                if vigente and cantidad <= reserva["items"].get(producto, 0):
+                    disponible = inventario.stock.get(producto, 0)
+                else:
+                    disponible = self._disponible(estado, producto, carrito, inventario)
+                if cantidad > disponible:
+                    raise ErrorReserva(f"No hay suficiente stock de {producto} (disponible: {max(disponible, 0)})")
+
+            # Solo el stock y la reserva se escriben antes de soltar el bloqueo
+            # (un único fsync para ambos); lo demás lo guarda el hilo de persistencia
+            inventario.descontar(items)
+            inventario.guardar_stock()
+            estado["reservas"].pop(carrito, None)
+            estado["version"] += 1
+            self._escribir(estado)
+
+    # --------------------------------------------
+    # Auxiliares
+    # --------------------------------------------
+    @contextmanager
+    def _bloqueado(self, inventario=None):
+        """Sección exclusiva entre cajas; relee el stock si otra caja lo modificó"""
+        try:
+            with bloqueo_archivo(self.bloqueo):
+                if inventario is not None and inventario.desactualizado():
+                    inventario.cargar()
+                yield
+        except TimeoutError:
+            raise ErrorReserva("Otra caja está actualizando el stock, intente de nuevo") from None
+
+    def _disponible(self, estado, producto, carrito, inventario):
+        apartado_otros = sum(r["items"].get(producto, 0)
+                             for c, r in estado["reservas"].items() if c != carrito)
+        return inventario.stock.get(producto, 0) - apartado_otros
+
+    def _leer(self):
+        """Estado de las reservas, sin las vencidas"""
+        estado = leer_json(self.archivo, {"version": 0, "reservas": {}})
+        ahora = time.time()
+        estado["reservas"] = {c: r for c, r in estado["reservas"].items() if r.get("expira", ahora) >= ahora}
+        return estado
+
+    def _escribir(self, estado):
+        escribir_json(self.archivo, estado, esperar=True)
+
+
+def _solicitar(*args, **kwargs):
+    """solicitar() de cliente_api, que se importa solo cuando hay servidor"""
+    from cliente_api import solicitar
+    return solicitar(*args, **kwargs)
+
+
+class ReservasRemotas:
+    """Reservas en el servidor (servidor.py), con la misma interfaz que ReservasStock"""
+
+    def __init__(self, servidor=None):
+        self.servidor = servidor or SERVIDOR
+
+    def nuevo_carrito(self):
+        return uuid.uuid4().hex[:12]
+
+    def reservar(self, carrito, producto, cantidad, inventario=None):
+        _solicitar("POST", "/reservas", {"carrito": carrito, "producto": producto, "cantidad": cantidad},
+                   servidor=self.servidor)
+
+    def liberar(self, carrito, producto=None):
+        if carrito:
+            _solicitar("POST", "/reservas/liberar", {"carrito": carrito, "producto": producto},
+                       servidor=self.servidor)
+
+    def confirmar(self, carrito, items, inventario):
+        datos = _solicitar("POST", "/stock/reservar", {"items": items, "carrito": carrito},
+                           servidor=self.servidor)
+        inventario.aplicar_stock(datos["stock"])
+
+
+def reservas_para(data_dir="data"):
+    """Reservas locales, o del servidor si hay uno configurado"""
+    if SERVIDOR:
+        return ReservasRemotas()
+    return ReservasStock(data_dir)
@@ -0,0 +1,693 @@
+"""Lógica de negocio de ventas, inventario, contabilidad y planilla, sin interfaz gráfica.
+
+Las ventanas de Tkinter delegan en estos servicios, y los mismos servicios se
+pueden usar desde procesos por lotes, pruebas o mediciones sin crear widgets.
+Los errores de validación se reportan con ValueError y un mensaje para el usuario.
+"""
+import os
+import uuid
+from datetime import datetime
+from decimal import Decimal
+
+from persistencia import abrir_coleccion, guardar_al_momento
+from catalogo import Catalogo, OTROS
+from tabla_compacta import TablaCompacta
+from contabilidad import (CatalogoCuentas, validar_asiento, validar_fecha, MARCA_MAYOR, EstadosFinancieros, IndiceOrigenes, MarcasSincronizacion,
+                          MayorIncremental, CierresContables,
+                          asiento_a_registro, asiento_de_registro, cuenta_a_registro, cuenta_de_registro)
+from dinero import Dinero, CERO
+from registro_iva import RegistroIVA
+
+
+# Con "0" las ventas solo llegan al libro diario con "Sincronizar Ventas"
+CONTABILIDAD_AUTOMATICA = os.environ.get("TEXTILES_CONTABILIDAD_AUTOMATICA", "1") != "0"
+
+# Dirección de servidor.py (p.ej. http://127.0.0.1:8765); sin ella las ventanas
+# usan los archivos de datos directamente (ver cliente_api.py)
+SERVIDOR = os.environ.get("TEXTILES_SERVIDOR")
+
+# Catálogo de cuentas según requisitos SAT Guatemala (se reemplaza con
+# data_finanzas/catalogo_cuentas.json si existe, en el mismo formato)
+CATALOGO_CUENTAS = {
+    "1": {"nombre": "ACTIVOS", "subcuentas": {
+        "1101": {"nombre": "Caja", "tipo": "debito"},
+        "1105": {"nombre": "Bancos", "tipo": "debito"},
+        "1110": {"nombre": "IVA por cobrar", "tipo": "debito"},
+        "1201": {"nombre": "Inventario", "tipo": "debito"}
+    }},
+    "2": {"nombre": "PASIVOS", "subcuentas": {
+        "2101": {"nombre": "Proveedores", "tipo": "credito"},
+        "2105": {"nombre": "IVA por pagar", "tipo": "credito"},
+        "2201": {"nombre": "Nóminas por pagar", "tipo": "credito"}
+    }},
+    "3": {"nombre": "PATRIMONIO", "subcuentas": {
+        "3101": {"nombre": "Capital social", "tipo": "credito"}
+    }},
+    "4": {"nombre": "INGRESOS", "subcuentas": {
+        "4101": {"nombre": "Ventas", "tipo": "credito"}
+    }},
+    "5": {"nombre": "GASTOS", "subcuentas": {
+        "5101": {"nombre": "Costos de ventas", "tipo": "debito"},
+        "5201": {"nombre": "Salarios", "tipo": "debito"},
+        "5205": {"nombre": "IGSS", "tipo": "debito"},
+        "5210": {"nombre": "ISR", "tipo": "debito"}
+    }}
+}
+
+
+def reemplazar(actual, nuevo):
+    """Reemplaza el contenido de una lista o diccionario conservando el objeto"""
+    if isinstance(actual, list):
+        actual[:] = nuevo
+    else:
+        actual.clear()
+        actual.update(nuevo)
+
+
+class ServicioInventario:
+    """Precios del catálogo (data/catalogo.json) y existencias (data/stock.json)"""
+
+    def __init__(self, data_dir="data", catalogo=None):
+        self.data_dir = data_dir
+        if not os.path.exists(self.data_dir):
+            os.makedirs(self.data_dir)
+
+        self.stock_file = os.path.join(self.data_dir, "stock.json")
+        self.col_stock = abrir_coleccion(self.stock_file, {})
+        self.catalogo = catalogo or Catalogo(self.data_dir)
+        self.productos = self.catalogo.precios  # Nombre -> precio, vista del catálogo
+        self.stock = TablaCompacta(self.catalogo.indice, 'l')
+        self.asincrono = False  # Guardar en el hilo de persistencia (ventanas)
+
+        self.cargar()
+
+    def cargar(self):
+        """Carga el stock (y el catálogo si cambió); los productos sin stock registrado quedan en 0.
+
+        Al recargar se reemplaza el contenido de los mismos diccionarios, para
+        que las ventanas que los comparten vean los datos nuevos.
+        """
+        if self.catalogo.desactualizado():
+            self.catalogo.cargar()
+        stock_base = {producto: 0 for producto in self.productos.keys()}
+        reemplazar(self.stock, {**stock_base, **self.col_stock.cargar()})
+
+    def desactualizado(self):
+        """Indica si otro proceso modificó los archivos desde la última carga"""
+        return self.catalogo.desactualizado() or self.col_stock.modificada_externamente()
+
+    def guardar(self, esperar=False):
+        """Guarda los cambios; con esperar=True se escriben al momento aunque el servicio sea asíncrono"""
+        if self.asincrono and not esperar:
+            self.col_stock.guardar_async(self.stock)
+            self.catalogo.guardar(asincrono=True)
+        else:
+            self.col_stock.guardar(self.stock)
+            self.catalogo.guardar()
+
+    def guardar_stock(self):
+        """Guarda el stock en este hilo (al confirmar una venta); el catálogo sigue con guardar()"""
+        guardar_al_momento(self.col_stock, self.stock)
+
+    def precio(self, producto):
+        return self.catalogo.precio(producto)
+
+    def hay_stock(self, producto, cantidad):
+        return self.stock.get(producto, 0) >= cantidad
+
+    def valor_inventario(self):
+        """Valor del stock a precio de venta"""
+        return self.productos.producto_escalar(self.stock)
+
+    def bajo_stock(self, limite=5):
+        """Productos con stock menor o igual al límite"""
+        return self.stock.menores_o_iguales(limite)
+
+    def reabastecer(self, cantidades=None, nivel=None):
+        """Agrega existencias por lote: cantidades (producto -> unidades) y/o
+        sube a 'nivel' los productos que estén por debajo. Devuelve lo agregado.
+        """
+        agregados = {}
+        if cantidades:
+            self.stock.sumar(cantidades)
+            agregados.update(cantidades)
+        if nivel is not None:
+            for producto, cantidad in self.stock.elevar_hasta(nivel).items():
+                agregados[producto] = agregados.get(producto, 0) + cantidad
+        return agregados
+
+    def agregar_producto(self, nombre, precio, stock=0, categoria=OTROS):
+        """Agrega un producto al catálogo con su stock inicial"""
+        if not nombre or precio <= 0 or stock < 0:
+            raise ValueError("Datos inválidos")
+        producto = self.catalogo.agregar(nombre, precio, categoria)
+        self.stock[nombre] = stock
+        return producto
+
+    def actualizar_producto(self, producto, precio, stock):
+        """Cambia precio (queda en el historial) y stock de un producto"""
+        if precio <= 0 or stock < 0:
+            raise ValueError("Valores inválidos")
+        producto = self.catalogo.fijar_precio(producto, precio)
+        self.stock[producto.nombre] = stock
+        return producto
+
+    def eliminar_producto(self, producto):
+        producto = self.catalogo.eliminar(producto)
+        if producto is not None:
+            self.stock.pop(producto.nombre, None)
+        return producto
+
+    def descontar(self, items):
+        """Descuenta del stock las cantidades vendidas (sin bajar de 0)"""
+        for item in items:
+            producto = item['producto']
+            if producto in self.stock:
+                self.stock[producto] = max(0, self.stock[producto] - item['cantidad'])
+
+
+class ServicioVentas:
+    """Registro de ventas (data/ventas.json)"""
+
+    def __init__(self, data_dir="data", diferido=False):
+        self.data_dir = data_dir
+        if not os.path.exists(self.data_dir):
+            os.makedirs(self.data_dir)
+
+        self.ventas_file = os.path.join(self.data_dir, "ventas.json")
+        self.col_ventas = abrir_coleccion(self.ventas_file, [])
+        self.asincrono = False  # Guardar en el hilo de persistencia (ventanas)
+        self.version = 0  # Aumenta con cada recarga (invalida índices sobre la lista)
+        self._ventas = None
+        if not diferido:
+            self.cargar()
+
+    @property
+    def ventas(self):
+        """Todas las ventas; con carga diferida se leen la primera vez que se usan"""
+        if self._ventas is None:
+            self.cargar()
+        return self._ventas
+
+    def cargar(self):
+        ventas = self.col_ventas.cargar()
+        if self._ventas is not None:
+            reemplazar(self._ventas, ventas)
+            self.version += 1
+        else:
+            self._ventas = ventas
+        return self._ventas
+
+    def cargadas(self):
+        return self._ventas is not None
+
+    def iterar_recientes(self):
+        """Ventas de la más reciente a la más antigua; si aún no se cargaron,
+        se leen del archivo solo las que se van pidiendo"""
+        if self._ventas is not None:
+            return reversed(self._ventas)
+        return self.col_ventas.iterar_recientes()
+
+    def desactualizado(self):
+        return self.col_ventas.modificada_externamente()
+
+    def guardar(self):
+        if self.asincrono:
+            self.col_ventas.guardar_async(self.ventas)
+        else:
+            self.col_ventas.guardar(self.ventas)
+
+    def crear_item(self, producto, cantidad, inventario=None):
+        """Línea de carrito con precio y subtotal, validando el stock disponible"""
+        if not producto:
+            raise ValueError("Seleccione un producto")
+        if cantidad <= 0:
+            raise ValueError("Cantidad inválida")
+
+        precio = 0
+        if inventario:
+            articulo = inventario.catalogo.producto(producto)  # Por id o por nombre
+            if articulo is None:
+                raise ValueError(f"Producto desconocido: {producto}")
+            producto, precio = articulo.nombre, articulo.precio
+            if not inventario.hay_stock(producto, cantidad):
+                raise ValueError(f"No hay suficiente stock de {producto}")
+
+        return {
+            'producto': producto,
+            'cantidad': cantidad,
+            'precio': precio,
+            'subtotal': float(Dinero.de(precio) * cantidad)
+        }
+
+    def registrar_venta(self, nombre, nit, metodo_pago, items, inventario=None, fecha=None,
+                        reservas=None, carrito=None):
+        """Crea la venta, descuenta el stock y guarda ambos registros.
+
+        Con reservas (ver reservas.py) el stock se descuenta confirmando la
+        reserva del carrito, que rechaza la venta si otra caja ya vendió o
+        apartó esas unidades.
+        """
+        if not items:
+            raise ValueError("El carrito está vacío")
+        if not nombre:
+            raise ValueError("Ingrese el nombre del cliente")
+
+        venta = {
+            'id': str(uuid.uuid4())[:8],
+            'fecha': fecha or datetime.now().isoformat(),
+            'cliente': {
+                'nombre': nombre,
+                'nit': nit,
+                'metodo_pago': metodo_pago
+            },
+            'productos': items,
+            'total': float(Dinero.sumar(Dinero.de(item['subtotal']) for item in items))
+        }
+
+        if inventario and reservas:
+            reservas.confirmar(carrito, items, inventario)
+        elif inventario:
+            inventario.descontar(items)
+            inventario.guardar()
+
+        self.ventas.append(venta)
+        self.guardar()
+        return venta
+
+
+class ServicioContable:
+    """Libro diario, libro mayor, registro de IVA y cierres (data_finanzas/)"""
+
+    def __init__(self, data_dir="data_finanzas", tasa_iva=Decimal('0.12')):
+        self.tasa_iva = tasa_iva  # 12% IVA Guatemala
+
+        self.data_dir = data_dir
+        if not os.path.exists(self.data_dir):
+            os.makedirs(self.data_dir)
+
+        self.catalogo_cuentas = CatalogoCuentas.cargar(os.path.join(self.data_dir, "catalogo_cuentas.json"),
+                                                       CATALOGO_CUENTAS)
+        self.cuentas_contables = self.catalogo_cuentas.grupos
+
+        self.asientos_file = os.path.join(self.data_dir, "libro_diario.json")
+        self.mayor_file = os.path.join(self.data_dir, "libro_mayor.json")
+        # Montos en centavos enteros (ver asiento_a_registro en contabilidad.py)
+        self.col_diario = abrir_coleccion(self.asientos_file, [], serializar=asiento_a_registro,
+                                          deserializar=asiento_de_registro)
+        self.col_mayor = abrir_coleccion(self.mayor_file, {}, serializar=cuenta_a_registro,
+                                         deserializar=cuenta_de_registro)
+
+        # Cargar datos
+        self.libro_diario = self.col_diario.cargar()
+        self.libro_mayor = self.col_mayor.cargar()
+        self._marca_mayor = self.libro_mayor.pop(MARCA_MAYOR, None)
+        # Facturas de compras y ventas con sus totales mensuales (ver registro_iva.py)
+        self.iva = RegistroIVA(self.data_dir)
+        self.registro_iva = self.iva.registros
+
+        # Índice de asientos por origen y marcas de sincronización
+        self.indice_origenes = IndiceOrigenes(self.libro_diario)
+        self.marcas_sync = MarcasSincronizacion(os.path.join(self.data_dir, "sincronizacion.json"))
+        self.mayor = MayorIncremental(self.libro_mayor, self.tipo_cuenta)
+        self._estados = None  # (versión del mayor, EstadosFinancieros)
+
+        # Cierres de período para reportes por rango de fechas
+        self.cierres = CierresContables(os.path.join(self.data_dir, "cierres.json"),
+                                        self.libro_diario, self.registro_iva, self.tipo_cuenta)
+
+    def guardar(self):
+        """Guarda los registros contables escribiendo solo los cambios"""
+        self.col_diario.guardar(self.libro_diario)
+        # La marca va en la misma escritura que los totales, con sus sumas de
+        # control: si la escritura se interrumpe, al cargar no coinciden
+        if self._marca_mayor is not None:
+            self._marca_mayor['control'] = self.mayor.control()
+            self.col_mayor.guardar({**self.libro_mayor, MARCA_MAYOR: self._marca_mayor})
+        else:
+            self.col_mayor.guardar(self.libro_mayor)
+        self.iva.guardar()
+
+    # --------------------------------------------
+    # Catálogo de cuentas
+    # --------------------------------------------
+    def tipo_cuenta(self, codigo):
+        """Tipo de una cuenta (debito/credito)"""
+        return self.catalogo_cuentas.tipo(codigo)
+
+    def nombre_cuenta(self, codigo):
+        return self.catalogo_cuentas.nombre(codigo)
+
+    def grupo_cuenta(self, codigo):
+        """Grupo principal de una cuenta"""
+        return self.catalogo_cuentas.grupo(codigo)
+
+    def existe_cuenta(self, codigo):
+        return self.catalogo_cuentas.es_imputable(codigo)
+
+    # --------------------------------------------
+    # Asientos
+    # --------------------------------------------
+    def registrar_asiento(self, asiento):
+        """Agrega un asiento al libro diario y actualiza sus índices.
+
+        El asiento se valida antes de agregarlo: si no es válido no queda
+        registrado a medias.
+        """
+        validar_asiento(asiento)
+        self.libro_diario.append(asiento)
+        self.indice_origenes.registrar(asiento)
+        self.cierres.registrar_asiento(asiento)
+
+    def asiento_manual(self, fecha, cuenta_debito, cuenta_credito, monto, concepto):
+        """Registra un asiento de partida doble entre dos cuentas del catálogo"""
+        validar_fecha(fecha)
+        monto = Dinero.de(monto)
+        if not cuenta_debito or not cuenta_credito or monto <= 0:
+            raise ValueError("Datos inválidos")
+        if not self.existe_cuenta(cuenta_debito):
+            raise ValueError(f"Cuenta débito {cuenta_debito} no existe")
+        if not self.existe_cuenta(cuenta_credito):
+            raise ValueError(f"Cuenta crédito {cuenta_credito} no existe")
+
+        asiento = {
+            "id": str(uuid.uuid4()),
+            "fecha": fecha,
+            "origen": "manual",
+            "movimientos": [
+                {
+                    "cuenta": cuenta_debito,
+                    "debe": monto,
+                    "haber": CERO,
+                    "concepto": concepto
+                },
+                {
+                    "cuenta": cuenta_credito,
+                    "debe": CERO,
+                    "haber": monto,
+                    "concepto": concepto
+                }
+            ]
+        }
+        self.registrar_asiento(asiento)
+        return asiento
+
+    def sincronizar_ventas(self, ventas):
+        """Registra en el diario y en el libro de IVA las ventas aún no contabilizadas"""
+        ventas_registradas = 0
+        primera_fallida = None
+
+        # Solo se recorren las ventas posteriores a la última sincronización
+        inicio = self.marcas_sync.inicio("ventas", ventas)
+        for posicion in range(inicio, len(ventas)):
+            venta = ventas[posicion]
+            # Verificar si la venta ya está registrada
+            if f"venta_{venta['id']}" in self.indice_origenes:
+                continue
+
+            try:
+                self.contabilizar_venta(venta)
+                ventas_registradas += 1
+            except Exception as e:
+                print(f"Error procesando venta {venta['id']}: {str(e)}")
+                if primera_fallida is None:
+                    primera_fallida = posicion
+                continue
+
+        self.marcas_sync.avanzar("ventas", ventas, primera_fallida)
+        return ventas_registradas
+
+    def contabilizar_inmediato(self, venta, ventas=None, origen=None):
+        """Contabiliza una venta recién completada: diario, registro de IVA y mayor.
+
+        Devuelve el asiento, o None si la venta ya estaba contabilizada. Si se
+        pasa la lista de ventas y la venta es la única pendiente, la marca de
+        sincronización avanza para que "Sincronizar Ventas" no la recorra.
+        """
+        origen = origen or f"venta_{venta['id']}"
+        if origen in self.indice_origenes:
+            return None
+
+        asiento = self.contabilizar_venta(venta, origen)
+        if ventas and ventas[-1] is venta and self.marcas_sync.inicio("ventas", ventas) == len(ventas) - 1:
+            self.marcas_sync.avanzar("ventas", ventas)
+        self.actualizar_mayor()  # Aplica solo los asientos nuevos y guarda
+        return asiento
+
+    def contabilizar_ticket(self, ticket):
+        """Contabiliza al momento un ticket de pedidos (formato de Ticket.to_dict)"""
+        venta = {
+            'id': ticket['ticket_id'],
+            'fecha': ticket['timestamp'],
+            'cliente': ticket['cliente'],
+            'total': ticket['total'],
+        }
+        return self.contabilizar_inmediato(venta, origen=f"ticket_{ticket['ticket_id']}")
+
+    def contabilizar_venta(self, venta, origen=None):
+        """Asiento de caja/ventas/IVA y registro de IVA de una venta"""
+        total = Dinero.de(venta['total'])
+        subtotal, iva = total.desglosar_iva(self.tasa_iva)
+
+        asiento_venta = {
+            "id": str(uuid.uuid4()),
+            "fecha": venta['fecha'],
+            "origen": origen or f"venta_{venta['id']}",
+            "movimientos": [
+                {
+                    "cuenta": "1101",  # Caja
+                    "debe": total,
+                    "haber": CERO,
+                    "concepto": f"Venta {venta['id']}"
+                },
+                {
+                    "cuenta": "4101",  # Ventas
+                    "debe": CERO,
+                    "haber": subtotal,
+                    "concepto": "Venta de mercadería"
+                },
+                {
+                    "cuenta": "2105",  # IVA por pagar
+                    "debe": CERO,
+                    "haber": iva,
+                    "concepto": "IVA ventas"
+                }
+            ]
+        }
+        self.registrar_asiento(asiento_venta)
+
+        # Registrar en libro de IVA
+        registro = self.iva.registrar("ventas", venta['fecha'], venta['cliente']['nit'], venta['id'], subtotal, iva)
+        self.cierres.registrar_iva("ventas", registro)
+        return asiento_venta
+
+    def registrar_compra(self, fecha, nit, numero_factura, total, cuenta_debito="1201", cuenta_credito="1101"):
+        """Asiento y registro de IVA de una factura de compra (total con IVA incluido).
+
+        El IVA de la factura va a IVA por cobrar (crédito fiscal) y la base a
+        la cuenta de débito (inventario por defecto); se paga con la cuenta de
+        crédito (caja por defecto, o proveedores si es al crédito).
+        """
+        total = Dinero.de(total)
+        nit = nit.strip()
+        numero_factura = numero_factura.strip()
+        if not nit or not numero_factura or total <= 0:
+            raise ValueError("Datos inválidos")
+        for cuenta in (cuenta_debito, cuenta_credito, "1110"):
+            if not self.existe_cuenta(cuenta):
+                raise ValueError(f"Cuenta {cuenta} no existe")
+        origen = f"compra_{nit}_{numero_factura}"
+        if origen in self.indice_origenes:
+            raise ValueError(f"La factura {numero_factura} del NIT {nit} ya está registrada")
+
+        subtotal, iva = total.desglosar_iva(self.tasa_iva)
+        asiento_compra = {
+            "id": str(uuid.uuid4()),
+            "fecha": fecha,
+            "origen": origen,
+            "movimientos": [
+                {
+                    "cuenta": cuenta_debito,
+                    "debe": subtotal,
+                    "haber": CERO,
+                    "concepto": f"Compra factura {numero_factura}"
+                },
+                {
+                    "cuenta": "1110",  # IVA por cobrar
+                    "debe": iva,
+                    "haber": CERO,
+                    "concepto": "IVA compras"
+                },
+                {
+                    "cuenta": cuenta_credito,
+                    "debe": CERO,
+                    "haber": total,
+                    "concepto": f"Pago a NIT {nit}"
+                }
+            ]
+        }
+        self.registrar_asiento(asiento_compra)
+
+        registro = self.iva.registrar("compras", fecha, nit, numero_factura, subtotal, iva)
+        self.cierres.registrar_iva("compras", registro)
+        return asiento_compra
+
+    def sincronizar_nominas(self, contratados):
+        """Registra en el diario las planillas aún no contabilizadas"""
+        nominas_registradas = 0
+
+        for codigo, empleado in contratados.items():
+            if 'historial_planilla' not in empleado:
+                continue
+
+            for planilla in empleado['historial_planilla']:
+                # Verificar si ya está registrada
+                if f"planilla_{codigo}_{planilla['fecha']}" in self.indice_origenes:
+                    continue
+
+                try:
+                    self.contabilizar_planilla(codigo, empleado, planilla)
+                    nominas_registradas += 1
+                except Exception as e:
+                    print(f"Error procesando nómina {codigo}: {str(e)}")
+                    continue
+
+        return nominas_registradas
+
+    def contabilizar_planilla(self, codigo, empleado, planilla):
+        """Asiento de salarios, IGSS, ISR y caja de una planilla"""
+        # 'total' ya descuenta las deducciones; IGSS e ISR salen del mismo pago
+        total = Dinero.de(planilla['total'])
+        igss = Dinero.de(planilla.get('igss', 0))
+        isr = Dinero.de(planilla.get('isr', 0))
+        salario_neto = total - igss - isr
+
+        asiento_nomina = {
+            "id": str(uuid.uuid4()),
+            "fecha": planilla['fecha'],
+            "origen": f"planilla_{codigo}_{planilla['fecha']}",
+            "movimientos": [
+                {
+                    "cuenta": "5201",  # Salarios
+                    "debe": salario_neto,
+                    "haber": CERO,
+                    "concepto": f"Pago a {empleado['nombre']}"
+                },
+                {
+                    "cuenta": "5205",  # IGSS
+                    "debe": igss,
+                    "haber": CERO,
+                    "concepto": "Cuota patronal IGSS"
+                },
+                {
+                    "cuenta": "5210",  # ISR
+                    "debe": isr,
+                    "haber": CERO,
+                    "concepto": "Retención ISR"
+                },
+                {
+                    "cuenta": "1101",  # Caja
+                    "debe": CERO,
+                    "haber": total,
+                    "concepto": "Pago de nómina"
+                }
+            ]
+        }
+        self.registrar_asiento(asiento_nomina)
+        return asiento_nomina
+
+    # --------------------------------------------
+    # Libro mayor
+    # --------------------------------------------
+    def actualizar_mayor(self, reconstruir=False):
+        """Aplica al libro mayor solo los asientos nuevos del diario"""
+        inicio = self._inicio_mayor()
+
+        # Sin marca válida los totales actuales no son confiables: recalcular
+        # desde el último cierre de período
+        if reconstruir or (inicio == 0 and self.libro_mayor):
+            self.mayor.reemplazar(self.cierres.saldos_al())
+        else:
+            self.mayor.aplicar(self.libro_diario[inicio:])
+
+        self._marca_mayor = {
+            'posicion': len(self.libro_diario),
+            'ultimo': self.libro_diario[-1]['id'] if self.libro_diario else None
+        }
+        self.guardar()
+
+    def _inicio_mayor(self):
+        """Primer asiento del diario aún no aplicado al mayor, o 0 si la marca no es confiable"""
+        marca = self._marca_mayor
+        if not marca or marca.get('control') != self.mayor.control():
+            return 0
+        posicion = marca['posicion']
+        if 0 < posicion <= len(self.libro_diario) and self.libro_diario[posicion - 1]['id'] == marca['ultimo']:
+            return posicion
+        return 0
+
+    def verificar_mayor(self):
+        """Cuentas cuyo saldo incremental no coincide con un recálculo completo"""
+        return self.mayor.verificar(self.libro_diario)
+
+    def estados_financieros(self, saldos=None):
+        """Balance y estado de resultados de unos saldos, o del mayor completo.
+
+        Los del mayor se guardan y solo se recalculan si el mayor cambió.
+        """
+        if saldos is not None:
+            return EstadosFinancieros(self.catalogo_cuentas, saldos)
+        if self._estados is None or self._estados[0] != self.mayor.version:
+            self._estados = (self.mayor.version, EstadosFinancieros(self.catalogo_cuentas, self.libro_mayor))
+        return self._estados[1]
+
+
+class ServicioPlanilla:
+    """Cálculo de planillas de empleados contratados"""
+
+    HORAS_MES = 160  # Suponiendo 160 horas/mes
+
+    def calcular(self, empleado, horas_extras=0, bono=0, adelantos=0, prestamos=0, sanciones=0):
+        """Ingresos, deducciones y total a pagar de un empleado"""
+        if any(val < 0 for val in [horas_extras, bono, adelantos, prestamos, sanciones]):
+            raise ValueError("Todos los valores deben ser positivos")
+
+        # Montos en centavos (ver dinero.py); se entregan como número para guardarlos
+        sueldo_base = Dinero.de(empleado['sueldo_base'])
+        comision = Decimal(str(empleado.get('comision', 0)))
+
+        # Cada producto se redondea una sola vez al centavo
+        total_horas_extras = sueldo_base * (Decimal(str(horas_extras)) * Decimal('1.5') / self.HORAS_MES)
+        total_comision = sueldo_base * (comision / 100)
+        ingresos = sueldo_base + total_horas_extras + Dinero.de(bono) + total_comision
+        deducciones = Dinero.de(adelantos) + Dinero.de(prestamos) + Dinero.de(sanciones)
+
+        return {
+            "sueldo_base": float(sueldo_base),
+            "total_horas_extras": float(total_horas_extras),
+            "total_comision": float(total_comision),
+            "ingresos": float(ingresos),
+            "deducciones": float(deducciones),
+            "total": float(ingresos - deducciones),
+            "horas_extras": horas_extras,
+            "bono": bono,
+            "adelantos": adelantos,
+            "prestamos": prestamos,
+            "sanciones": sanciones
+        }
+
+    def registrar(self, empleado, calculo, fecha=None):
+        """Agrega la planilla calculada al historial del empleado"""
+        registro = {
+            "fecha": fecha or datetime.now().strftime("%Y-%m-%d"),
+            "ingresos": calculo['ingresos'],
+            "deducciones": calculo['deducciones'],
+            "total": calculo['total'],
+            "horas_extras": calculo['horas_extras'],
+            "bono": calculo['bono'],
+            "adelantos": calculo['adelantos'],
+            "prestamos": calculo['prestamos'],
+            "sanciones": calculo['sanciones']
+        }
+        empleado.setdefault('historial_planilla', []).append(registro)
+        return registro
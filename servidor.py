@@ -0,0 +1,319 @@
+"""Servidor HTTP/JSON local que centraliza ventas, stock, tickets y contabilidad.
+
+Cuando varias cajas venden a la vez, cada una con su propia copia de
+data/ventas.json y data/stock.json, los guardados de una pisan los de otra.
+Este servidor es el único proceso que escribe los archivos de datos: las
+ventanas actúan como clientes (ver cliente_api.py) y todas las operaciones se
+ejecutan de una en una en el bucle de asyncio, por lo que no se pierden
+actualizaciones.
+
+Uso:  python servidor.py [--host 127.0.0.1] [--puerto 8765]
+
+Rutas:
+    GET  /stock                   catálogo (con ids, categorías e historial), precios y existencias
+    POST /stock/reservar          {"items": [{"producto", "cantidad"}], "carrito"}
+    POST /reservas                {"carrito", "producto", "cantidad"}  aparta stock para un carrito
+    POST /reservas/liberar        {"carrito", "producto"}  devuelve lo apartado (producto opcional)
+    POST /inventario              {"catalogo": [productos], "stock": {}, "eliminados": [ids]}
+    GET  /ventas?desde=N          ventas a partir de la posición N
+    POST /ventas                  {"cliente": {"nombre", "nit", "metodo_pago"}, "items": [...], "carrito"}
+    GET  /tickets?desde=&hasta=   tickets entre dos fechas (YYYY-MM-DD)
+    POST /tickets                 ticket (Ticket.to_dict) y "carrito"; descuenta su stock
+    POST /contabilidad/asientos   {"fecha", "cuenta_debito", "cuenta_credito", "monto", "concepto"}
+    POST /contabilidad/sincronizar  contabiliza las ventas pendientes
+"""
+import argparse
+import asyncio
+import json
+import os
+import traceback
+from datetime import date
+from http import HTTPStatus
+from urllib.parse import urlsplit, parse_qs
+
+from persistencia import abrir_coleccion
+from reservas import ReservasStock, ErrorReserva
+from servicios import ServicioInventario, ServicioVentas, ServicioContable, CONTABILIDAD_AUTOMATICA
+from contabilidad import DecimalEncoder
+
+HOST = "127.0.0.1"
+PUERTO = 8765
+
+
+class ErrorSolicitud(Exception):
+    """Error que se responde al cliente con un código HTTP"""
+
+    def __init__(self, estado, mensaje):
+        super().__init__(mensaje)
+        self.estado = estado
+
+
+class ServidorTextiles:
+    """Dueño único de los archivos de datos; atiende las rutas de la API"""
+
+    def __init__(self, data_dir="data", finanzas_dir="data_finanzas",
+                 contabilidad_automatica=CONTABILIDAD_AUTOMATICA):
+        self.inventario = ServicioInventario(data_dir)
+        self.ventas = ServicioVentas(data_dir)
+        self.reservas = ReservasStock(data_dir)  # Stock apartado por los carritos de cada caja
+        self.finanzas_dir = finanzas_dir
+        self.contabilidad_automatica = contabilidad_automatica  # Contabilizar cada venta al registrarla
+        self._contable = None  # Se carga con la primera operación contable
+
+        # Los tickets se manejan como diccionarios (formato de Ticket.to_dict)
+        self.col_tickets = abrir_coleccion(os.path.join(data_dir, "tickets.json"), [])
+        self.tickets = self.col_tickets.cargar()
+
+        self.rutas = {
+            ("GET", "/stock"): self.ver_stock,
+            ("POST", "/stock/reservar"): self.reservar_stock,
+            ("POST", "/inventario"): self.actualizar_inventario,
+            ("POST", "/reservas"): self.crear_reserva,
+            ("POST", "/reservas/liberar"): self.liberar_reserva,
+            ("GET", "/ventas"): self.listar_ventas,
+            ("POST", "/ventas"): self.crear_venta,
+            ("GET", "/tickets"): self.listar_tickets,
+            ("POST", "/tickets"): self.crear_ticket,
+            ("POST", "/contabilidad/asientos"): self.crear_asiento,
+            ("POST", "/contabilidad/sincronizar"): self.sincronizar_contabilidad,
+        }
+
+    @property
+    def contable(self):
+        if self._contable is None:
+            self._contable = ServicioContable(self.finanzas_dir)
+        return self._contable
+
+    # --------------------------------------------
+    # Inventario
+    # --------------------------------------------
+    def ver_stock(self, consulta, datos):
+        return {"catalogo": self.inventario.catalogo.registros(), "productos": dict(self.inventario.productos),
+                "stock": dict(self.inventario.stock)}
+
+    def reservar_stock(self, consulta, datos):
+        """Descuenta todas las cantidades o ninguna si alguna no alcanza"""
+        items = self._items(datos)
+        self.reservas.confirmar(datos.get("carrito"), items, self.inventario)
+        return {"stock": self._stock_de(items)}
+
+    def crear_reserva(self, consulta, datos):
+        carrito, producto, cantidad = self._campos(datos, "carrito", "producto", "cantidad")
+        self._validar_item(producto, cantidad)
+        self.reservas.reservar(carrito, producto, cantidad, self.inventario)
+        return {"carrito": carrito}
+
+    def liberar_reserva(self, consulta, datos):
+        self.reservas.liberar(datos.get("carrito"), datos.get("producto"))
+        return {"carrito": datos.get("carrito")}
+
+    def actualizar_inventario(self, consulta, datos):
+        """Aplica solo los productos/existencias enviados, sin tocar los demás productos"""
+        eliminados = self._tipo(datos.get("eliminados", []), list, "eliminados")
+        catalogo = self._tipo(datos.get("catalogo", []), list, "catalogo")
+        for producto in catalogo:
+            self._campos(producto, "id", "nombre", "precio")
+        stock = self._tipo(datos.get("stock", {}), dict, "stock")
+        
+        for producto in eliminados:
+            self.inventario.eliminar_producto(producto)
+        self.inventario.catalogo.aplicar(catalogo)
+        self.inventario.stock.update(stock)
+        self.inventario.guardar()
+        return self.ver_stock(consulta, datos)
+
+    # --------------------------------------------
+    # Ventas y tickets
+    # --------------------------------------------
+    def listar_ventas(self, consulta, datos):
+        desde = int(consulta.get("desde", 0))
+        return {"ventas": self.ventas.ventas[desde:], "total": len(self.ventas.ventas)}
+
+    def crear_venta(self, consulta, datos):
+        """Registra una venta con los precios y el stock del servidor"""
+        cliente = self._tipo(datos.get("cliente", {}), dict, "cliente")
+        items = [self.ventas.crear_item(item["producto"], item["cantidad"], self.inventario)
+                 for item in self._items(datos)]
+        venta = self.ventas.registrar_venta(cliente.get("nombre", "").strip(), cliente.get("nit", ""),
+                                            cliente.get("metodo_pago", "Efectivo"), items, self.inventario,
+                                            reservas=self.reservas, carrito=datos.get("carrito"))
+        if self.contabilidad_automatica:
+            self._contabilizar(self.contable.contabilizar_inmediato, venta, self.ventas.ventas)
+        return {"venta": venta, "stock": self._stock_de(items)}
+
+    def listar_tickets(self, consulta, datos):
+        desde = consulta.get("desde")
+        hasta = consulta.get("hasta")
+        tickets = [t for t in self.tickets
+                   if (not desde or t['timestamp'][:10] >= desde)
+                   and (not hasta or t['timestamp'][:10] <= hasta)]
+        return {"tickets": tickets}
+
+    def crear_ticket(self, consulta, datos):
+        """Guarda un ticket de pedidos y descuenta el stock de sus productos"""
+        _, productos, timestamp, _, cliente = self._campos(datos, "ticket_id", "productos", "timestamp",
+                                                           "total", "cliente")
+        self._tipo(timestamp, str, "timestamp")
+        self._tipo(cliente, dict, "cliente")
+        for producto in self._tipo(productos, list, "productos"):
+            if not isinstance(producto, list) or len(producto) != 2:
+                raise ErrorSolicitud(HTTPStatus.BAD_REQUEST, "Cada producto debe ser [tipo, cantidad]")
+            self._validar_item(*producto)
+        carrito = datos.pop("carrito", None)
+        items = [{"producto": tipo, "cantidad": cantidad} for tipo, cantidad in datos["productos"]]
+        self.reservas.confirmar(carrito, items, self.inventario)
+        self.tickets.append(datos)
+        self.col_tickets.guardar(self.tickets)
+        if self.contabilidad_automatica:
+            self._contabilizar(self.contable.contabilizar_ticket, datos)
+        return {"ticket": datos, "stock": self._stock_de(items)}
+
+    # --------------------------------------------
+    # Contabilidad
+    # --------------------------------------------
+    def crear_asiento(self, consulta, datos):
+        fecha, = self._campos(datos, "fecha")
+        try:
+            date.fromisoformat(self._tipo(fecha, str, "fecha")[:10])
+        except ValueError:
+            raise ErrorSolicitud(HTTPStatus.BAD_REQUEST, f"Fecha inválida: {fecha}") from None
+        asiento = self.contable.asiento_manual(fecha, datos.get("cuenta_debito"),
+                                               datos.get("cuenta_credito"), datos.get("monto", "0"),
+                                               datos.get("concepto", ""))
+        self.contable.actualizar_mayor()
+        return {"asiento": asiento}
+
+    def sincronizar_contabilidad(self, consulta, datos):
+        registradas = self.contable.sincronizar_ventas(self.ventas.ventas)
+        self.contable.actualizar_mayor()
+        return {"ventas_registradas": registradas}
+
+    # --------------------------------------------
+    # Auxiliares
+    # --------------------------------------------
+    def _items(self, datos):
+        items = datos.get("items")
+        if not items:
+            raise ValueError("El carrito está vacío")
+        for item in self._tipo(items, list, "items"):
+            self._validar_item(*self._campos(item, "producto", "cantidad"))
+        return items
+
+    def _validar_item(self, producto, cantidad):
+        """Producto (nombre) y cantidad entera positiva de un item de la solicitud"""
+        if not isinstance(producto, str) or not producto:
+            raise ErrorSolicitud(HTTPStatus.BAD_REQUEST, "Producto inválido")
+        if not isinstance(cantidad, int) or isinstance(cantidad, bool) or cantidad <= 0:
+            raise ErrorSolicitud(HTTPStatus.BAD_REQUEST, f"Cantidad inválida para {producto}")
+
+    def _campos(self, datos, *nombres):
+        """Valores de los campos obligatorios de un objeto de la solicitud"""
+        self._tipo(datos, dict, "objeto")
+        faltan = [nombre for nombre in nombres if nombre not in datos]
+        if faltan:
+            raise ErrorSolicitud(HTTPStatus.BAD_REQUEST, f"Faltan campos: {', '.join(faltan)}")
+        return [datos[nombre] for nombre in nombres]
+
+    def _tipo(self, valor, tipo, nombre):
+        if not isinstance(valor, tipo):
+            raise ErrorSolicitud(HTTPStatus.BAD_REQUEST, f"Valor inválido para {nombre}")
+        return valor
+
+    def _contabilizar(self, funcion, *datos):
+        # La venta ya quedó registrada: un error contable no debe rechazarla,
+        # queda pendiente para "Sincronizar Ventas"
+        try:
+            funcion(*datos)
+        except Exception as e:
+            print(f"Error contabilizando: {e}")
+
+    def _stock_de(self, items):
+        return {item["producto"]: self.inventario.stock.get(item["producto"], 0) for item in items}
+
+    # --------------------------------------------
+    # HTTP
+    # --------------------------------------------
+    def despachar(self, metodo, ruta, cuerpo):
+        """Ejecuta la ruta y devuelve (estado, respuesta)"""
+        partes = urlsplit(ruta)
+        manejador = self.rutas.get((metodo, partes.path.rstrip("/") or "/"))
+        if manejador is None:
+            return HTTPStatus.NOT_FOUND, {"error": f"Ruta no encontrada: {metodo} {partes.path}"}
+
+        consulta = {clave: valores[-1] for clave, valores in parse_qs(partes.query).items()}
+        try:
+            datos = json.loads(cuerpo) if cuerpo else {}
+        except ValueError:
+            return HTTPStatus.BAD_REQUEST, {"error": "El cuerpo no es JSON válido"}
+        if not isinstance(datos, dict):
+            return HTTPStatus.BAD_REQUEST, {"error": "Se esperaba un objeto JSON"}
+        
+        # Los manejadores validan los datos de la solicitud (ErrorSolicitud) y
+        # los servicios reportan datos inválidos con ValueError; cualquier otra
+        # excepción es un error del servidor
+        try:
+            return HTTPStatus.OK, manejador(consulta, datos)
+        except ErrorSolicitud as e:
+            return e.estado, {"error": str(e)}
+        except ErrorReserva as e:
+            return HTTPStatus.CONFLICT, {"error": str(e)}
+        except ValueError as e:
+            return HTTPStatus.BAD_REQUEST, {"error": str(e)}
+        except Exception as e:
+            traceback.print_exc()
+            print(f"Error atendiendo {metodo} {ruta}: {e}")
+            return HTTPStatus.INTERNAL_SERVER_ERROR, {"error": "Error interno del servidor"}
+
+    async def atender(self, reader, writer):
+        try:
+            linea = await reader.readline()
+            if not linea:
+                return
+            metodo, ruta, _ = linea.decode("latin-1").split(" ", 2)
+
+            largo = 0
+            while True:
+                encabezado = await reader.readline()
+                if encabezado in (b"\r\n", b"\n", b""):
+                    break
+                nombre, _, valor = encabezado.decode("latin-1").partition(":")
+                if nombre.strip().lower() == "content-length":
+                    largo = int(valor.strip())
+            cuerpo = await reader.readexactly(largo) if largo else b""
+
+            estado, respuesta = self.despachar(metodo.upper(), ruta, cuerpo)
+        except (ValueError, asyncio.IncompleteReadError):
+            estado, respuesta = HTTPStatus.BAD_REQUEST, {"error": "Solicitud inválida"}
+
+        contenido = json.dumps(respuesta, cls=DecimalEncoder).encode("utf-8")
+        writer.write(
+            f"HTTP/1.1 {estado.value} {estado.phrase}\r\n"
+            "Content-Type: application/json; charset=utf-8\r\n"
+            f"Content-Length: {len(contenido)}\r\n"
+            "Connection: close\r\n\r\n".encode("latin-1") + contenido)
+        try:
+            await writer.drain()
+        finally:
+            writer.close()
+
+    async def servir(self, host=HOST, puerto=PUERTO):
+        servidor = await asyncio.start_server(self.atender, host, puerto)
+        print(f"Servidor Textiles Rosy escuchando en http://{host}:{puerto}")
+        async with servidor:
+            await servidor.serve_forever()
+
+
+def iniciar_servidor(host=HOST, puerto=PUERTO, data_dir="data", finanzas_dir="data_finanzas"):
+    servidor = ServidorTextiles(data_dir, finanzas_dir)
+    try:
+        asyncio.run(servidor.servir(host, puerto))
+    except KeyboardInterrupt:
+        print("Servidor detenido")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Servidor local de Textiles Rosy")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--puerto", type=int, default=PUERTO)
+    args = parser.parse_args()
+    iniciar_servidor(args.host, args.puerto)
@@ -0,0 +1,131 @@
+"""Tablas nombre -> número guardadas en arrays, para catálogos de decenas de miles de productos.
+
+Los precios y el stock comparten un índice de posiciones (nombre -> slot)
+del catálogo; cada tabla guarda sus valores en un array ('d' precios, 'l'
+stock) en lugar de un diccionario con un objeto por número. Se usan como
+diccionarios (get, [], items, update...), así que las ventanas y la
+persistencia no cambian, y ofrecen operaciones por lote que recorren los
+arrays con funciones de C (map, compress, sum) en lugar de bucles de Python.
+"""
+from array import array
+from collections.abc import MutableMapping
+from itertools import compress, repeat
+from operator import and_, le, mul
+
+
+class IndiceSlots:
+    """Posición fija de cada nombre; las tablas que lo comparten crecen con él.
+
+    Los slots no se reutilizan: un producto eliminado conserva el suyo por si
+    vuelve a aparecer al recargar.
+    """
+
+    def __init__(self):
+        self.slots = {}
+        self.nombres = []
+
+    def slot(self, nombre):
+        """Posición del nombre, asignándole una nueva si no tenía"""
+        slot = self.slots.get(nombre)
+        if slot is None:
+            slot = self.slots[nombre] = len(self.nombres)
+            self.nombres.append(nombre)
+        return slot
+
+    def __len__(self):
+        return len(self.nombres)
+
+
+class TablaCompacta(MutableMapping):
+    """Diccionario nombre -> número sobre un array; las posiciones ausentes valen 0"""
+
+    def __init__(self, indice, tipo, datos=None):
+        self.indice = indice
+        self.valores = array(tipo)
+        self.presentes = bytearray()
+        self._cantidad = 0
+        if datos:
+            self.update(datos)
+
+    def __getitem__(self, nombre):
+        slot = self.indice.slots.get(nombre)
+        if slot is None or slot >= len(self.presentes) or not self.presentes[slot]:
+            raise KeyError(nombre)
+        return self.valores[slot]
+
+    def get(self, nombre, default=None):
+        slot = self.indice.slots.get(nombre)
+        if slot is None or slot >= len(self.presentes) or not self.presentes[slot]:
+            return default
+        return self.valores[slot]
+
+    def __contains__(self, nombre):
+        slot = self.indice.slots.get(nombre)
+        return slot is not None and slot < len(self.presentes) and bool(self.presentes[slot])
+
+    def __setitem__(self, nombre, valor):
+        slot = self.indice.slot(nombre)
+        self._crecer()
+        if not self.presentes[slot]:
+            self.presentes[slot] = 1
+            self._cantidad += 1
+        self.valores[slot] = valor
+
+    def __delitem__(self, nombre):
+        if nombre not in self:
+            raise KeyError(nombre)
+        slot = self.indice.slots[nombre]
+        self.presentes[slot] = 0
+        self.valores[slot] = 0
+        self._cantidad -= 1
+
+    def __iter__(self):
+        return compress(self.indice.nombres, self.presentes)
+
+    def __len__(self):
+        return self._cantidad
+
+    def __repr__(self):
+        return repr(dict(self))
+
+    def clear(self):
+        self.valores = array(self.valores.typecode, bytes(len(self.valores) * self.valores.itemsize))
+        self.presentes = bytearray(len(self.presentes))
+        self._cantidad = 0
+
+    def _crecer(self):
+        faltan = len(self.indice) - len(self.valores)
+        if faltan > 0:
+            self.valores.frombytes(bytes(faltan * self.valores.itemsize))
+            self.presentes.extend(bytes(faltan))
+
+    # --------------------------------------------
+    # Operaciones por lote
+    # --------------------------------------------
+    def producto_escalar(self, otra):
+        """Suma de valor * valor de otra tabla con el mismo índice (p.ej. precio * stock)"""
+        return sum(map(mul, self.valores, otra.valores))
+
+    def menores_o_iguales(self, limite):
+        """Nombres presentes cuyo valor es <= limite"""
+        return list(compress(self.indice.nombres, map(and_, self.presentes, map(le, self.valores, repeat(limite)))))
+
+    def sumar(self, cantidades):
+        """Suma cantidades (nombre -> cantidad) a los valores actuales"""
+        for nombre, cantidad in cantidades.items():
+            self[nombre] = self.get(nombre, 0) + cantidad
+
+    def elevar_hasta(self, nivel, nombres=None):
+        """Sube a 'nivel' los valores menores (todos o solo los nombres dados).
+
+        Devuelve lo agregado a cada nombre.
+        """
+        if nombres is None:
+            nombres = self.menores_o_iguales(nivel - 1)
+        agregados = {}
+        for nombre in nombres:
+            actual = self.get(nombre, 0)
+            if actual < nivel:
+                agregados[nombre] = nivel - actual
+                self[nombre] = nivel
+        return agregados
@@ -3,11 +3,18 @@ from tkinter import ttk, messagebox, filedialog
 import json
 import os
 from datetime import datetime
-import uuid
 from tkcalendar import DateEntry
+from cliente_api import servicio_ventas
+from dinero import Dinero
+from persistencia import guardados_pendientes, esperar_guardados
+from lista_virtual import ListaVirtual, Invertida, HistorialDiferido
+from indice_ventas import IndiceVentas
+from eventos import BusEventos, STOCK_CAMBIADO, VENTA_CREADA
+from reservas import reservas_para
+from contexto_datos import ContextoDatos
 
 class VentasTextiles:
-    def __init__(self, root=None, inventario=None):
+    def __init__(self, root=None, inventario=None, contexto=None):
         self.root = root
         self.window = tk.Toplevel(root) if root else tk.Tk()
         self.window.title("Sistema de Ventas - Textiles Rosy")
@@ -16,8 +23,9 @@ class VentasTextiles:
         # Control para evitar múltiples instancias
         self.window.protocol("WM_DELETE_WINDOW", self.cerrar_ventana)
         
-        # Conexión con inventario
+        # Conexión con inventario y datos compartidos (ContextoDatos)
         self.inventario = inventario
+        self.contexto = contexto
         
         # Configuración de archivos
         self.data_dir = "data"
@@ -26,8 +34,17 @@ class VentasTextiles:
         if not os.path.exists(self.data_dir):
             os.makedirs(self.data_dir)
             
-        self.ventas_file = os.path.join(self.data_dir, "ventas.json")
-        self.ventas = self.cargar_ventas()
+        if self.contexto:
+            self.servicio = self.contexto.ventas()
+        else:
+            self.servicio = servicio_ventas(self.data_dir, diferido=True)
+            self.servicio.asincrono = True
+        # Stock apartado por el carrito actual, para no vender lo que otra caja ya tiene
+        self.reservas = self.contexto.reservas() if self.contexto else reservas_para(self.data_dir)
+        self.carrito_id = None
+        self.indice_ventas = None  # Se construye en el primer filtrado
+        self.version_indice = None
+        self.historial_filtrado = False
         
         # Variables para el panel de productos
         self.panel_productos_abierto = False
@@ -35,10 +52,19 @@ class VentasTextiles:
         # Configurar interfaz
         self.conf_estilo()
         self.conf_gui()
+        
+        # Avisos de stock y ventas de las demás ventanas (y de esta misma)
+        self.eventos = self.contexto.eventos if self.contexto else BusEventos()
+        self.eventos.suscribir(STOCK_CAMBIADO, self.al_cambiar_stock)
+        self.eventos.suscribir(VENTA_CREADA, self.al_crear_venta)
     
     def cerrar_ventana(self):
         """Maneja el cierre de la ventana"""
+        self.eventos.desuscribir(STOCK_CAMBIADO, self.al_cambiar_stock)
+        self.eventos.desuscribir(VENTA_CREADA, self.al_crear_venta)
+        self.liberar_reserva()
         self.guardar_ventas()
+        esperar_guardados()
         self.window.destroy()
         if not self.root:  # Si es la ventana principal
             try:
@@ -61,18 +87,25 @@ class VentasTextiles:
         style.configure("Treeview", fieldbackground=BG_COLOR, background=BG_COLOR)
         style.configure("Treeview.Heading", background=PRIMARY_COLOR, foreground="white")
     
+    @property
+    def ventas(self):
+        """Todas las ventas (se leen del archivo la primera vez que se piden)"""
+        return self.servicio.ventas
+    
     def cargar_ventas(self):
-        if os.path.exists(self.ventas_file):
-            try:
-                with open(self.ventas_file, 'r') as f:
-                    return json.load(f)
-            except:
-                return []
-        return []
+        if self.contexto:
+            self.contexto.refrescar()
+            return self.servicio.ventas
+        return self.servicio.cargar()
+    
+    def datos_inventario(self):
+        """Servicio de inventario compartido, o el de la ventana de inventario abierta"""
+        if self.contexto:
+            return self.contexto.inventario()
+        return self.inventario.servicio if self.inventario else None
     
     def guardar_ventas(self):
-        with open(self.ventas_file, 'w') as f:
-            json.dump(self.ventas, f, indent=4)
+        self.servicio.guardar()
     
     def conf_gui(self):
         self.notebook = ttk.Notebook(self.window)
@@ -87,6 +120,16 @@ class VentasTextiles:
         self.historial_frame = ttk.Frame(self.notebook)
         self.notebook.add(self.historial_frame, text="Historial de Ventas")
         self.conf_historial_tab()
+        
+        # Indicador de escrituras pendientes en segundo plano
+        self.guardado_var = tk.StringVar()
+        ttk.Label(self.window, textvariable=self.guardado_var, anchor='e').pack(fill='x', padx=10)
+        self.actualizar_indicador_guardado()
+    
+    def actualizar_indicador_guardado(self):
+        pendientes = guardados_pendientes()
+        self.guardado_var.set(f"Guardando... ({pendientes} pendientes)" if pendientes else "Datos guardados")
+        self.window.after(250, self.actualizar_indicador_guardado)
     
     def conf_nueva_venta_tab(self):
         # Frame principal con paneles divididos
@@ -135,7 +178,8 @@ class VentasTextiles:
         
         ttk.Label(producto_frame, text="Producto:").grid(row=0, column=1, padx=5, pady=2)
         self.producto_var = tk.StringVar()
-        productos = list(self.inventario.productos.keys()) if self.inventario else []
+        inventario = self.datos_inventario()
+        productos = list(inventario.productos.keys()) if inventario else []
         self.producto_cb = ttk.Combobox(producto_frame, textvariable=self.producto_var, 
                                       values=productos, state='readonly')
         self.producto_cb.grid(row=0, column=2, padx=5, pady=2)
@@ -206,6 +250,7 @@ class VentasTextiles:
         scrollbar.pack(side="right", fill="y")
         
         # Mostrar productos
+        self.panel_productos = scrollable_frame
         self.actualizar_panel_productos(scrollable_frame)
     
     def actualizar_panel_productos(self, frame):
@@ -213,72 +258,91 @@ class VentasTextiles:
         # Limpiar frame
         for widget in frame.winfo_children():
             widget.destroy()
+        self.etiquetas_stock = {}
         
-        if not self.inventario:
+        inventario = self.datos_inventario()
+        if not inventario:
             ttk.Label(frame, text="No hay conexión con el inventario").pack()
             return
             
         # Mostrar productos con formato
-        for producto, precio in self.inventario.productos.items():
-            stock = self.inventario.stock.get(producto, 0)
+        for producto, precio in inventario.productos.items():
+            stock = inventario.stock.get(producto, 0)
             producto_frame = ttk.Frame(frame)
             producto_frame.pack(fill='x', pady=2)
             
             ttk.Label(producto_frame, text=producto, width=25, anchor='w').pack(side='left')
             ttk.Label(producto_frame, text=f"Q{precio:.2f}", width=10, anchor='e').pack(side='left')
-            ttk.Label(producto_frame, text=f"Stock: {stock}", width=10, anchor='e').pack(side='left')
+            self.etiquetas_stock[producto] = ttk.Label(producto_frame, text=f"Stock: {stock}", width=10, anchor='e')
+            self.etiquetas_stock[producto].pack(side='left')
+    
+    def al_cambiar_stock(self, productos):
+        """Actualiza el stock mostrado de los productos modificados"""
+        inventario = self.datos_inventario()
+        if not inventario:
+            return
+        if any((p in inventario.productos) != (p in self.etiquetas_stock) for p in productos):
+            # Se agregó o eliminó un producto: se rehace el panel y la lista
+            self.producto_cb['values'] = list(inventario.productos.keys())
+            self.actualizar_panel_productos(self.panel_productos)
+            return
+        for producto in productos:
+            if producto in self.etiquetas_stock:
+                self.etiquetas_stock[producto].config(text=f"Stock: {inventario.stock.get(producto, 0)}")
+    
+    def al_crear_venta(self, venta):
+        """Agrega la venta al índice de búsqueda y al historial mostrado"""
+        if self.indice_ventas and self.version_indice == self.servicio.version:
+            self.indice_ventas.agregar(venta)
+        if self.historial_filtrado:
+            return
+        if isinstance(self.lista_ventas.datos, HistorialDiferido):
+            self.actualizar_historial()  # Registrar la venta cargó todas las ventas
+        else:
+            self.lista_ventas.refrescar()
     
     def refrescar_datos(self):
         """Refresca los datos del inventario y actualiza las interfaces"""
-        if self.inventario:
+        if self.contexto:
+            self.contexto.refrescar()
+        elif self.inventario:
             self.inventario.cargar_datos()
-            self.producto_cb['values'] = list(self.inventario.productos.keys())
-            self.actualizar_panel_productos(self.productos_frame.winfo_children()[0].winfo_children()[0])
+        inventario = self.datos_inventario()
+        if inventario:
+            self.producto_cb['values'] = list(inventario.productos.keys())
+            self.actualizar_panel_productos(self.panel_productos)
             messagebox.showinfo("Actualizado", "Datos de productos refrescados")
     
     def abrir_menu_productos(self):
-        if not self.inventario:
+        inventario = self.datos_inventario()
+        if not inventario:
             messagebox.showwarning("Error", "No hay conexión con el inventario")
             return
             
         def seleccionar_producto(producto):
             self.producto_var.set(producto)
-            if producto in self.inventario.productos:
+            if producto in inventario.productos:
                 self.cantidad_var.set(1)
         
         # Evitar abrir múltiples ventanas
         if not hasattr(self, 'menu_productos') or not self.menu_productos.window.winfo_exists():
-            self.menu_productos = MenuProductos(self.window, self.inventario, seleccionar_producto)
+            self.menu_productos = MenuProductos(self.window, inventario, seleccionar_producto)
         else:
             self.menu_productos.window.lift()
     
     def agregar_producto(self):
-        producto = self.producto_var.get()
-        cantidad = self.cantidad_var.get()
-        
-        if not producto:
-            messagebox.showwarning("Error", "Seleccione un producto")
-            return
-            
-        if cantidad <= 0:
-            messagebox.showwarning("Error", "Cantidad inválida")
-            return
-            
-        # Verificar stock
-        if self.inventario and self.inventario.stock.get(producto, 0) < cantidad:
-            messagebox.showwarning("Stock Insuficiente", 
-                                 f"No hay suficiente stock de {producto}")
+        inventario = self.datos_inventario()
+        try:
+            item = self.servicio.crear_item(self.producto_var.get(), self.cantidad_var.get(), inventario)
+            if inventario:
+                if self.carrito_id is None:
+                    self.carrito_id = self.reservas.nuevo_carrito()
+                self.reservas.reservar(self.carrito_id, item['producto'], item['cantidad'], inventario)
+        except (ValueError, ConnectionError) as e:
+            messagebox.showwarning("Error", str(e))
             return
-            
-        precio = self.inventario.productos[producto] if self.inventario else 0
-        subtotal = precio * cantidad
         
-        self.carrito.append({
-            'producto': producto,
-            'cantidad': cantidad,
-            'precio': precio,
-            'subtotal': subtotal
-        })
+        self.carrito.append(item)
         
         self.actualizar_carrito()
         self.producto_var.set('')
@@ -288,7 +352,7 @@ class VentasTextiles:
         for item in self.carrito_tree.get_children():
             self.carrito_tree.delete(item)
             
-        total = 0
+        total = Dinero()
         for item in self.carrito:
             self.carrito_tree.insert('', 'end', values=(
                 item['producto'],
@@ -296,7 +360,7 @@ class VentasTextiles:
                 f"Q{item['precio']:.2f}",
                 f"Q{item['subtotal']:.2f}"
             ))
-            total += item['subtotal']
+            total += Dinero.de(item['subtotal'])
         
         self.total_var.set(f"Total: Q{total:.2f}")
     
@@ -304,6 +368,15 @@ class VentasTextiles:
         if self.carrito and messagebox.askyesno("Confirmar", "¿Vaciar el carrito?"):
             self.carrito = []
             self.actualizar_carrito()
+            self.liberar_reserva()
+    
+    def liberar_reserva(self):
+        """Devuelve al stock disponible lo apartado por el carrito actual"""
+        try:
+            self.reservas.liberar(self.carrito_id)
+        except (ValueError, ConnectionError) as e:
+            print(f"Error liberando la reserva del carrito: {e}")  # Vence sola
+        self.carrito_id = None
     
     def finalizar_venta(self):
         if not self.carrito:
@@ -311,40 +384,18 @@ class VentasTextiles:
             return
             
         nombre = self.cliente_nombre.get().strip()
-        nit = self.cliente_nit.get().strip()
-        metodo_pago = self.metodo_pago.get()
+        inventario = self.datos_inventario()
         
-        if not nombre:
-            messagebox.showwarning("Error", "Ingrese el nombre del cliente")
+        try:
+            venta = self.servicio.registrar_venta(nombre, self.cliente_nit.get().strip(),
+                                                  self.metodo_pago.get(), self.carrito, inventario,
+                                                  reservas=self.reservas, carrito=self.carrito_id)
+        except (ValueError, ConnectionError) as e:
+            messagebox.showwarning("Error", str(e))
             return
-            
-        # Crear venta
-        venta = {
-            'id': str(uuid.uuid4())[:8],
-            'fecha': datetime.now().isoformat(),
-            'cliente': {
-                'nombre': nombre,
-                'nit': nit,
-                'metodo_pago': metodo_pago
-            },
-            'productos': self.carrito,
-            'total': sum(item['subtotal'] for item in self.carrito)
-        }
-        
-        # Actualizar inventario
-        if self.inventario:
-            for item in self.carrito:
-                producto = item['producto']
-                cantidad = item['cantidad']
-                if producto in self.inventario.stock:
-                    self.inventario.stock[producto] -= cantidad
-                    if self.inventario.stock[producto] < 0:
-                        self.inventario.stock[producto] = 0
-            self.inventario.guardar_datos()
-        
-        # Guardar venta
-        self.ventas.append(venta)
-        self.guardar_ventas()
+        
+        self.eventos.emitir(VENTA_CREADA, venta=venta)
+        self.eventos.emitir(STOCK_CAMBIADO, productos=[item['producto'] for item in venta['productos']])
         
         # Mostrar resumen
         resumen = f"Venta registrada exitosamente\n\nID: {venta['id']}\n"
@@ -355,15 +406,13 @@ class VentasTextiles:
         if messagebox.askyesno("Venta Exitosa", resumen):
             self.imprimir_factura(venta)
         
-        # Reiniciar interfaz
+        # Reiniciar interfaz (la reserva se borró al confirmar la venta)
         self.carrito = []
+        self.carrito_id = None
         self.actualizar_carrito()
         self.cliente_nombre.delete(0, 'end')
         self.cliente_nit.delete(0, 'end')
         self.metodo_pago.set("Efectivo")
-        
-        # Actualizar panel de productos
-        self.refrescar_datos()
     
     def imprimir_factura(self, venta=None):
         if not venta:
@@ -380,7 +429,7 @@ class VentasTextiles:
                     'metodo_pago': self.metodo_pago.get()
                 },
                 'productos': self.carrito,
-                'total': sum(item['subtotal'] for item in self.carrito)
+                'total': float(Dinero.sumar(Dinero.de(item['subtotal']) for item in self.carrito))
             }
         
         # Crear ventana de factura
@@ -457,9 +506,13 @@ class VentasTextiles:
         filter_frame = ttk.Frame(main_frame)
         filter_frame.pack(fill='x', padx=10, pady=5)
         
-        ttk.Label(filter_frame, text="Fecha:").pack(side='left', padx=5)
-        self.fecha_filtro = DateEntry(filter_frame, date_pattern='dd/mm/yyyy')
-        self.fecha_filtro.pack(side='left', padx=5)
+        ttk.Label(filter_frame, text="Desde:").pack(side='left', padx=5)
+        self.fecha_desde = DateEntry(filter_frame, date_pattern='dd/mm/yyyy')
+        self.fecha_desde.pack(side='left', padx=5)
+        
+        ttk.Label(filter_frame, text="Hasta:").pack(side='left', padx=5)
+        self.fecha_hasta = DateEntry(filter_frame, date_pattern='dd/mm/yyyy')
+        self.fecha_hasta.pack(side='left', padx=5)
         
         ttk.Label(filter_frame, text="Buscar:").pack(side='left', padx=5)
         self.busqueda_var = tk.StringVar()
@@ -471,18 +524,17 @@ class VentasTextiles:
         
         # Tabla de ventas
         columns = ('id', 'fecha', 'cliente', 'total')
-        self.ventas_tree = ttk.Treeview(main_frame, columns=columns, show='headings')
+        self.lista_ventas = ListaVirtual(main_frame, columns, self.formatear_venta,
+                                         claves_orden={'fecha': lambda v: v['fecha'],
+                                                       'total': lambda v: v['total']})
+        self.ventas_tree = self.lista_ventas.tree
         
         self.ventas_tree.heading('id', text='ID Venta')
         self.ventas_tree.heading('fecha', text='Fecha')
         self.ventas_tree.heading('cliente', text='Cliente')
         self.ventas_tree.heading('total', text='Total')
         
-        scrollbar = ttk.Scrollbar(main_frame, orient='vertical', command=self.ventas_tree.yview)
-        self.ventas_tree.configure(yscrollcommand=scrollbar.set)
-        
-        self.ventas_tree.pack(side='left', fill='both', expand=True)
-        scrollbar.pack(side='right', fill='y')
+        self.lista_ventas.pack(fill='both', expand=True)
         
         # Botones
         btn_frame = ttk.Frame(main_frame)
@@ -496,58 +548,59 @@ class VentasTextiles:
     
     def refrescar_historial(self):
         """Refresca el historial de ventas desde el archivo"""
-        self.ventas = self.cargar_ventas()
+        if self.servicio.cargadas():
+            self.cargar_ventas()
+        self.indice_ventas = None
         self.actualizar_historial()
+        self.historial_filtrado = False
         messagebox.showinfo("Actualizado", "Historial de ventas refrescado")
     
     def filtrar_ventas(self):
-        fecha = self.fecha_filtro.get_date()
-        busqueda = self.busqueda_var.get().lower()
-        
-        ventas_filtradas = []
-        for venta in self.ventas:
-            venta_date = datetime.fromisoformat(venta['fecha']).date()
-            if venta_date == fecha:
-                if not busqueda or (
-                    busqueda in venta['id'].lower() or
-                    busqueda in venta['cliente']['nombre'].lower() or
-                    busqueda in str(venta['total']).lower()
-                ):
-                    ventas_filtradas.append(venta)
+        desde = self.fecha_desde.get_date()
+        hasta = self.fecha_hasta.get_date()
+        if desde > hasta:
+            desde, hasta = hasta, desde
         
+        # El índice se reconstruye si la lista compartida se recargó desde el disco
+        if self.indice_ventas is None or self.version_indice != self.servicio.version:
+            self.indice_ventas = IndiceVentas(self.ventas)
+            self.version_indice = self.servicio.version
+        
+        ventas_filtradas = self.indice_ventas.buscar(desde, hasta, self.busqueda_var.get())
         self.actualizar_historial(ventas_filtradas)
+        self.historial_filtrado = True
     
     def limpiar_filtros(self):
-        self.fecha_filtro.set_date(datetime.now())
+        self.fecha_desde.set_date(datetime.now())
+        self.fecha_hasta.set_date(datetime.now())
         self.busqueda_var.set('')
         self.actualizar_historial()
+        self.historial_filtrado = False
     
     def actualizar_historial(self, ventas=None):
-        for item in self.ventas_tree.get_children():
-            self.ventas_tree.delete(item)
-            
+        if ventas is None and not self.servicio.cargadas():
+            # Solo se leen las ventas recientes; las antiguas al desplazarse
+            self.lista_ventas.establecer_datos(HistorialDiferido(self.servicio.iterar_recientes()))
+            return
         ventas_a_mostrar = ventas if ventas is not None else self.ventas
-        
-        for venta in reversed(ventas_a_mostrar):
-            fecha = datetime.fromisoformat(venta['fecha']).strftime('%d/%m/%Y %H:%M')
-            self.ventas_tree.insert('', 'end', values=(
-                venta['id'],
-                fecha,
-                venta['cliente']['nombre'],
-                f"Q{venta['total']:.2f}"
-            ))
+        self.lista_ventas.establecer_datos(Invertida(ventas_a_mostrar))
+    
+    def formatear_venta(self, venta):
+        fecha = datetime.fromisoformat(venta['fecha']).strftime('%d/%m/%Y %H:%M')
+        return (
+            venta['id'],
+            fecha,
+            venta['cliente']['nombre'],
+            f"Q{venta['total']:.2f}"
+        )
     
     def ver_detalle_venta(self):
-        seleccion = self.ventas_tree.selection()
-        if not seleccion:
+        venta = self.lista_ventas.seleccionado()
+        if not venta:
             messagebox.showwarning("Error", "Seleccione una venta")
             return
-            
-        venta_id = self.ventas_tree.item(seleccion[0])['values'][0]
-        venta = next((v for v in self.ventas if v['id'] == venta_id), None)
         
-        if venta:
-            self.imprimir_factura(venta)
+        self.imprimir_factura(venta)
     
     def exportar_ventas(self):
         filename = filedialog.asksaveasfilename(
@@ -703,15 +756,16 @@ class MenuProductos:
         self.window.grab_set()
         self.window.wait_window()
 
-def iniciar_modulo_ventas(root=None, inventario=None):
+def iniciar_modulo_ventas(root=None, inventario=None, contexto=None):
     # Verificar si ya está abierto
     for widget in root.winfo_children() if root else []:
         if isinstance(widget, tk.Toplevel) and widget.title() == "Sistema de Ventas - Textiles Rosy":
             widget.lift()
             return None
-    app = VentasTextiles(root, inventario)
+    # Sin contexto propio se crea uno, para que las ventas se contabilicen al momento
+    app = VentasTextiles(root, inventario, contexto or ContextoDatos())
     return app
 
 if __name__ == "__main__":
-    app = VentasTextiles()
+    app = VentasTextiles(contexto=ContextoDatos())
     app.run()
\ No newline at end of file